@@ -7,10 +7,18 @@ from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Optional, Dict, Any, List
+import asyncio
 import logging
+import os
+import sys
 from datetime import datetime
 
+# Modules shared by the AI services live in ai-services/shared
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 from services.address_service import AddressService
+from services.occupancy_index import StaleIndexError
+from shared.job_queue import JobQueue
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -30,6 +38,15 @@ app.add_middleware(
 )
 
 address_service = AddressService()
+job_queue = JobQueue(
+    os.getenv("JOB_DB_PATH", "address-jobs.sqlite3"),
+    max_workers=int(os.getenv("JOB_WORKERS", "2"))
+)
+
+@app.on_event("shutdown")
+async def shutdown_jobs():
+    """Stop background jobs"""
+    job_queue.shutdown()
 
 class HealthResponse(BaseModel):
     status: str
@@ -48,6 +65,10 @@ class FraudDetectResponse(BaseModel):
     risk_score: float
     reasons: List[str]
     cluster_id: Optional[str] = None
+    occupancy: Optional[int] = 0
+
+class OccupancyDeleteRequest(BaseModel):
+    voter_ids: List[Any]
 
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
@@ -67,6 +88,21 @@ async def normalize_address(request: AddressRequest):
         logger.error(f"Error normalizing address: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/normalize-batch")
+async def normalize_addresses(addresses: List[Dict[str, Any]]):
+    """
+    Normalize many addresses in one request
+    
+    Results are returned in request order, one {normalized_address,
+    confidence} entry per address; the work runs off the event loop.
+    """
+    try:
+        results = await asyncio.to_thread(address_service.normalize_many, addresses)
+        return {"total": len(results), "results": results}
+    except Exception as e:
+        logger.error(f"Error normalizing address batch: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.post("/fraud-detect", response_model=FraudDetectResponse)
 async def detect_fraud(request: AddressRequest):
     """Detect fraudulent addresses"""
@@ -77,6 +113,84 @@ async def detect_fraud(request: AddressRequest):
         logger.error(f"Error detecting fraud: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/occupancy/load")
+async def occupancy_load(addresses: List[Dict[str, Any]], replace: bool = True):
+    """
+    Bulk-load the address-occupancy index from addresses carrying voter_id
+    
+    With replace (the default) the index is rebuilt from this list;
+    otherwise the voters are upserted into it.
+    """
+    try:
+        logger.info(f"Loading {len(addresses)} voters into the occupancy index")
+        return await asyncio.to_thread(address_service.index_addresses, addresses, replace)
+    except StaleIndexError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error loading occupancy index: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/occupancy/upsert")
+async def occupancy_upsert(addresses: List[Dict[str, Any]]):
+    """Add voters to the occupancy index or move them to a new address"""
+    try:
+        return await asyncio.to_thread(address_service.index_addresses, addresses)
+    except StaleIndexError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error updating occupancy index: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/occupancy/delete")
+async def occupancy_delete(request: OccupancyDeleteRequest):
+    """Remove voters from the occupancy index"""
+    try:
+        return address_service.remove_voters(request.voter_ids)
+    except Exception as e:
+        logger.error(f"Error deleting from occupancy index: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/occupancy/lookup")
+async def occupancy_lookup(request: AddressRequest, limit: int = 100):
+    """Number and IDs of the voters indexed at an address"""
+    try:
+        return address_service.lookup_occupancy(request.address, limit=min(limit, 10000))
+    except StaleIndexError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error looking up occupancy: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/occupancy/stats")
+async def occupancy_stats():
+    """Occupancy index size, the most crowded address and whether it must be rebuilt (stale)"""
+    return address_service.occupancy.stats()
+
+@app.get("/gazetteer/pincode/{pin_code}")
+async def gazetteer_pincode(pin_code: str):
+    """Districts and states the gazetteer lists for a PIN code"""
+    if address_service.gazetteer is None:
+        raise HTTPException(status_code=404, detail="No gazetteer configured (ADDRESS_GAZETTEER_PATH)")
+    try:
+        return address_service.gazetteer.lookup(pin_code.strip())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Size, hit/miss, eviction and expiry counters of the normalize and fraud caches"""
+    return address_service.cache_stats()
+
+@app.post("/cache/clear")
+async def clear_cache():
+    """Empty the normalize and fraud caches"""
+    address_service.clear_caches()
+    return address_service.cache_stats()
+
 @app.post("/cluster-analysis")
 async def cluster_analysis(addresses: List[Dict[str, Any]]):
     """Analyze address clusters for ghost houses"""
@@ -87,6 +201,57 @@ async def cluster_analysis(addresses: List[Dict[str, Any]]):
         logger.error(f"Error in cluster analysis: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/jobs/cluster-analysis", status_code=202)
+async def submit_cluster_analysis_job(addresses: List[Dict[str, Any]]):
+    """
+    Queue cluster analysis as a background job
+    
+    Returns the job status immediately; suspicious clusters are paged
+    through /jobs/{job_id}/results once found.
+    """
+    try:
+        return job_queue.submit(
+            "cluster-analysis",
+            lambda job: address_service.run_cluster_job(job, addresses),
+            params={"total_addresses": len(addresses)}
+        )
+    except Exception as e:
+        logger.error(f"Error queueing cluster analysis job: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Job status, progress percentage and summary"""
+    try:
+        return job_queue.get(job_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+
+@app.get("/jobs/{job_id}/results")
+async def get_job_results(job_id: str, offset: int = 0, limit: int = 1000):
+    """Page through a job's results"""
+    try:
+        job = job_queue.get(job_id)
+        return {
+            "job_id": job_id,
+            "status": job["status"],
+            "total": job["result_count"],
+            "offset": offset,
+            "results": job_queue.results(job_id, offset=offset, limit=min(limit, 10000))
+        }
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+
+@app.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """Cancel a queued or running job"""
+    try:
+        return job_queue.cancel(job_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8002)
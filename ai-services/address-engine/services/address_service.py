@@ -2,112 +2,188 @@
 Address normalization and fraud detection service
 """
 
+import asyncio
 import logging
-import re
-from typing import Dict, Any, List
-import hashlib
+import os
+from typing import Dict, Any, List, Optional
+
+from services.occupancy_index import OccupancyIndex, StaleIndexError
+from shared.job_queue import JobContext
+from utils.address_clustering import AddressClusterer, DEFAULT_SIMILARITY, KEY_VERSION, address_key
+from utils.address_normalizer import AddressNormalizer, NORMALIZER_VERSION
+from utils.gazetteer import shared_gazetteer
+from utils.lru_cache import LRUCache
 
 logger = logging.getLogger(__name__)
 
+# Addresses clustered between progress updates in cluster-analysis jobs
+CLUSTER_PROGRESS_EVERY = 10000
+
+# Voters at one address above which it is reported as a possible ghost house
+GHOST_HOUSE_MIN_VOTERS = 15
+
+# Version of the occupancy-index keys; an index built under another one is stale
+OCCUPANCY_KEY_VERSION = f"normalizer-{NORMALIZER_VERSION}/key-{KEY_VERSION}"
+
+# Fields detect_fraud reads, and whose truthiness it checks
+FRAUD_FIELDS = ('house_number', 'street', 'village_city', 'district', 'state', 'pin_code')
+
+# Bundled sample gazetteer, used unless ADDRESS_GAZETTEER_PATH says otherwise ("" disables it)
+DEFAULT_GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "samples", "pin_gazetteer.csv")
+
 class AddressService:
     """Service for address processing"""
     
     def __init__(self):
-        # Common address abbreviations
-        self.abbreviations = {
-            'st': 'street', 'str': 'street', 'rd': 'road', 'ave': 'avenue',
-            'blvd': 'boulevard', 'dr': 'drive', 'ln': 'lane', 'ct': 'court',
-            'apt': 'apartment', 'fl': 'floor', 'no': 'number', 'nr': 'near'
-        }
+        gazetteer_path = os.getenv("ADDRESS_GAZETTEER_PATH", DEFAULT_GAZETTEER_PATH)
+        self.gazetteer = shared_gazetteer(gazetteer_path) if gazetteer_path else None
+        self.normalizer = AddressNormalizer(gazetteer=self.gazetteer)
+        
+        # Rolls repeat the same apartment blocks and villages thousands of times
+        cache_size = int(os.getenv("ADDRESS_CACHE_SIZE", "100000"))
+        cache_ttl = float(os.getenv("ADDRESS_CACHE_TTL", "3600"))
+        self.normalize_cache = LRUCache(cache_size, cache_ttl, name="normalize")
+        self.fraud_cache = LRUCache(cache_size, cache_ttl, name="fraud")
+        self.clusterer = AddressClusterer(
+            self._normalized,
+            similarity=float(os.getenv("ADDRESS_CLUSTER_SIMILARITY", str(DEFAULT_SIMILARITY)))
+        )
+        self.occupancy = OccupancyIndex(
+            os.getenv("ADDRESS_INDEX_PATH", "address-occupancy.sqlite3"),
+            key_version=OCCUPANCY_KEY_VERSION
+        )
         logger.info("AddressService initialized")
     
     async def normalize(self, address: Dict[str, Any]) -> Dict[str, Any]:
         """Normalize address"""
-        normalized = {}
+        return self._normalize_cached(address)
+    
+    def normalize_many(self, addresses: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Normalize many addresses in one call
         
-        # Normalize each field
-        normalized['house_number'] = self._normalize_text(address.get('house_number', ''))
-        normalized['street'] = self._normalize_street(address.get('street', ''))
-        normalized['village_city'] = self._normalize_text(address.get('village_city', ''))
-        normalized['district'] = self._normalize_text(address.get('district', ''))
-        normalized['state'] = self._normalize_text(address.get('state', ''))
-        normalized['pin_code'] = self._normalize_pincode(address.get('pin_code', ''))
+        Runs the same compiled pipeline and cache as normalize; results are in input order.
+        """
+        return [self._normalize_cached(address) for address in addresses]
+    
+    def _normalize_cached(self, address: Dict[str, Any]) -> Dict[str, Any]:
+        """Normalize through the cache; callers get their own copy of the result"""
+        result = self.normalize_cache.get_or_compute(
+            self.normalizer.cache_key(address),
+            lambda: self.normalizer.normalize(address)
+        )
+        return {"normalized_address": dict(result["normalized_address"]), "confidence": result["confidence"]}
+    
+    def _normalized(self, address: Dict[str, Any]) -> Dict[str, Any]:
+        """Normalized fields of an address, from the cache (read-only, not copied)"""
+        return self.normalize_cache.get_or_compute(
+            self.normalizer.cache_key(address),
+            lambda: self.normalizer.normalize(address)
+        )["normalized_address"]
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Counters of the normalize and fraud caches"""
+        return {
+            "normalize": self.normalize_cache.stats(),
+            "fraud": self.fraud_cache.stats()
+        }
+    
+    def clear_caches(self) -> None:
+        """Empty the normalize and fraud caches"""
+        self.normalize_cache.clear()
+        self.fraud_cache.clear()
+    
+    def address_key(self, address: Dict[str, Any]) -> str:
+        """Occupancy-index key of an address: digest of its normalized house, street, city and PIN"""
+        return address_key(self.clusterer.canonical_key(self._normalized(address)))
+    
+    def index_addresses(self, addresses: List[Dict[str, Any]], replace: bool = False) -> Dict[str, Any]:
+        """
+        Record where voters live in the occupancy index
         
-        # Calculate confidence based on completeness
-        confidence = self._calculate_confidence(normalized)
+        Each address needs a voter_id; a voter already indexed elsewhere is
+        moved. With replace the index is rebuilt from addresses alone.
         
+        Raises:
+            ValueError: if an address has no voter_id
+            StaleIndexError: when upserting into a stale index
+        """
+        entries = []
+        for k, address in enumerate(addresses):
+            voter_id = address.get('voter_id')
+            if voter_id is None or voter_id == '':
+                raise ValueError(f"Address {k} has no voter_id")
+            entries.append((voter_id, self.address_key(address)))
+        counts = self.occupancy.load(entries, replace=replace)
+        return {**counts, **self.occupancy.stats()}
+    
+    def remove_voters(self, voter_ids: List[Any]) -> Dict[str, Any]:
+        """Remove voters from the occupancy index"""
+        removed = self.occupancy.remove(voter_ids)
+        return {"removed": removed, **self.occupancy.stats()}
+    
+    def lookup_occupancy(self, address: Dict[str, Any], limit: int = 100) -> Dict[str, Any]:
+        """Voters indexed at an address (IDs capped at limit)"""
+        key = self.address_key(address)
         return {
-            "normalized_address": normalized,
-            "confidence": confidence
+            "address_key": key,
+            "cluster_id": key[:8],
+            "voter_count": self.occupancy.occupancy(key),
+            "voter_ids": self.occupancy.occupants(key, limit)
         }
     
-    def _normalize_text(self, text: str) -> str:
-        """Normalize text field"""
-        if not text:
-            return ""
-        
-        # Convert to lowercase
-        text = text.lower().strip()
-        
-        # Remove extra spaces
-        text = re.sub(r'\s+', ' ', text)
-        
-        # Capitalize first letter of each word
-        text = ' '.join(word.capitalize() for word in text.split())
-        
-        return text
-    
-    def _normalize_street(self, street: str) -> str:
-        """Normalize street name with abbreviation expansion"""
-        if not street:
-            return ""
-        
-        street = street.lower().strip()
-        
-        # Expand abbreviations
-        words = street.split()
-        expanded = []
-        for word in words:
-            # Remove punctuation
-            word_clean = re.sub(r'[^\w]', '', word)
-            if word_clean in self.abbreviations:
-                expanded.append(self.abbreviations[word_clean])
-            else:
-                expanded.append(word)
-        
-        street = ' '.join(expanded)
-        return self._normalize_text(street)
-    
-    def _normalize_pincode(self, pincode: Any) -> str:
-        """Normalize PIN code"""
-        if not pincode:
-            return ""
-        
-        # Extract only digits
-        pincode_str = re.sub(r'\D', '', str(pincode))
-        
-        # Validate length (Indian PIN codes are 6 digits)
-        if len(pincode_str) == 6:
-            return pincode_str
-        elif len(pincode_str) > 6:
-            return pincode_str[:6]
-        else:
-            return pincode_str.zfill(6)
-    
-    def _calculate_confidence(self, normalized: Dict[str, Any]) -> float:
-        """Calculate normalization confidence"""
-        required_fields = ['village_city', 'district', 'state', 'pin_code']
-        present = sum(1 for field in required_fields if normalized.get(field))
-        return present / len(required_fields)
-    
     async def detect_fraud(self, address: Dict[str, Any]) -> Dict[str, Any]:
-        """Detect fraudulent addresses"""
+        """
+        Detect fraudulent addresses
+        
+        The per-address checks are cached; occupancy is read from the index
+        on every call, since it changes as voters are indexed. While the
+        index is stale, occupancy is None and not checked.
+        """
+        checks = self.fraud_cache.get_or_compute(self._fraud_key(address), lambda: self._detect_fraud(address))
+        reasons = list(checks["reasons"])
+        risk_score = checks["risk_score"]
+        
+        # Check how many voters are already registered at this address
+        try:
+            occupancy = self.occupancy.occupancy(checks["address_key"])
+        except StaleIndexError:
+            occupancy = None
+        if occupancy is not None and occupancy > GHOST_HOUSE_MIN_VOTERS:
+            reasons.append(f"{occupancy} voters already registered at this address")
+            risk_score += min(1.0, occupancy / 50.0)
+        
+        return {
+            "is_fraud": risk_score >= 0.5,
+            "risk_score": min(1.0, risk_score),
+            "reasons": reasons,
+            "cluster_id": checks["address_key"][:8],
+            "occupancy": occupancy
+        }
+    
+    def _fraud_key(self, address: Dict[str, Any]) -> tuple:
+        """
+        Cache key for detect_fraud: the string form and truthiness of each field it reads
+        
+        The checks and the normalizer only ever see str(value) or its
+        absence, so addresses with equal keys always get the same verdict.
+        """
+        key = []
+        for field in FRAUD_FIELDS:
+            value = address.get(field, '')
+            key.append(str(value))
+            key.append(bool(value))
+        return tuple(key)
+    
+    def _detect_fraud(self, address: Dict[str, Any]) -> Dict[str, Any]:
+        """Uncached per-address fraud checks (risk_score is not yet capped)"""
         reasons = []
         risk_score = 0.0
         
         # Check for invalid PIN code
         pin_code = str(address.get('pin_code', '')).strip()
-        if pin_code and (len(pin_code) != 6 or not pin_code.isdigit()):
+        pin_valid = len(pin_code) == 6 and pin_code.isdigit()
+        if pin_code and not pin_valid:
             reasons.append("Invalid PIN code format")
             risk_score += 0.3
         
@@ -122,47 +198,76 @@ class AddressService:
             reasons.append("Missing location information")
             risk_score += 0.2
         
-        # Check for duplicate address hash (would need database lookup)
-        address_hash = self._hash_address(address)
-        
-        is_fraud = risk_score >= 0.5
+        # Check the PIN code against the gazetteer's districts and states (a
+        # malformed PIN is already penalized, and its normalized form is a guess)
+        if self.gazetteer is not None and pin_valid:
+            normalized = self._normalized(address)
+            for reason in self.gazetteer.check(normalized['pin_code'], normalized['district'], normalized['state']):
+                reasons.append(reason)
+                risk_score += 0.3
         
         return {
-            "is_fraud": is_fraud,
-            "risk_score": min(1.0, risk_score),
+            "risk_score": risk_score,
             "reasons": reasons,
-            "cluster_id": address_hash[:8]  # First 8 chars as cluster ID
+            "address_key": self.address_key(address)
         }
     
-    def _hash_address(self, address: Dict[str, Any]) -> str:
-        """Generate hash for address clustering"""
-        address_str = f"{address.get('house_number', '')}{address.get('street', '')}{address.get('village_city', '')}{address.get('pin_code', '')}"
-        return hashlib.sha256(address_str.lower().encode()).hexdigest()
-    
     async def analyze_clusters(self, addresses: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Analyze address clusters for ghost houses"""
-        clusters = {}
-        
-        for addr in addresses:
-            cluster_id = self._hash_address(addr)[:8]
-            if cluster_id not in clusters:
-                clusters[cluster_id] = []
-            clusters[cluster_id].append(addr)
-        
-        suspicious_clusters = []
-        for cluster_id, cluster_addresses in clusters.items():
-            if len(cluster_addresses) > 15:  # Threshold for ghost house
-                suspicious_clusters.append({
-                    "cluster_id": cluster_id,
-                    "voter_count": len(cluster_addresses),
-                    "risk_score": min(1.0, len(cluster_addresses) / 50.0),
-                    "address": cluster_addresses[0] if cluster_addresses else {}
-                })
+        return await asyncio.to_thread(self._analyze_clusters, addresses)
+    
+    def run_cluster_job(self, job: JobContext, addresses: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Cluster analysis as a background job
+        
+        Suspicious clusters are written to the job store as results; the
+        returned summary carries the remaining counters.
+        """
+        result = self._analyze_clusters(addresses, job)
+        job.add_results(result["suspicious_clusters"])
+        return {
+            "total_clusters": result["total_clusters"],
+            "suspicious_clusters": len(result["suspicious_clusters"]),
+            "max_voters_per_address": result["max_voters_per_address"]
+        }
+    
+    def _analyze_clusters(
+        self,
+        addresses: List[Dict[str, Any]],
+        job: Optional[JobContext] = None
+    ) -> Dict[str, Any]:
+        """
+        Cluster addresses by house and flag crowded ones
+        
+        Variants of one address ("123 Main St" / "123, Main Street") fall in
+        the same cluster (see AddressClusterer). Reports progress to and
+        honours cancellation of job.
+        """
+        def on_progress(fraction: float) -> None:
+            job.check_cancelled()
+            job.set_progress(fraction)
+        
+        clusters = self.clusterer.cluster(
+            addresses,
+            on_progress=on_progress if job is not None else None,
+            progress_every=CLUSTER_PROGRESS_EVERY
+        )
+        
+        suspicious_clusters = [
+            {
+                "cluster_id": cluster["cluster_id"],
+                "voter_count": cluster["voter_count"],
+                "risk_score": min(1.0, cluster["voter_count"] / 50.0),
+                "address": addresses[cluster["representative"]],
+                "variants": cluster["variants"],
+                "voter_ids": cluster["voter_ids"]
+            }
+            for cluster in clusters
+            if cluster["voter_count"] > GHOST_HOUSE_MIN_VOTERS
+        ]
         
         return {
             "total_clusters": len(clusters),
             "suspicious_clusters": suspicious_clusters,
-            "max_voters_per_address": max(len(addrs) for addrs in clusters.values()) if clusters else 0
+            "max_voters_per_address": clusters[0]["voter_count"] if clusters else 0
         }
-
-
@@ -0,0 +1,237 @@
+"""
+Persistent address-occupancy index
+Maps normalized address keys to the voters registered there, in SQLite, so
+single-address fraud checks can see how crowded an address already is
+
+The keys are digests of normalized addresses, so they are only valid for
+the normalizer and key format that built them. The index records that
+version in its meta table and refuses lookups and upserts under any other
+version until it is rebuilt with load(replace=True).
+"""
+
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Rows written per executemany call during bulk loads
+LOAD_CHUNK_SIZE = 50000
+
+# Per-address counts are kept in step with occupants by triggers, so an
+# occupancy lookup is a single primary-key read however large the roll is
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS occupants (
+    voter_id TEXT PRIMARY KEY,
+    address_key TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS occupants_by_address ON occupants (address_key);
+CREATE TABLE IF NOT EXISTS addresses (
+    address_key TEXT PRIMARY KEY,
+    voter_count INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TRIGGER IF NOT EXISTS occupant_added AFTER INSERT ON occupants BEGIN
+    INSERT INTO addresses (address_key, voter_count) VALUES (NEW.address_key, 1)
+    ON CONFLICT (address_key) DO UPDATE SET voter_count = voter_count + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS occupant_removed AFTER DELETE ON occupants BEGIN
+    UPDATE addresses SET voter_count = voter_count - 1 WHERE address_key = OLD.address_key;
+    DELETE FROM addresses WHERE address_key = OLD.address_key AND voter_count <= 0;
+END;
+CREATE TRIGGER IF NOT EXISTS occupant_moved AFTER UPDATE OF address_key ON occupants BEGIN
+    UPDATE addresses SET voter_count = voter_count - 1 WHERE address_key = OLD.address_key;
+    DELETE FROM addresses WHERE address_key = OLD.address_key AND voter_count <= 0;
+    INSERT INTO addresses (address_key, voter_count) VALUES (NEW.address_key, 1)
+    ON CONFLICT (address_key) DO UPDATE SET voter_count = voter_count + 1;
+END;
+"""
+
+
+class StaleIndexError(Exception):
+    """The index was built with another key version and must be rebuilt"""
+
+
+class OccupancyIndex:
+    """
+    Voter-to-address index with per-address voter counts
+
+    Each voter lives at one address key; upserting a voter under a new key
+    moves them. The file survives restarts, so the index is bulk-loaded once
+    and then kept current with upserts and deletes.
+
+    key_version identifies how address keys are computed. An empty index
+    takes it on; a filled one built under another version (or before
+    versions were recorded) is stale.
+    """
+
+    def __init__(self, db_path: str, key_version: str):
+        self.db_path = db_path
+        self.key_version = key_version
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            if conn.execute("SELECT 1 FROM occupants LIMIT 1").fetchone() is None:
+                self._write_version(conn)
+            stored = self._stored_version(conn)
+        if stored != key_version:
+            logger.warning(
+                f"Occupancy index at {db_path} was built with key version {stored}, not {key_version}; "
+                f"lookups are refused until it is rebuilt (POST /occupancy/load)"
+            )
+        logger.info(f"OccupancyIndex initialized at {db_path}")
+
+    def load(self, entries: Iterable[Tuple[str, str]], replace: bool = True) -> Dict[str, int]:
+        """
+        Bulk-load (voter_id, address_key) pairs
+
+        With replace the index is emptied first (in the same transaction)
+        and takes this index's key version; otherwise the pairs are upserted.
+
+        Raises:
+            StaleIndexError: when upserting into a stale index
+        """
+        indexed = 0
+        with self._connect() as conn:
+            if replace:
+                # Counts first, so the per-voter delete trigger finds nothing to update
+                conn.execute("DELETE FROM addresses")
+                conn.execute("DELETE FROM occupants")
+                self._write_version(conn)
+            else:
+                self._check_version(self._stored_version(conn))
+            chunk: List[Tuple[str, str]] = []
+            for voter_id, address_key in entries:
+                chunk.append((str(voter_id), address_key))
+                if len(chunk) >= LOAD_CHUNK_SIZE:
+                    indexed += self._write(conn, chunk)
+                    chunk = []
+            indexed += self._write(conn, chunk)
+        logger.info(f"Indexed {indexed} voters by address (replace={replace})")
+        return {"indexed": indexed}
+
+    def upsert(self, entries: Iterable[Tuple[str, str]]) -> Dict[str, int]:
+        """Add voters or move them to a new address"""
+        return self.load(entries, replace=False)
+
+    def remove(self, voter_ids: Iterable[Any]) -> int:
+        """Remove voters; returns how many were indexed"""
+        with self._connect() as conn:
+            cursor = conn.executemany(
+                "DELETE FROM occupants WHERE voter_id = ?",
+                ((str(voter_id),) for voter_id in voter_ids)
+            )
+            return cursor.rowcount
+
+    def occupancy(self, address_key: str) -> int:
+        """
+        Number of voters indexed at an address
+
+        Raises:
+            StaleIndexError: if the index is stale
+        """
+        # The version comes from the same read, so a rebuild by another worker is seen at once
+        row = self._reader().execute(
+            "SELECT (SELECT value FROM meta WHERE name = 'key_version') AS key_version, "
+            "(SELECT voter_count FROM addresses WHERE address_key = ?) AS voter_count",
+            (address_key,)
+        ).fetchone()
+        self._check_version(row["key_version"])
+        return row["voter_count"] or 0
+
+    def occupants(self, address_key: str, limit: int = 100) -> List[str]:
+        """
+        Voter IDs indexed at an address, at most limit of them
+
+        Raises:
+            StaleIndexError: if the index is stale
+        """
+        with self._connect() as conn:
+            self._check_version(self._stored_version(conn))
+            rows = conn.execute(
+                "SELECT voter_id FROM occupants WHERE address_key = ? LIMIT ?",
+                (address_key, max(0, limit))
+            ).fetchall()
+        return [row["voter_id"] for row in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        """Index size, the most crowded address and whether the index is stale"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT COUNT(*) AS addresses, COALESCE(SUM(voter_count), 0) AS voters, "
+                "COALESCE(MAX(voter_count), 0) AS max_voters FROM addresses"
+            ).fetchone()
+            stored = self._stored_version(conn)
+        return {
+            "voters": row["voters"],
+            "addresses": row["addresses"],
+            "max_voters_per_address": row["max_voters"],
+            "key_version": stored,
+            "stale": stored != self.key_version,
+            "db_path": self.db_path
+        }
+
+    def _check_version(self, stored: Optional[str]) -> None:
+        """Raise StaleIndexError unless the index was built with this key version"""
+        if stored != self.key_version:
+            raise StaleIndexError(
+                f"Occupancy index was built with key version {stored}, not {self.key_version}; "
+                f"rebuild it with POST /occupancy/load"
+            )
+
+    @staticmethod
+    def _stored_version(conn: sqlite3.Connection) -> Optional[str]:
+        """Key version the index was built with (None if it predates versioning)"""
+        row = conn.execute("SELECT value FROM meta WHERE name = 'key_version'").fetchone()
+        return row["value"] if row else None
+
+    def _write_version(self, conn: sqlite3.Connection) -> None:
+        """Record this index's key version"""
+        conn.execute(
+            "INSERT INTO meta (name, value) VALUES ('key_version', ?) "
+            "ON CONFLICT (name) DO UPDATE SET value = excluded.value",
+            (self.key_version,)
+        )
+
+    @staticmethod
+    def _write(conn: sqlite3.Connection, chunk: List[Tuple[str, str]]) -> int:
+        """Upsert one chunk of pairs; a voter already at the same key is left alone"""
+        if not chunk:
+            return 0
+        conn.executemany(
+            "INSERT INTO occupants (voter_id, address_key) VALUES (?, ?) "
+            "ON CONFLICT (voter_id) DO UPDATE SET address_key = excluded.address_key "
+            "WHERE address_key != excluded.address_key",
+            chunk
+        )
+        return len(chunk)
+
+    def _reader(self) -> sqlite3.Connection:
+        """
+        Long-lived connection of the calling thread for single-row reads
+
+        Opening a connection costs far more than the lookup itself; in WAL
+        mode each read still sees every committed write.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+        return conn
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Open a connection for one transaction"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
@@ -0,0 +1,52 @@
+"""Address clustering: spelling variants of one house form a single cluster"""
+
+import pytest
+
+from utils import address_clustering
+from utils.address_clustering import AddressClusterer
+from utils.address_normalizer import AddressNormalizer
+
+
+def _registrations(streets, start=0):
+    return [
+        {"voter_id": start + k, "street": street, "village_city": "Bangalore", "pin_code": "560001"}
+        for k, street in enumerate(streets)
+    ]
+
+
+@pytest.fixture(scope="module")
+def clusterer():
+    normalizer = AddressNormalizer(gazetteer=None)
+    return AddressClusterer(lambda address: normalizer.normalize(address)["normalized_address"])
+
+
+@pytest.fixture(params=["exhaustive", "lsh"])
+def block_mode(request, monkeypatch):
+    # Blocks larger than EXHAUSTIVE_BLOCK_SIZE only compare LSH candidate pairs
+    if request.param == "lsh":
+        monkeypatch.setattr(address_clustering, "EXHAUSTIVE_BLOCK_SIZE", 0)
+    return request.param
+
+
+def test_abbreviations_and_punctuation_are_one_house(clusterer, block_mode):
+    addresses = _registrations(["123 Main St", "123, Main Street", "123 main st."] * 5)
+    clusters = clusterer.cluster(addresses)
+    assert len(clusters) == 1
+    assert clusters[0]["voter_count"] == 15
+
+
+def test_typo_variant_joins_the_house(clusterer, block_mode):
+    addresses = (
+        _registrations(["123 Main St", "123, Main Street", "123 main st."] * 5)
+        + _registrations(["123 Mian Street"] * 5, start=100)
+    )
+    clusters = clusterer.cluster(addresses)
+    assert len(clusters) == 1
+    assert clusters[0]["voter_count"] == 20
+    assert clusters[0]["variants"] == 2
+
+
+def test_other_houses_stay_separate(clusterer, block_mode):
+    addresses = _registrations(["123 Main Street", "124 Main Street", "123 Mall Road", "123 Station Road"])
+    clusters = clusterer.cluster(addresses)
+    assert sorted(cluster["voter_count"] for cluster in clusters) == [1, 1, 1, 1]
@@ -0,0 +1,44 @@
+"""Fraud checks: PIN code format and gazetteer checks"""
+
+import asyncio
+
+import pytest
+
+from services.address_service import AddressService
+
+
+@pytest.fixture(scope="module")
+def service(tmp_path_factory):
+    # Uses the bundled sample gazetteer
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv("ADDRESS_INDEX_PATH", str(tmp_path_factory.mktemp("occupancy") / "index.sqlite3"))
+        yield AddressService()
+
+
+def _detect(service, **fields):
+    address = {"house_number": "12", "street": "Main Road", "village_city": "Bangalore", **fields}
+    return asyncio.run(service.detect_fraud(address))
+
+
+@pytest.mark.parametrize("pin_code", ["1234", "56000l", "4110O1"])
+def test_malformed_pin_is_penalized_once(service, pin_code):
+    result = _detect(service, pin_code=pin_code, district="Bangalore", state="Karnataka")
+    assert result["reasons"] == ["Invalid PIN code format"]
+    assert result["risk_score"] == pytest.approx(0.3)
+    assert not result["is_fraud"]
+
+
+def test_army_postal_pin_is_not_flagged(service):
+    result = _detect(service, pin_code="900001", district="Bangalore", state="Karnataka")
+    assert result["reasons"] == []
+    assert not result["is_fraud"]
+
+
+def test_pin_outside_postal_regions_is_flagged(service):
+    result = _detect(service, pin_code="000001", district="Bangalore", state="Karnataka")
+    assert result["reasons"] == ["PIN code is outside India's postal regions"]
+
+
+def test_pin_from_another_state_is_flagged(service):
+    result = _detect(service, pin_code="411001", district="Bangalore", state="Karnataka")
+    assert "PIN code does not match state" in result["reasons"]
@@ -0,0 +1,55 @@
+"""Occupancy index: keys built under another normalizer version are refused until a rebuild"""
+
+import sqlite3
+
+import pytest
+
+from services.occupancy_index import OccupancyIndex, StaleIndexError
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "occupancy.sqlite3")
+
+
+def test_new_index_takes_the_key_version(db_path):
+    index = OccupancyIndex(db_path, key_version="v1")
+    index.upsert([("A1", "house"), ("A2", "house")])
+    assert index.occupancy("house") == 2
+    assert index.stats()["key_version"] == "v1"
+    assert not index.stats()["stale"]
+
+
+def test_index_from_another_version_is_stale_until_rebuilt(db_path):
+    OccupancyIndex(db_path, key_version="v1").load([("A1", "house")])
+    index = OccupancyIndex(db_path, key_version="v2")
+    assert index.stats()["stale"]
+    with pytest.raises(StaleIndexError):
+        index.occupancy("house")
+    with pytest.raises(StaleIndexError):
+        index.occupants("house")
+    with pytest.raises(StaleIndexError):
+        index.upsert([("A2", "house")])
+
+    index.load([("A1", "new-house")], replace=True)
+    assert not index.stats()["stale"]
+    assert index.occupancy("new-house") == 1
+
+
+def test_unversioned_index_is_stale(db_path):
+    # An index written before the meta table existed
+    OccupancyIndex(db_path, key_version="v1").load([("A1", "house")])
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("DELETE FROM meta")
+    index = OccupancyIndex(db_path, key_version="v1")
+    assert index.stats()["key_version"] is None
+    assert index.stats()["stale"]
+
+
+def test_rebuild_by_another_worker_is_seen(db_path):
+    OccupancyIndex(db_path, key_version="v1").load([("A1", "house")])
+    worker = OccupancyIndex(db_path, key_version="v2")
+    with pytest.raises(StaleIndexError):
+        worker.occupancy("house")
+    OccupancyIndex(db_path, key_version="v2").load([("A1", "house")], replace=True)
+    assert worker.occupancy("house") == 1
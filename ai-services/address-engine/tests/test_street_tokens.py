@@ -0,0 +1,41 @@
+"""Street normalization: the speller fixes misspelt address words but leaves real words alone"""
+
+import pytest
+
+from utils.address_normalizer import AddressNormalizer
+from utils.street_tokens import SymmetricDeleteSpeller
+
+
+@pytest.fixture(scope="module")
+def normalizer():
+    return AddressNormalizer(gazetteer=None)
+
+
+@pytest.mark.parametrize("street", [
+    "Agar Road",
+    "Naga Street",
+    "Ross Lane",
+    "Lock Market",
+    "Hose Colony",
+    "Curt Road",
+    "Chow Street"
+])
+def test_short_real_words_are_not_corrected(normalizer, street):
+    # Each first word is one letter short of an address word (Nagar, Cross, Block, ...)
+    assert normalizer.normalize_street(street) == street
+
+
+@pytest.mark.parametrize("street, expected", [
+    ("Gandhi colny", "Gandhi Colony"),
+    ("Station roadd", "Station Road"),
+    ("Nehru stret", "Nehru Street"),
+    ("M.G. Rd", "Mahatma Gandhi Road")
+])
+def test_misspelt_address_words_are_corrected(normalizer, street, expected):
+    assert normalizer.normalize_street(street) == expected
+
+
+def test_speller_ignores_tokens_below_min_length():
+    speller = SymmetricDeleteSpeller(["nagar", "cross", "block", "chowk"])
+    assert [speller.correct(token) for token in ("agar", "ross", "lock", "chow")] == [None] * 4
+    assert speller.correct("naggar") == "nagar"
@@ -0,0 +1,217 @@
+"""
+Near-duplicate address clustering for ghost-house detection
+Normalized addresses are grouped exactly, then spelling and formatting
+variants of the same house are merged by edit similarity of their street
+text, blocked by PIN code and house number (with MinHash/LSH over character
+shingles for very large blocks)
+"""
+
+import hashlib
+import logging
+import re
+import zlib
+from itertools import combinations
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from shared.union_find import UnionFind
+from utils.text_similarity import edit_similarity
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever canonical_key() or address_key() change their output
+KEY_VERSION = 1
+
+# Edit similarity (0-1) of street text at which two address variants are merged
+DEFAULT_SIMILARITY = 0.85
+
+# Blocks with at most this many variants compare every pair; larger ones
+# (typically addresses without a house number) only compare LSH candidates
+EXHAUSTIVE_BLOCK_SIZE = 200
+
+# MinHash signature length and LSH banding (24 bands of 2 rows: pairs at
+# 0.5 shingle Jaccard, such as one swapped letter in a short street name,
+# collide in some band with probability 0.999; candidates are then verified
+# by edit similarity)
+NUM_PERMUTATIONS = 48
+LSH_BANDS = 24
+SHINGLE_SIZE = 3
+
+_TOKEN = re.compile(r'[^\W_]+')
+_DIGIT = re.compile(r'\d')
+_MERSENNE_PRIME = (1 << 31) - 1
+
+
+def address_key(key: Tuple[str, ...]) -> str:
+    """Stable hex digest of a canonical address key (its first 8 characters are the cluster ID)"""
+    return hashlib.sha256("|".join(key).encode()).hexdigest()
+
+
+class AddressClusterer:
+    """
+    Clusters addresses that refer to the same house
+
+    1. Each address is normalized and reduced to a canonical key; identical
+       keys share one variant (so a block of 40 identical registrations is
+       one entry, not 40).
+    2. Variants are blocked by PIN code (city when the PIN is missing) plus
+       the numbers in the house/street text, since different house numbers
+       are different houses however similar the street is.
+    3. Within a block, variants are merged when the edit similarity of the
+       remaining (street) text reaches the threshold, so "Mian Street"
+       joins "Main Street". Small blocks compare every pair. In blocks of
+       more than EXHAUSTIVE_BLOCK_SIZE variants only pairs whose MinHash
+       signatures of character shingles share an LSH band are compared,
+       each against every variant already in that bucket.
+
+    Only voter IDs and counts are kept per cluster, plus the input position
+    of one representative address.
+    """
+
+    def __init__(
+        self,
+        normalize: Callable[[Dict[str, Any]], Dict[str, Any]],
+        similarity: float = DEFAULT_SIMILARITY,
+        num_permutations: int = NUM_PERMUTATIONS,
+        bands: int = LSH_BANDS,
+        seed: int = 1
+    ):
+        if num_permutations % bands:
+            raise ValueError("num_permutations must be a multiple of bands")
+        self.normalize = normalize
+        self.similarity = similarity
+        self.bands = bands
+        self.rows = num_permutations // bands
+        rng = np.random.default_rng(seed)
+        # Universal hashes (a*x + b) mod p with a, b, x < p = 2**31 - 1, so a*x + b fits in
+        # uint64 and is well above p (a smaller modulus than a*x + b would leave it
+        # nearly monotone in x, and every permutation would pick the same minimum)
+        self._a = rng.integers(1, _MERSENNE_PRIME, size=num_permutations, dtype=np.uint64)
+        self._b = rng.integers(0, _MERSENNE_PRIME, size=num_permutations, dtype=np.uint64)
+
+    def cluster(
+        self,
+        addresses: Sequence[Dict[str, Any]],
+        on_progress: Optional[Callable[[float], None]] = None,
+        progress_every: int = 10000
+    ) -> List[Dict[str, Any]]:
+        """
+        Cluster addresses
+
+        on_progress is called with the fraction done every progress_every
+        addresses (it may raise to abort the run).
+
+        Returns:
+            Clusters as {cluster_id, voter_ids, voter_count, variants, representative}
+            where representative is an index into addresses, largest first
+        """
+        total = len(addresses)
+        variant_of: Dict[Tuple[str, ...], int] = {}
+        variant_keys: List[Tuple[str, ...]] = []
+        variant_ids: List[List[Any]] = []
+        variant_first: List[int] = []
+
+        for k, address in enumerate(addresses):
+            if on_progress is not None and k % progress_every == 0:
+                on_progress(0.8 * k / max(1, total))
+            key = self.canonical_key(self.normalize(address))
+            variant = variant_of.get(key)
+            if variant is None:
+                variant = variant_of[key] = len(variant_keys)
+                variant_keys.append(key)
+                variant_ids.append([])
+                variant_first.append(k)
+            variant_ids[variant].append(address.get('voter_id', k))
+        del variant_of
+
+        if on_progress is not None:
+            on_progress(0.8)
+        forest = self._merge_variants(variant_keys)
+        if on_progress is not None:
+            on_progress(0.95)
+
+        members: Dict[int, List[int]] = {}
+        for variant in range(len(variant_keys)):
+            members.setdefault(forest.find(variant), []).append(variant)
+
+        clusters = []
+        for variants in members.values():
+            # The most common spelling stands for the cluster
+            main = max(variants, key=lambda variant: len(variant_ids[variant]))
+            voter_ids = [voter_id for variant in variants for voter_id in variant_ids[variant]]
+            clusters.append({
+                "cluster_id": address_key(variant_keys[main])[:8],
+                "voter_ids": voter_ids,
+                "voter_count": len(voter_ids),
+                "variants": len(variants),
+                "representative": variant_first[main]
+            })
+        clusters.sort(key=lambda cluster: -cluster["voter_count"])
+        logger.info(f"Clustered {total} addresses: {len(variant_keys)} variants, {len(clusters)} clusters")
+        return clusters
+
+    @staticmethod
+    def canonical_key(normalized: Dict[str, Any]) -> Tuple[str, ...]:
+        """(PIN code, city, house and street tokens) of a normalized address"""
+        location = f"{normalized.get('house_number', '')} {normalized.get('street', '')}".lower()
+        return (
+            normalized.get('pin_code', ''),
+            normalized.get('village_city', '').lower(),
+            ' '.join(_TOKEN.findall(location))
+        )
+
+    def _merge_variants(self, keys: List[Tuple[str, ...]]) -> UnionFind:
+        """Union variants in the same block whose street text is similar enough"""
+        forest = UnionFind()
+        blocks: Dict[Tuple[str, str], List[Tuple[int, str]]] = {}
+        for variant, (pin_code, city, location) in enumerate(keys):
+            forest.add(variant)
+            numbers, text = [], []
+            for token in location.split():
+                (numbers if _DIGIT.search(token) else text).append(token)
+            if text:
+                blocks.setdefault((pin_code or city, ' '.join(numbers)), []).append((variant, ' '.join(text)))
+
+        merged = 0
+        for members in blocks.values():
+            if len(members) < 2:
+                continue
+            if len(members) <= EXHAUSTIVE_BLOCK_SIZE:
+                pairs = combinations(members, 2)
+            else:
+                pairs = self._lsh_pairs(members)
+            for (first, first_text), (second, second_text) in pairs:
+                if forest.find(first) == forest.find(second):
+                    continue
+                if edit_similarity(first_text, second_text) >= self.similarity:
+                    forest.union(first, second)
+                    merged += 1
+
+        logger.info(f"Merged {merged} near-duplicate address variants")
+        return forest
+
+    def _lsh_pairs(self, members: List[Tuple[int, str]]) -> Iterator[Tuple[Tuple[int, str], Tuple[int, str]]]:
+        """Each pair of a block's variants that share an LSH bucket, once"""
+        # Buckets only live while their block is processed
+        buckets: Dict[Tuple[int, bytes], List[Tuple[int, str]]] = {}
+        for member in members:
+            text = member[1]
+            shingles = frozenset(text[i:i + SHINGLE_SIZE] for i in range(max(1, len(text) - SHINGLE_SIZE + 1)))
+            signature = self._signature(shingles)
+            partners: Dict[int, Tuple[int, str]] = {}
+            for band in range(self.bands):
+                bucket = buckets.setdefault((band, signature[band * self.rows:(band + 1) * self.rows].tobytes()), [])
+                for other in bucket:
+                    partners[other[0]] = other
+                bucket.append(member)
+            for other in partners.values():
+                yield other, member
+
+    def _signature(self, shingles: frozenset) -> np.ndarray:
+        """MinHash signature of a shingle set"""
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode()) % _MERSENNE_PRIME for shingle in shingles),
+            dtype=np.uint64, count=len(shingles)
+        )
+        return ((np.outer(self._a, hashes) + self._b[:, None]) % _MERSENNE_PRIME).min(axis=1)
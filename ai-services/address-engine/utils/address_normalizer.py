@@ -0,0 +1,144 @@
+"""
+Compiled address normalization pipeline
+Street tokens are expanded, spelling-corrected and phrase-matched by a
+token trie (see StreetTokenNormalizer); other patterns are compiled once
+"""
+
+import logging
+import re
+from typing import Any, Dict, List, Optional
+
+from utils.gazetteer import PinGazetteer
+from utils.street_tokens import StreetTokenNormalizer
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever normalize() can return different house, street, city or PIN
+# text for the same input: persisted address keys built with another version
+# no longer match
+NORMALIZER_VERSION = 1
+
+# Common address abbreviations, including Indian address words
+ADDRESS_ABBREVIATIONS = {
+    'st': 'street', 'str': 'street', 'rd': 'road', 'ave': 'avenue',
+    'blvd': 'boulevard', 'dr': 'drive', 'ln': 'lane', 'ct': 'court',
+    'apt': 'apartment', 'fl': 'floor', 'no': 'number', 'nr': 'near',
+    'ngr': 'nagar', 'mrg': 'marg', 'clny': 'colony', 'sec': 'sector',
+    'sect': 'sector', 'mohl': 'mohalla', 'mkt': 'market', 'chk': 'chowk',
+    'bldg': 'building', 'apts': 'apartments', 'soc': 'society', 'opp': 'opposite',
+    'bhd': 'behind', 'extn': 'extension', 'ext': 'extension', 'vill': 'village',
+    'vil': 'village', 'blk': 'block', 'twr': 'tower', 'hno': 'house number',
+    'rds': 'roads', 'po': 'post office', 'ps': 'police station'
+}
+
+# Multi-word phrases, written with their tokens in any form that expands to
+# the same canonical words ("mg rd" is covered by "mg road")
+ADDRESS_PHRASES = {
+    'h no': 'house number', 'x road': 'cross road', 'x roads': 'cross roads',
+    'mg road': 'mahatma gandhi road', 'm g road': 'mahatma gandhi road',
+    'mg marg': 'mahatma gandhi marg', 'm g marg': 'mahatma gandhi marg'
+}
+
+# Address words the street speller corrects towards (abbreviation expansions are added)
+STREET_VOCABULARY = (
+    'road', 'roads', 'street', 'streets', 'lane', 'lanes', 'avenue', 'nagar',
+    'marg', 'colony', 'colonies', 'sector', 'sectors', 'mohalla', 'chowk', 'bazaar', 'market',
+    'layout', 'enclave', 'vihar', 'society', 'apartment', 'apartments', 'building',
+    'tower', 'towers', 'village', 'opposite', 'behind', 'cross', 'phase', 'block',
+    'extension', 'house', 'number', 'near'
+)
+
+ADDRESS_FIELDS = ('house_number', 'street', 'village_city', 'district', 'state', 'pin_code')
+REQUIRED_FIELDS = ('village_city', 'district', 'state', 'pin_code')
+
+_NON_DIGIT = re.compile(r'\D')
+
+
+def _as_text(value: Any) -> str:
+    """Field value as a string (None and other empty values become "")"""
+    if isinstance(value, str):
+        return value
+    return str(value) if value else ""
+
+
+class AddressNormalizer:
+    """
+    Normalizes address dictionaries field by field
+
+    Text fields are lowercased, whitespace-collapsed and title-cased; streets
+    additionally have abbreviations and phrases expanded and misspelt
+    address words corrected; PIN codes are reduced to six digits. With a
+    gazetteer, districts and states it recognizes (allowing for small
+    misspellings) take the gazetteer's spelling.
+    """
+
+    def __init__(self, abbreviations: Optional[Dict[str, str]] = None, gazetteer: Optional[PinGazetteer] = None):
+        self.abbreviations = dict(abbreviations or ADDRESS_ABBREVIATIONS)
+        self.gazetteer = gazetteer
+        self.street_tokens = StreetTokenNormalizer(self.abbreviations, ADDRESS_PHRASES, STREET_VOCABULARY)
+
+    def normalize(self, address: Dict[str, Any]) -> Dict[str, Any]:
+        """Normalize one address and score its completeness"""
+        normalized = {
+            'house_number': self.normalize_text(address.get('house_number', '')),
+            'street': self.normalize_street(address.get('street', '')),
+            'village_city': self.normalize_text(address.get('village_city', '')),
+            'district': self.normalize_text(address.get('district', '')),
+            'state': self.normalize_text(address.get('state', '')),
+            'pin_code': self.normalize_pincode(address.get('pin_code', ''))
+        }
+        if self.gazetteer is not None:
+            gazetteer = self.gazetteer
+            normalized['state'] = gazetteer.canonical_state(normalized['state']) or normalized['state']
+            normalized['district'] = gazetteer.canonical_district(
+                normalized['district'], normalized['pin_code'], normalized['state']
+            ) or normalized['district']
+        return {
+            "normalized_address": normalized,
+            "confidence": self.confidence(normalized)
+        }
+
+    def cache_key(self, address: Dict[str, Any]) -> tuple:
+        """
+        Canonical form of a raw address for caching normalize results
+
+        Text fields are lowercased and whitespace-collapsed, which normalize
+        ignores anyway, and the PIN code is reduced to its normalized digits.
+        Two addresses with the same key always normalize identically; keys
+        ignore fields that normalize does not read.
+        """
+        key = [' '.join(_as_text(address.get(field, '')).lower().split()) for field in ADDRESS_FIELDS[:-1]]
+        key.append(self.normalize_pincode(address.get('pin_code', '')))
+        return tuple(key)
+
+    def normalize_many(self, addresses: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Normalize a list of addresses, in order"""
+        normalize = self.normalize
+        return [normalize(address) for address in addresses]
+
+    def normalize_text(self, text: Any) -> str:
+        """Lowercase, collapse whitespace and capitalize each word"""
+        text = _as_text(text)
+        if not text:
+            return ""
+        return ' '.join(word.capitalize() for word in text.lower().split())
+
+    def normalize_street(self, street: Any) -> str:
+        """Normalize a street name: expand abbreviations and phrases, correct address words"""
+        street = _as_text(street)
+        if not street:
+            return ""
+        return self.street_tokens.normalize(street)
+
+    def normalize_pincode(self, pincode: Any) -> str:
+        """Keep the digits of a PIN code, padded or cut to six (Indian PIN codes)"""
+        if not pincode:
+            return ""
+        digits = _NON_DIGIT.sub('', str(pincode))
+        if len(digits) >= 6:
+            return digits[:6]
+        return digits.zfill(6)
+
+    def confidence(self, normalized: Dict[str, Any]) -> float:
+        """Share of the required location fields that are present"""
+        return sum(1 for field in REQUIRED_FIELDS if normalized.get(field)) / len(REQUIRED_FIELDS)
@@ -0,0 +1,346 @@
+"""
+PIN-code gazetteer
+Loads a PIN code / district / state table into sorted arrays and small name
+indexes on first use, so localities can be canonicalized and PIN codes
+checked against their district and state without scanning the table
+"""
+
+import csv
+import logging
+import re
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.text_similarity import edit_similarity
+
+logger = logging.getLogger(__name__)
+
+# Similarity (0-1) a misspelt district or state needs to be corrected
+DEFAULT_MIN_SIMILARITY = 0.8
+
+# States served by each postal circle, by the first two PIN digits. Used for
+# PIN codes the table does not list; neighbouring territories are included.
+PIN_CIRCLE_STATES = {
+    '11': ('Delhi',),
+    '12': ('Haryana',), '13': ('Haryana',),
+    '14': ('Punjab',), '15': ('Punjab',), '16': ('Punjab', 'Chandigarh', 'Haryana'),
+    '17': ('Himachal Pradesh',),
+    '18': ('Jammu and Kashmir',), '19': ('Jammu and Kashmir', 'Ladakh'),
+    '20': ('Uttar Pradesh',), '21': ('Uttar Pradesh',), '22': ('Uttar Pradesh',), '23': ('Uttar Pradesh',),
+    '24': ('Uttar Pradesh', 'Uttarakhand'), '25': ('Uttar Pradesh', 'Uttarakhand'),
+    '26': ('Uttar Pradesh', 'Uttarakhand'), '27': ('Uttar Pradesh',), '28': ('Uttar Pradesh',),
+    '30': ('Rajasthan',), '31': ('Rajasthan',), '32': ('Rajasthan',), '33': ('Rajasthan',), '34': ('Rajasthan',),
+    '36': ('Gujarat',), '37': ('Gujarat',), '38': ('Gujarat',),
+    '39': ('Gujarat', 'Dadra and Nagar Haveli and Daman and Diu'),
+    '40': ('Maharashtra', 'Goa'), '41': ('Maharashtra',), '42': ('Maharashtra',),
+    '43': ('Maharashtra',), '44': ('Maharashtra',),
+    '45': ('Madhya Pradesh',), '46': ('Madhya Pradesh',), '47': ('Madhya Pradesh',),
+    '48': ('Madhya Pradesh',), '49': ('Chhattisgarh',),
+    '50': ('Telangana', 'Andhra Pradesh'), '51': ('Andhra Pradesh', 'Telangana'),
+    '52': ('Andhra Pradesh',), '53': ('Andhra Pradesh',),
+    '56': ('Karnataka',), '57': ('Karnataka',), '58': ('Karnataka',), '59': ('Karnataka',),
+    '60': ('Tamil Nadu', 'Puducherry'), '61': ('Tamil Nadu',), '62': ('Tamil Nadu',),
+    '63': ('Tamil Nadu',), '64': ('Tamil Nadu',),
+    '67': ('Kerala', 'Puducherry'), '68': ('Kerala', 'Lakshadweep'), '69': ('Kerala',),
+    '70': ('West Bengal',), '71': ('West Bengal',), '72': ('West Bengal',),
+    '73': ('West Bengal', 'Sikkim'), '74': ('West Bengal', 'Andaman and Nicobar Islands'),
+    '75': ('Odisha',), '76': ('Odisha',), '77': ('Odisha',),
+    '78': ('Assam',),
+    '79': ('Arunachal Pradesh', 'Manipur', 'Meghalaya', 'Mizoram', 'Nagaland', 'Tripura'),
+    '80': ('Bihar', 'Jharkhand'), '81': ('Bihar', 'Jharkhand'), '82': ('Bihar', 'Jharkhand'),
+    '83': ('Jharkhand', 'Bihar'), '84': ('Bihar',), '85': ('Bihar', 'Jharkhand')
+}
+
+# First digit of Army Postal Service PIN codes (field post offices), which
+# are valid but belong to no state or district
+ARMY_POSTAL_PIN_PREFIX = '9'
+
+# Column names accepted for each field (the India Post directory uses the long ones)
+_PIN_COLUMNS = ('pincode', 'pin_code', 'pin')
+_DISTRICT_COLUMNS = ('district', 'districtname', 'district_name')
+_STATE_COLUMNS = ('state', 'statename', 'state_name')
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+
+# Trigram candidates checked with the full similarity when no PIN or state narrows the search
+_FUZZY_CANDIDATES = 8
+
+
+def fold_name(name: Any) -> str:
+    """Comparison form of a place name: lowercase letters and digits only, "&" read as "and" """
+    if not name:
+        return ""
+    return _NON_ALNUM.sub('', str(name).lower().replace('&', 'and'))
+
+
+def _trigrams(folded: str) -> set:
+    """Character trigrams of a folded name, padded so short names still have some"""
+    padded = f"^{folded}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _column(header: Sequence[str], names: Tuple[str, ...], path: str) -> int:
+    """Index of the first header cell matching one of names"""
+    folded = [cell.strip().lower() for cell in header]
+    for name in names:
+        if name in folded:
+            return folded.index(name)
+    raise ValueError(f"Gazetteer {path} has no {names[0]} column")
+
+
+class PinGazetteer:
+    """
+    PIN code to district and state lookups
+
+    The CSV is read on first use. PIN codes become a sorted int32 array
+    with a parallel array of district numbers, so a PIN, or every PIN
+    sharing its first three digits (one sorting district), is found by
+    binary search. Districts and states are indexed by folded name, plus a
+    trigram index for correcting misspellings. Loading is thread-safe and
+    happens once per process.
+    """
+
+    def __init__(self, path: str, min_similarity: float = DEFAULT_MIN_SIMILARITY):
+        self.path = path
+        self.min_similarity = min_similarity
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def _ensure_loaded(self) -> None:
+        """Build the lookup tables on first use"""
+        if self._loaded:
+            return
+        with self._lock:
+            if not self._loaded:
+                try:
+                    rows = self._read_rows()
+                except (OSError, ValueError) as e:
+                    # Normalization must keep working; only the PIN checks are lost
+                    logger.error(f"Could not load gazetteer {self.path}: {str(e)}")
+                    rows = []
+                self._compile(rows)
+                self._loaded = True
+
+    def _read_rows(self) -> List[Tuple[str, str, str]]:
+        """(PIN code, district, state) rows of the CSV, skipping malformed ones"""
+        rows = []
+        with open(self.path, newline='', encoding='utf-8') as handle:
+            reader = csv.reader(handle)
+            header = next(reader, None)
+            if header is None:
+                raise ValueError(f"Gazetteer {self.path} is empty")
+            pin_column = _column(header, _PIN_COLUMNS, self.path)
+            district_column = _column(header, _DISTRICT_COLUMNS, self.path)
+            state_column = _column(header, _STATE_COLUMNS, self.path)
+            for row in reader:
+                try:
+                    pin = row[pin_column].strip()
+                    district = ' '.join(row[district_column].split())
+                    state = ' '.join(row[state_column].split())
+                except IndexError:
+                    continue
+                if len(pin) == 6 and pin.isdigit() and district and state:
+                    # The India Post directory is in capitals
+                    rows.append((pin, district.title() if district.isupper() else district,
+                                 state.title() if state.isupper() else state))
+        return rows
+
+    def _compile(self, rows: List[Tuple[str, str, str]]) -> None:
+        """Build the sorted PIN arrays and name indexes"""
+        states: List[str] = []
+        state_ids: Dict[str, int] = {}
+        districts: List[str] = []
+        district_states: List[int] = []
+        district_ids: Dict[Tuple[str, int], int] = {}
+        pairs = set()
+
+        def state_id(name: str) -> int:
+            folded = fold_name(name)
+            if folded not in state_ids:
+                state_ids[folded] = len(states)
+                states.append(name)
+            return state_ids[folded]
+
+        for pin, district, state in rows:
+            sid = state_id(state)
+            key = (fold_name(district), sid)
+            if key not in district_ids:
+                district_ids[key] = len(districts)
+                districts.append(district)
+                district_states.append(sid)
+            pairs.add((int(pin), district_ids[key]))
+
+        for circle_states in PIN_CIRCLE_STATES.values():
+            for state in circle_states:
+                state_id(state)
+
+        ordered = sorted(pairs)
+        self._pins = np.array([pin for pin, _ in ordered], dtype=np.int32)
+        self._pin_districts = np.array([district for _, district in ordered], dtype=np.int32)
+        self.states = states
+        self.districts = districts
+        self._district_states = np.array(district_states, dtype=np.int32)
+        self._state_ids = state_ids
+        self._districts_by_name: Dict[str, List[int]] = {}
+        self._districts_by_state: Dict[int, List[int]] = {}
+        self._district_trigrams: Dict[str, List[int]] = {}
+        for (folded, sid), did in district_ids.items():
+            self._districts_by_name.setdefault(folded, []).append(did)
+            self._districts_by_state.setdefault(sid, []).append(did)
+            for trigram in _trigrams(folded):
+                self._district_trigrams.setdefault(trigram, []).append(did)
+        self._folded_districts = [fold_name(district) for district in districts]
+        logger.info(
+            f"Loaded gazetteer {self.path}: {len(self._pins)} PIN/district rows, "
+            f"{len(districts)} districts, {len(states)} states"
+        )
+
+    def districts_for_pin(self, pin_code: str) -> Tuple[List[int], bool]:
+        """
+        District numbers for a PIN code
+
+        Returns:
+            (districts, exact): the PIN's own districts with exact=True, or
+            when it is not listed, the districts of every PIN with the same
+            first three digits with exact=False
+        """
+        self._ensure_loaded()
+        if len(pin_code) != 6 or not pin_code.isdigit():
+            return [], False
+        pin = int(pin_code)
+        start, end = np.searchsorted(self._pins, [pin, pin + 1])
+        if end > start:
+            return sorted(set(self._pin_districts[start:end].tolist())), True
+        low = pin - pin % 1000
+        start, end = np.searchsorted(self._pins, [low, low + 1000])
+        return sorted(set(self._pin_districts[start:end].tolist())), False
+
+    def canonical_state(self, name: Any) -> Optional[str]:
+        """Table spelling of a state name, correcting small misspellings; None if unknown"""
+        self._ensure_loaded()
+        folded = fold_name(name)
+        if not folded:
+            return None
+        sid = self._state_ids.get(folded)
+        if sid is None:
+            sid = self._closest(folded, self._state_ids.items())
+        return self.states[sid] if sid is not None else None
+
+    def canonical_district(self, name: Any, pin_code: str = '', state: str = '') -> Optional[str]:
+        """
+        Table spelling of a district name; None if unknown
+
+        Misspellings are corrected against the districts of the PIN code
+        first, then of the state, then against the whole table.
+        """
+        self._ensure_loaded()
+        folded = fold_name(name)
+        if not folded:
+            return None
+        if folded in self._districts_by_name:
+            return self.districts[self._districts_by_name[folded][0]]
+
+        pools = []
+        pin_districts, _ = self.districts_for_pin(pin_code)
+        if pin_districts:
+            pools.append(pin_districts)
+        sid = self._state_ids.get(fold_name(state))
+        if sid is not None:
+            pools.append(self._districts_by_state.get(sid, []))
+        pools.append(self._trigram_candidates(folded))
+        for pool in pools:
+            did = self._closest(folded, ((self._folded_districts[did], did) for did in pool))
+            if did is not None:
+                return self.districts[did]
+        return None
+
+    def check(self, pin_code: str, district: str, state: str) -> List[str]:
+        """
+        Inconsistencies between a normalized PIN code, district and state
+
+        Only fields that are present and recognized are compared; Army
+        Postal Service PIN codes are not checked.
+        """
+        self._ensure_loaded()
+        if len(pin_code) != 6 or not pin_code.isdigit() or pin_code.startswith(ARMY_POSTAL_PIN_PREFIX):
+            return []
+        pin_districts, exact = self.districts_for_pin(pin_code)
+        circle_states = PIN_CIRCLE_STATES.get(pin_code[:2])
+        if not pin_districts and circle_states is None:
+            return ["PIN code is outside India's postal regions"]
+
+        reasons = []
+        if exact and district:
+            district_names = self._districts_by_name.get(fold_name(district))
+            if district_names and not set(district_names) & set(pin_districts):
+                reasons.append("PIN code does not match district")
+        sid = self._state_ids.get(fold_name(state))
+        if sid is not None:
+            if pin_districts:
+                expected = {int(self._district_states[did]) for did in pin_districts}
+            else:
+                expected = {self._state_ids[fold_name(name)] for name in circle_states}
+            if sid not in expected:
+                reasons.append("PIN code does not match state")
+        return reasons
+
+    def lookup(self, pin_code: str) -> Dict[str, Any]:
+        """
+        Districts and states known for a PIN code
+
+        Raises:
+            ValueError: if pin_code is not six digits
+        """
+        if len(pin_code) != 6 or not pin_code.isdigit():
+            raise ValueError(f"PIN code must be six digits, got {pin_code!r}")
+        pin_districts, exact = self.districts_for_pin(pin_code)
+        return {
+            "pin_code": pin_code,
+            "listed": exact,
+            "districts": [
+                {"district": self.districts[did], "state": self.states[int(self._district_states[did])]}
+                for did in pin_districts
+            ],
+            "circle_states": list(PIN_CIRCLE_STATES.get(pin_code[:2], ()))
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """Table size"""
+        self._ensure_loaded()
+        return {
+            "path": self.path,
+            "pin_rows": int(len(self._pins)),
+            "districts": len(self.districts),
+            "states": len(self.states)
+        }
+
+    def _trigram_candidates(self, folded: str) -> List[int]:
+        """Districts sharing the most trigrams with a folded name"""
+        counts: Dict[int, int] = {}
+        for trigram in _trigrams(folded):
+            for did in self._district_trigrams.get(trigram, ()):
+                counts[did] = counts.get(did, 0) + 1
+        return sorted(counts, key=counts.get, reverse=True)[:_FUZZY_CANDIDATES]
+
+    def _closest(self, folded: str, candidates) -> Optional[Any]:
+        """Value of the (folded name, value) candidate most similar to folded, if similar enough"""
+        best, best_score = None, self.min_similarity
+        for candidate, value in candidates:
+            score = edit_similarity(folded, candidate)
+            if score >= best_score:
+                best, best_score = value, score
+        return best
+
+
+_shared: Dict[str, PinGazetteer] = {}
+_shared_lock = threading.Lock()
+
+
+def shared_gazetteer(path: str) -> PinGazetteer:
+    """The process-wide gazetteer for a file, so every service and job thread uses one copy"""
+    with _shared_lock:
+        if path not in _shared:
+            _shared[path] = PinGazetteer(path)
+        return _shared[path]
@@ -0,0 +1,151 @@
+"""
+Token-level street normalizer
+Each whitespace token is folded, expanded if it is an abbreviation or
+spelling-corrected against a vocabulary of address words; a token trie then
+replaces the longest known multi-word phrase at each position
+"""
+
+import logging
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Shortest token the speller will touch. Shorter ones are too often initials,
+# codes or real words one letter off an address word ("Agar", "Ross", "Hose")
+MIN_CORRECTION_LENGTH = 5
+
+# Distinct tokens whose analysis is remembered (rolls reuse a small vocabulary)
+TOKEN_MEMO_SIZE = 100000
+
+_PUNCTUATION = re.compile(r'\W+')
+
+
+class SymmetricDeleteSpeller:
+    """
+    Corrects one missing or extra letter against a fixed vocabulary
+
+    Every single-letter deletion of each vocabulary word is precomputed, so
+    a token is corrected with a handful of dictionary lookups: the token
+    itself among the deletions (a letter was left out, "colny") or one of
+    the token's own deletions among the words (a doubled letter, "roadd").
+    Substitutions and other extra letters are not corrected, since they
+    would turn genuine names ("Nagari") into address words; a token with
+    more than one candidate is left alone.
+    """
+
+    def __init__(self, vocabulary: Iterable[str], min_length: int = MIN_CORRECTION_LENGTH):
+        self.words = frozenset(vocabulary)
+        self.min_length = min_length
+        self._deletes: Dict[str, set] = {}
+        for word in self.words:
+            if len(word) > min_length:
+                for i in range(len(word)):
+                    self._deletes.setdefault(word[:i] + word[i + 1:], set()).add(word)
+
+    def correct(self, token: str) -> Optional[str]:
+        """The vocabulary word one missing or doubled letter away from token, if there is exactly one"""
+        if len(token) < self.min_length or token in self.words or not token.isalpha():
+            return None
+        candidates = set(self._deletes.get(token, ()))
+        words = self.words
+        for i in range(1, len(token)):
+            if token[i] == token[i - 1]:
+                deleted = token[:i] + token[i + 1:]
+                if deleted in words:
+                    candidates.add(deleted)
+        return candidates.pop() if len(candidates) == 1 else None
+
+
+class _TrieNode:
+    """Phrase trie node keyed by canonical tokens"""
+
+    __slots__ = ('children', 'expansion')
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.expansion: Optional[str] = None
+
+
+class StreetTokenNormalizer:
+    """
+    Expands abbreviations and phrases and fixes misspelt address words
+
+    A token's canonical form is its abbreviation expansion, its spelling
+    correction or simply its folded form (lowercase, punctuation removed).
+    Phrases are matched on canonical forms, longest first, so "M.G. Rd" and
+    "mg road" both reach "mahatma gandhi road". Tokens that are none of
+    these keep their text and are only capitalized.
+    """
+
+    def __init__(
+        self,
+        abbreviations: Dict[str, str],
+        phrases: Optional[Dict[str, str]] = None,
+        vocabulary: Iterable[str] = ()
+    ):
+        self.abbreviations = abbreviations
+        self.speller = SymmetricDeleteSpeller(set(vocabulary) | {
+            word for expansion in abbreviations.values() for word in expansion.split()
+        })
+        self._memo: Dict[str, Tuple[str, str]] = {}
+        self._root = _TrieNode()
+        for phrase, expansion in (phrases or {}).items():
+            node = self._root
+            for token in phrase.split():
+                node = node.children.setdefault(self._analyze(token)[0], _TrieNode())
+            node.expansion = _capitalize(expansion)
+        logger.info(
+            f"StreetTokenNormalizer: {len(abbreviations)} abbreviations, "
+            f"{len(phrases or {})} phrases, {len(self.speller.words)} vocabulary words"
+        )
+
+    def normalize(self, street: str) -> str:
+        """Normalized, capitalized form of a street"""
+        memo = self._memo
+        analyzed = []
+        for token in street.lower().split():
+            entry = memo.get(token)
+            if entry is None:
+                entry = self._analyze(token)
+                if len(memo) >= TOKEN_MEMO_SIZE:
+                    memo.clear()
+                memo[token] = entry
+            analyzed.append(entry)
+
+        root = self._root.children
+        if not any(canonical in root for canonical, _ in analyzed):
+            return ' '.join(text for _, text in analyzed if text)
+
+        words: List[str] = []
+        i, count = 0, len(analyzed)
+        while i < count:
+            node = root.get(analyzed[i][0])
+            end, expansion = i, None
+            j = i
+            while node is not None:
+                if node.expansion is not None:
+                    end, expansion = j, node.expansion
+                j += 1
+                node = node.children.get(analyzed[j][0]) if j < count else None
+            if expansion is None:
+                expansion = analyzed[i][1]
+            if expansion:
+                words.append(expansion)
+            i = end + 1
+        return ' '.join(words)
+
+    def _analyze(self, token: str) -> Tuple[str, str]:
+        """(canonical form, capitalized output) of one lowercased token"""
+        folded = _PUNCTUATION.sub('', token)
+        expansion = self.abbreviations.get(folded)
+        if expansion is None:
+            expansion = self.speller.correct(folded)
+        if expansion is not None:
+            return expansion, _capitalize(expansion)
+        return folded, token.capitalize()
+
+
+def _capitalize(text: str) -> str:
+    """Capitalize every word"""
+    return ' '.join(word.capitalize() for word in text.split())
@@ -0,0 +1,18 @@
+"""
+Edit-based similarity of short strings
+Uses rapidfuzz when it is installed and difflib otherwise
+"""
+
+import difflib
+
+try:
+    from rapidfuzz.fuzz import ratio as _rapid_ratio
+except ImportError:  # pragma: no cover - depends on the environment
+    _rapid_ratio = None
+
+
+def edit_similarity(first: str, second: str) -> float:
+    """Similarity of two strings from their edit distance relative to their length, 0-1"""
+    if _rapid_ratio is not None:
+        return _rapid_ratio(first, second) / 100.0
+    return difflib.SequenceMatcher(None, first, second).ratio()
@@ -1,53 +1,186 @@
 """Biometric Matching Engine (Face + Fingerprint)"""
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List
+from pydantic import BaseModel, Field, model_validator
+from typing import Any, List, Optional
+import asyncio
 import logging
+import os
+import sys
 import numpy as np
 from datetime import datetime
 
+# Modules shared by the AI services live in ai-services/shared
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.gallery import EmbeddingGallery
+from services.gallery_store import GalleryStore
+from services.embedding_codec import decode_embedding_b64, decode_embedding_bytes
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = FastAPI(title="Biometric Matching Engine", version="1.0.0")
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
 
+def pick_embedding(values: Optional[List[float]], encoded: Optional[str], name: str) -> np.ndarray:
+    """Return a float32 embedding from either the JSON list or the base64 float32 field"""
+    if encoded is not None:
+        return decode_embedding_b64(encoded)
+    if values is not None:
+        return np.asarray(values, dtype=np.float32)
+    raise ValueError(f"Either {name} or {name}_b64 is required")
+
 class MatchRequest(BaseModel):
-    embedding1: List[float]
-    embedding2: List[float]
+    """Embeddings as JSON float lists, or as base64 little-endian float32 bytes (*_b64)"""
+    embedding1: Optional[List[float]] = None
+    embedding2: Optional[List[float]] = None
+    embedding1_b64: Optional[str] = None
+    embedding2_b64: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_embeddings(self):
+        for name in ("embedding1", "embedding2"):
+            if getattr(self, name) is None and getattr(self, f"{name}_b64") is None:
+                raise ValueError(f"Either {name} or {name}_b64 is required")
+        return self
+
+    def vectors(self):
+        return (
+            pick_embedding(self.embedding1, self.embedding1_b64, "embedding1"),
+            pick_embedding(self.embedding2, self.embedding2_b64, "embedding2"),
+        )
 
 class MatchResponse(BaseModel):
     match_probability: float
     similarity_score: float
     confidence: float
 
+class GalleryItem(BaseModel):
+    id: Any
+    embedding: Optional[List[float]] = None
+    embedding_b64: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_embedding(self):
+        if self.embedding is None and self.embedding_b64 is None:
+            raise ValueError("Either embedding or embedding_b64 is required")
+        return self
+
+class EnrollRequest(BaseModel):
+    items: List[GalleryItem]
+
+class RemoveRequest(BaseModel):
+    ids: List[Any]
+
+class SearchRequest(BaseModel):
+    embedding: Optional[List[float]] = None
+    embedding_b64: Optional[str] = None
+    top_k: int = Field(10, ge=1, le=1000)
+    min_probability: float = Field(0.0, ge=0.0, le=1.0)
+
+    @model_validator(mode="after")
+    def check_embedding(self):
+        if self.embedding is None and self.embedding_b64 is None:
+            raise ValueError("Either embedding or embedding_b64 is required")
+        return self
+
+class SearchMatch(BaseModel):
+    id: Any
+    match_probability: float
+    similarity_score: float
+    confidence: float
+
+class SearchResponse(BaseModel):
+    matches: List[SearchMatch]
+    gallery_size: int
+
+# Server-side galleries for one-to-many search, one per modality. With
+# BIOMETRIC_GALLERY_DIR set, galleries are persistent memory-mapped stores
+# shared by all workers; otherwise they live in this process's memory.
+GALLERY_DIR = os.getenv("BIOMETRIC_GALLERY_DIR")
+
+def create_gallery(modality: str):
+    if GALLERY_DIR:
+        return GalleryStore(os.path.join(GALLERY_DIR, modality), modality)
+    return EmbeddingGallery(modality)
+
+galleries = {
+    "face": create_gallery("face"),
+    "fingerprint": create_gallery("fingerprint"),
+}
+
+def face_scores(similarity: float) -> dict:
+    """Convert a face cosine similarity into match scores"""
+    similarity = max(0.0, min(1.0, similarity))
+    return {
+        "match_probability": similarity ** 2,  # Square to make it more conservative
+        "similarity_score": similarity,
+        "confidence": 0.9 if similarity > 0.9 else 0.7
+    }
+
+def fingerprint_scores(similarity: float) -> dict:
+    """Convert a fingerprint cosine similarity into match scores"""
+    similarity = max(0.0, min(1.0, similarity))
+    return {
+        "match_probability": similarity ** 1.5,  # Fingerprint matching is typically more strict
+        "similarity_score": similarity,
+        "confidence": 0.95 if similarity > 0.85 else 0.6
+    }
+
+SCORERS = {"face": face_scores, "fingerprint": fingerprint_scores}
+
+def get_gallery(modality: str) -> EmbeddingGallery:
+    if modality not in galleries:
+        raise HTTPException(status_code=404, detail=f"Unknown modality: {modality}")
+    return galleries[modality]
+
 @app.get("/health")
 async def health():
     return {"status": "ok", "timestamp": datetime.utcnow().isoformat(), "service": "biometric-engine"}
 
+def cosine_similarity(embedding1: np.ndarray, embedding2: np.ndarray) -> float:
+    """Cosine similarity of two float32 embeddings"""
+    emb1 = np.asarray(embedding1, dtype=np.float32)
+    emb2 = np.asarray(embedding2, dtype=np.float32)
+    if emb1.shape != emb2.shape:
+        raise ValueError(f"Embedding shapes {emb1.shape} and {emb2.shape} differ")
+    
+    # Normalize
+    emb1_norm = emb1 / (np.linalg.norm(emb1) + np.float32(1e-8))
+    emb2_norm = emb2 / (np.linalg.norm(emb2) + np.float32(1e-8))
+    
+    return float(np.dot(emb1_norm, emb2_norm))
+
+def split_raw_pair(data: bytes):
+    """Split an octet-stream body holding two concatenated float32 embeddings"""
+    vector = decode_embedding_bytes(data)
+    if vector.size % 2:
+        raise ValueError("Raw body must contain two float32 embeddings of equal length")
+    half = vector.size // 2
+    return vector[:half], vector[half:]
+
+async def read_octet_stream(request: Request) -> bytes:
+    content_type = request.headers.get("content-type", "")
+    if not content_type.startswith("application/octet-stream"):
+        raise HTTPException(status_code=415, detail="Expected application/octet-stream body")
+    return await request.body()
+
+def match_vectors(modality: str, emb1: np.ndarray, emb2: np.ndarray) -> MatchResponse:
+    try:
+        similarity = cosine_similarity(emb1, emb2)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return MatchResponse(**SCORERS[modality](similarity))
+
 @app.post("/match-face", response_model=MatchResponse)
 async def match_face(request: MatchRequest):
     try:
-        emb1 = np.array(request.embedding1)
-        emb2 = np.array(request.embedding2)
-        
-        # Normalize
-        emb1_norm = emb1 / (np.linalg.norm(emb1) + 1e-8)
-        emb2_norm = emb2 / (np.linalg.norm(emb2) + 1e-8)
-        
-        # Cosine similarity
-        similarity = float(np.dot(emb1_norm, emb2_norm))
-        similarity = max(0.0, min(1.0, similarity))
-        
-        # Convert to probability
-        prob = similarity ** 2  # Square to make it more conservative
-        
-        return MatchResponse(
-            match_probability=prob,
-            similarity_score=similarity,
-            confidence=0.9 if similarity > 0.9 else 0.7
-        )
+        return match_vectors("face", *request.vectors())
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -55,30 +188,129 @@ async def match_face(request: MatchRequest):
 @app.post("/match-fingerprint", response_model=MatchResponse)
 async def match_fingerprint(request: MatchRequest):
     try:
-        # Similar logic to face matching
-        template1 = np.array(request.embedding1)
-        template2 = np.array(request.embedding2)
-        
-        # Normalize
-        t1_norm = template1 / (np.linalg.norm(template1) + 1e-8)
-        t2_norm = template2 / (np.linalg.norm(template2) + 1e-8)
-        
-        # Cosine similarity
-        similarity = float(np.dot(t1_norm, t2_norm))
-        similarity = max(0.0, min(1.0, similarity))
-        
-        # Fingerprint matching is typically more strict
-        prob = similarity ** 1.5
-        
-        return MatchResponse(
-            match_probability=prob,
-            similarity_score=similarity,
-            confidence=0.95 if similarity > 0.85 else 0.6
-        )
+        return match_vectors("fingerprint", *request.vectors())
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/match-face/raw", response_model=MatchResponse)
+async def match_face_raw(request: Request):
+    """Body: two concatenated little-endian float32 embeddings (application/octet-stream)"""
+    try:
+        return match_vectors("face", *split_raw_pair(await read_octet_stream(request)))
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/match-fingerprint/raw", response_model=MatchResponse)
+async def match_fingerprint_raw(request: Request):
+    """Body: two concatenated little-endian float32 embeddings (application/octet-stream)"""
+    try:
+        return match_vectors("fingerprint", *split_raw_pair(await read_octet_stream(request)))
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/gallery/{modality}/enroll")
+async def enroll(modality: str, request: EnrollRequest):
+    gallery = get_gallery(modality)
+    try:
+        embeddings = [pick_embedding(item.embedding, item.embedding_b64, "embedding") for item in request.items]
+        enrolled = await asyncio.to_thread(gallery.enroll, [item.id for item in request.items], embeddings)
+        return {"enrolled": enrolled, **(await asyncio.to_thread(gallery.stats))}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/gallery/{modality}/remove")
+async def remove(modality: str, request: RemoveRequest):
+    gallery = get_gallery(modality)
+    removed = await asyncio.to_thread(gallery.remove, request.ids)
+    return {"removed": removed, **(await asyncio.to_thread(gallery.stats))}
+
+@app.get("/gallery/{modality}/stats")
+async def gallery_stats(modality: str):
+    return await asyncio.to_thread(get_gallery(modality).stats)
+
+@app.post("/gallery/{modality}/compact")
+async def compact_gallery(modality: str):
+    gallery = get_gallery(modality)
+    if not isinstance(gallery, GalleryStore):
+        raise HTTPException(status_code=400, detail="Compaction requires BIOMETRIC_GALLERY_DIR (persistent gallery store)")
+    # Compaction rewrites every segment under the write lock
+    return await asyncio.to_thread(gallery.compact)
+
+def search_gallery(modality: str, probe: np.ndarray, top_k: int, min_probability: float) -> SearchResponse:
+    """Score one probe against a gallery and keep the top-k matches"""
+    gallery = get_gallery(modality)
+    try:
+        hits = gallery.search(probe, top_k=top_k)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    scorer = SCORERS[modality]
+    matches = []
+    for gallery_id, similarity in hits:
+        scores = scorer(similarity)
+        if scores["match_probability"] < min_probability:
+            break
+        matches.append(SearchMatch(id=gallery_id, **scores))
+    return SearchResponse(matches=matches, gallery_size=len(gallery))
+
+async def search(modality: str, request: SearchRequest) -> SearchResponse:
+    try:
+        probe = pick_embedding(request.embedding, request.embedding_b64, "embedding")
+        return await asyncio.to_thread(search_gallery, modality, probe, request.top_k, request.min_probability)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def search_raw(modality: str, request: Request, top_k: int, min_probability: float) -> SearchResponse:
+    try:
+        probe = decode_embedding_bytes(await read_octet_stream(request))
+        return await asyncio.to_thread(search_gallery, modality, probe, top_k, min_probability)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/search-face", response_model=SearchResponse)
+async def search_face(request: SearchRequest):
+    return await search("face", request)
+
+@app.post("/search-fingerprint", response_model=SearchResponse)
+async def search_fingerprint(request: SearchRequest):
+    return await search("fingerprint", request)
+
+@app.post("/search-face/raw", response_model=SearchResponse)
+async def search_face_raw(
+    request: Request,
+    top_k: int = Query(10, ge=1, le=1000),
+    min_probability: float = Query(0.0, ge=0.0, le=1.0)
+):
+    """Body: probe as little-endian float32 bytes (application/octet-stream)"""
+    return await search_raw("face", request, top_k, min_probability)
+
+@app.post("/search-fingerprint/raw", response_model=SearchResponse)
+async def search_fingerprint_raw(
+    request: Request,
+    top_k: int = Query(10, ge=1, le=1000),
+    min_probability: float = Query(0.0, ge=0.0, le=1.0)
+):
+    """Body: probe as little-endian float32 bytes (application/octet-stream)"""
+    return await search_raw("fingerprint", request, top_k, min_probability)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8006)
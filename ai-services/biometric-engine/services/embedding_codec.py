@@ -0,0 +1,35 @@
+"""
+Binary embedding transport: raw little-endian float32 vectors
+"""
+
+import base64
+import binascii
+
+import numpy as np
+
+FLOAT32_LE = np.dtype('<f4')
+
+
+def decode_embedding_bytes(data: bytes) -> np.ndarray:
+    """
+    View raw little-endian float32 bytes as a 1-D float32 array
+
+    np.frombuffer does not copy, so the array shares memory with data.
+    """
+    if len(data) == 0 or len(data) % FLOAT32_LE.itemsize:
+        raise ValueError(f"Embedding payload of {len(data)} bytes is not a non-empty float32 vector")
+    return np.frombuffer(data, dtype=FLOAT32_LE)
+
+
+def decode_embedding_b64(data: str) -> np.ndarray:
+    """Decode a base64 string of little-endian float32 bytes"""
+    try:
+        raw = base64.b64decode(data, validate=True)
+    except (binascii.Error, ValueError) as e:
+        raise ValueError(f"Invalid base64 embedding: {str(e)}")
+    return decode_embedding_bytes(raw)
+
+
+def encode_embedding_b64(embedding) -> str:
+    """Encode an embedding as base64 little-endian float32 bytes"""
+    return base64.b64encode(np.asarray(embedding, dtype=FLOAT32_LE).tobytes()).decode('ascii')
@@ -0,0 +1,44 @@
+"""
+Server-side embedding galleries for one-to-many biometric matching
+"""
+
+from typing import Any, Dict, List, Sequence, Tuple
+
+from shared.embedding_index import EmbeddingIndex
+
+
+class EmbeddingGallery(EmbeddingIndex):
+    """
+    Gallery of enrolled embeddings for one modality (face or fingerprint)
+
+    An always-exact EmbeddingIndex: embeddings are normalized once at
+    enrollment, so a search is a single matrix-vector product followed by
+    argpartition for the top-k. Scores are raw cosine similarities.
+    """
+
+    def __init__(self, modality: str):
+        super().__init__(ivf_threshold=None, name=f"{modality} gallery")
+        self.modality = modality
+
+    def enroll(self, ids: Sequence[Any], embeddings: Any) -> int:
+        """Add or replace embeddings for the given IDs"""
+        return self.add(ids, embeddings)
+
+    def search(self, probe: Any, top_k: int = 10) -> List[Tuple[Any, float]]:
+        """
+        Score a probe embedding against the whole gallery
+
+        Returns:
+            List of (gallery ID, cosine similarity) sorted by decreasing similarity
+        """
+        return super().search(probe, top_k, min_similarity=None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Gallery size and memory footprint"""
+        stats = super().stats()
+        return {
+            "modality": self.modality,
+            "size": stats["size"],
+            "dimension": stats["dimension"],
+            "memory_bytes": stats["memory_bytes"]
+        }
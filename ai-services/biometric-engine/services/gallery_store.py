@@ -0,0 +1,431 @@
+"""
+Persistent memory-mapped gallery store
+
+Layout of a gallery directory:
+
+    manifest.json          committed state (dimension, segments, byte/row counts, version)
+    seg-000001.f32         append-only unit-norm float32 rows
+    seg-000001.ids         one JSON-encoded gallery ID per row
+    deleted-000001.log     append-only global row numbers that were removed or replaced
+
+Readers memory-map the segment files read-only, so every uvicorn worker
+shares the same page-cached vectors instead of copying them onto its heap.
+Writers serialize through an flock on .lock, append to the active segment
+and tombstone log, then atomically replace manifest.json. Bytes beyond the
+manifest's counts (e.g. from a crashed writer) are ignored and truncated
+by the next write. Other workers notice the new manifest on their next call
+and map only what changed, under a shared flock so compaction cannot
+remove files they are still opening. Compaction rewrites the live rows into one fresh
+segment with a fresh tombstone log.
+"""
+
+import fcntl
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from shared.embedding_index import normalize_rows
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+LOCK = ".lock"
+
+
+class _Segment:
+    """A memory-mapped segment, its IDs and its tombstoned local rows"""
+
+    __slots__ = ("name", "offset", "rows", "ids_bytes", "vectors", "ids", "deleted")
+
+    def __init__(self, name: str, offset: int):
+        self.name = name
+        self.offset = offset
+        self.rows = 0
+        self.ids_bytes = 0
+        self.vectors: Optional[np.ndarray] = None
+        self.ids: List[Any] = []
+        self.deleted = np.zeros(0, dtype=np.int64)
+
+
+class GalleryStore:
+    """
+    Memory-mapped, append-only embedding gallery for one modality
+
+    Exposes the same enroll/remove/search/stats interface as EmbeddingGallery.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        modality: str,
+        segment_max_rows: int = 1_000_000,
+        compact_deleted_ratio: float = 0.3
+    ):
+        self.directory = directory
+        self.modality = modality
+        self.segment_max_rows = segment_max_rows
+        self.compact_deleted_ratio = compact_deleted_ratio
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._write_locked = False
+        self._manifest_stamp = None
+        self.dim: Optional[int] = None
+        self.version = 0
+        self._segments: List[_Segment] = []
+        self._deleted_log: Optional[str] = None
+        self._deleted_bytes = 0
+        self._deleted_rows: set = set()
+        self._live: Dict[Any, int] = {}
+        self._reload()
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._reload()
+            return len(self._live)
+
+    # ------------------------------------------------------------------ reads
+
+    def search(self, probe: Any, top_k: int = 10) -> List[Tuple[Any, float]]:
+        """
+        Score a probe embedding against every live row
+
+        Returns:
+            List of (gallery ID, cosine similarity) sorted by decreasing similarity
+        """
+        query = normalize_rows(probe)
+        if query.shape[0] != 1:
+            raise ValueError("Search expects a single probe embedding")
+        query = query[0]
+
+        with self._lock:
+            self._reload()
+            if not self._live:
+                return []
+            if query.shape[0] != self.dim:
+                raise ValueError(f"Probe dimension {query.shape[0]} does not match {self.modality} gallery dimension {self.dim}")
+
+            candidates = []
+            for segment in self._segments:
+                if segment.rows == 0:
+                    continue
+                scores = segment.vectors @ query
+                scores[segment.deleted] = -np.inf
+                k = min(top_k, segment.rows)
+                best = np.argpartition(-scores, k - 1)[:k]
+                candidates.extend(
+                    (float(scores[row]), segment.ids[row])
+                    for row in best.tolist()
+                    if scores[row] != -np.inf
+                )
+
+            candidates.sort(key=lambda item: item[0], reverse=True)
+            return [(gallery_id, score) for score, gallery_id in candidates[:top_k]]
+
+    def stats(self) -> Dict[str, Any]:
+        """Gallery size and on-disk layout"""
+        with self._lock:
+            self._reload()
+            stored_rows = sum(segment.rows for segment in self._segments)
+            return {
+                "modality": self.modality,
+                "size": len(self._live),
+                "dimension": self.dim,
+                "storage": "mmap",
+                "directory": self.directory,
+                "version": self.version,
+                "segments": len(self._segments),
+                "stored_rows": stored_rows,
+                "deleted_rows": len(self._deleted_rows),
+                "mapped_bytes": stored_rows * (self.dim or 0) * 4
+            }
+
+    # ----------------------------------------------------------------- writes
+
+    def enroll(self, ids: Sequence[Any], embeddings: Any) -> int:
+        """Append embeddings; IDs that already exist are replaced"""
+        vectors = normalize_rows(embeddings)
+        if len(ids) != vectors.shape[0]:
+            raise ValueError(f"Got {len(ids)} IDs for {vectors.shape[0]} embeddings")
+
+        with self._write_lock():
+            manifest = self._read_manifest()
+            if manifest["dim"] is None:
+                manifest["dim"] = int(vectors.shape[1])
+            elif vectors.shape[1] != manifest["dim"]:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match {self.modality} gallery dimension {manifest['dim']}")
+
+            replaced = [self._live[gallery_id] for gallery_id in ids if gallery_id in self._live]
+            first_row = sum(entry["rows"] for entry in manifest["segments"])
+
+            position = 0
+            while position < len(ids):
+                entry = self._active_segment(manifest)
+                end = position + self.segment_max_rows - entry["rows"]
+                self._append_rows(entry, vectors[position:end], ids[position:end], manifest["dim"])
+                position = min(end, len(ids))
+
+            # Rows repeated within this call: only the last one stays live
+            last_row = {gallery_id: first_row + k for k, gallery_id in enumerate(ids)}
+            replaced.extend(
+                first_row + k for k, gallery_id in enumerate(ids)
+                if last_row[gallery_id] != first_row + k
+            )
+
+            self._append_deleted(manifest, replaced)
+            self._commit(manifest)
+            self._maybe_compact()
+        return vectors.shape[0]
+
+    def remove(self, ids: Sequence[Any]) -> int:
+        """Tombstone the rows of the given IDs (unknown IDs are ignored)"""
+        with self._write_lock():
+            rows = [self._live[gallery_id] for gallery_id in set(ids) if gallery_id in self._live]
+            if rows:
+                manifest = self._read_manifest()
+                self._append_deleted(manifest, rows)
+                self._commit(manifest)
+                self._maybe_compact()
+        return len(rows)
+
+    def compact(self) -> Dict[str, Any]:
+        """Rewrite live rows into a single new segment and drop tombstones"""
+        with self._write_lock():
+            self._compact()
+        return self.stats()
+
+    # -------------------------------------------------------------- internals
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    @contextmanager
+    def _write_lock(self):
+        """Serialize writers across threads and worker processes"""
+        with self._lock:
+            with open(self._path(LOCK), "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                self._write_locked = True
+                try:
+                    self._reload()
+                    yield
+                finally:
+                    self._write_locked = False
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_manifest(self) -> Dict[str, Any]:
+        try:
+            with open(self._path(MANIFEST)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {
+                "dim": None,
+                "version": 0,
+                "next_file": 1,
+                "segments": [],
+                "deleted_log": "deleted-000000.log",
+                "deleted_bytes": 0
+            }
+
+    def _commit(self, manifest: Dict[str, Any]) -> None:
+        """Atomically publish a new manifest and reload from it"""
+        manifest["version"] = manifest.get("version", 0) + 1
+        tmp_path = self._path(MANIFEST + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._path(MANIFEST))
+        self._reload()
+
+    def _next_file(self, manifest: Dict[str, Any], prefix: str, suffix: str = "") -> str:
+        number = manifest.get("next_file", 1)
+        manifest["next_file"] = number + 1
+        return f"{prefix}-{number:06d}{suffix}"
+
+    def _active_segment(self, manifest: Dict[str, Any]) -> Dict[str, Any]:
+        """Return the segment entry to append to, starting a new one when full"""
+        segments = manifest["segments"]
+        if not segments or segments[-1]["rows"] >= self.segment_max_rows:
+            segments.append({"name": self._next_file(manifest, "seg"), "rows": 0, "ids_bytes": 0})
+        return segments[-1]
+
+    def _append_bytes(self, path: str, committed: int, payload: bytes) -> int:
+        """Append to a file after discarding any uncommitted tail; returns the new length"""
+        with open(path, "ab") as f:
+            f.truncate(committed)
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        return committed + len(payload)
+
+    def _append_rows(self, entry: Dict[str, Any], vectors: np.ndarray, ids: Sequence[Any], dim: int) -> None:
+        """Append rows to a segment's vector and ID files"""
+        self._append_bytes(
+            self._path(entry["name"] + ".f32"),
+            entry["rows"] * dim * 4,
+            np.ascontiguousarray(vectors, dtype="<f4").tobytes()
+        )
+        entry["ids_bytes"] = self._append_bytes(
+            self._path(entry["name"] + ".ids"),
+            entry["ids_bytes"],
+            "".join(json.dumps(gallery_id) + "\n" for gallery_id in ids).encode()
+        )
+        entry["rows"] += len(ids)
+
+    def _append_deleted(self, manifest: Dict[str, Any], rows: List[int]) -> None:
+        if rows:
+            manifest["deleted_bytes"] = self._append_bytes(
+                self._path(manifest["deleted_log"]),
+                manifest["deleted_bytes"],
+                "".join(f"{row}\n" for row in rows).encode()
+            )
+
+    def _read_lines(self, path: str, start: int, end: int) -> List[str]:
+        """Read the committed byte range [start, end) of a line-oriented file"""
+        if end <= start:
+            return []
+        with open(path, "rb") as f:
+            f.seek(start)
+            return f.read(end - start).decode().splitlines()
+
+    def _manifest_version_stamp(self) -> Optional[Tuple[int, int, int]]:
+        """Each commit replaces the manifest, so inode/mtime/size identify a version"""
+        try:
+            info = os.stat(self._path(MANIFEST))
+        except FileNotFoundError:
+            return None
+        return (info.st_ino, info.st_mtime_ns, info.st_size)
+
+    def _reload(self) -> None:
+        """
+        Catch up with the committed manifest
+
+        Segments and the tombstone log only grow between compactions, so only
+        the newly committed bytes are read; anything else triggers a full reload.
+        Outside a write, the files are read under a shared flock so a
+        compaction in another worker cannot remove them mid-read.
+        """
+        stamp = self._manifest_version_stamp()
+        if stamp is not None and stamp == self._manifest_stamp:
+            return
+        if self._write_locked:
+            self._load_manifest(stamp)
+            return
+
+        with open(self._path(LOCK), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_SH)
+            try:
+                self._load_manifest(self._manifest_version_stamp())
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load_manifest(self, stamp: Optional[Tuple[int, int, int]]) -> None:
+        """Map what changed since the last load; the caller holds the flock"""
+        manifest = self._read_manifest()
+        entries = manifest["segments"]
+        known = [segment.name for segment in self._segments]
+        incremental = (
+            manifest["deleted_log"] == self._deleted_log and
+            [entry["name"] for entry in entries[:len(known)]] == known
+        )
+        if not incremental:
+            self._segments = []
+            self._deleted_bytes = 0
+            self._deleted_rows = set()
+            self._live = {}
+
+        dim = manifest["dim"]
+        offset = 0
+        for position, entry in enumerate(entries):
+            if position < len(self._segments):
+                segment = self._segments[position]
+            else:
+                segment = _Segment(entry["name"], offset)
+                self._segments.append(segment)
+
+            if entry["rows"] != segment.rows:
+                new_ids = [
+                    json.loads(line) for line in
+                    self._read_lines(self._path(entry["name"] + ".ids"), segment.ids_bytes, entry["ids_bytes"])
+                ]
+                for k, gallery_id in enumerate(new_ids):
+                    self._live[gallery_id] = offset + segment.rows + k
+                segment.ids.extend(new_ids)
+                segment.rows = entry["rows"]
+                segment.ids_bytes = entry["ids_bytes"]
+                segment.vectors = np.memmap(
+                    self._path(entry["name"] + ".f32"), dtype="<f4", mode="r", shape=(segment.rows, dim)
+                )
+            offset += entry["rows"]
+
+        new_deleted = [
+            int(line) for line in
+            self._read_lines(self._path(manifest["deleted_log"]), self._deleted_bytes, manifest["deleted_bytes"])
+        ]
+        if new_deleted:
+            self._deleted_rows.update(new_deleted)
+            for segment in self._segments:
+                start, end = segment.offset, segment.offset + segment.rows
+                local = [row - start for row in new_deleted if start <= row < end]
+                if local:
+                    segment.deleted = np.concatenate([segment.deleted, np.array(local, dtype=np.int64)])
+                    for row in local:
+                        gallery_id = segment.ids[row]
+                        if self._live.get(gallery_id) == start + row:
+                            del self._live[gallery_id]
+
+        self.dim = dim
+        self.version = manifest.get("version", 0)
+        self._deleted_log = manifest["deleted_log"]
+        self._deleted_bytes = manifest["deleted_bytes"]
+        self._manifest_stamp = stamp
+
+    def _maybe_compact(self) -> None:
+        stored = sum(segment.rows for segment in self._segments)
+        if stored and len(self._deleted_rows) / stored >= self.compact_deleted_ratio:
+            self._compact()
+
+    def _compact(self) -> None:
+        """Write live rows into a new segment and publish a manifest with a fresh tombstone log"""
+        manifest = self._read_manifest()
+        old_files = [entry["name"] + suffix for entry in manifest["segments"] for suffix in (".f32", ".ids")]
+        old_files.append(manifest["deleted_log"])
+
+        name = self._next_file(manifest, "seg")
+        rows = 0
+        ids_bytes = 0
+        with open(self._path(name + ".f32"), "wb") as vector_file, open(self._path(name + ".ids"), "wb") as id_file:
+            for segment in self._segments:
+                if segment.rows == 0:
+                    continue
+                keep = np.ones(segment.rows, dtype=bool)
+                keep[segment.deleted] = False
+                vector_file.write(np.ascontiguousarray(segment.vectors[keep], dtype="<f4").tobytes())
+                payload = "".join(
+                    json.dumps(segment.ids[row]) + "\n" for row in np.flatnonzero(keep).tolist()
+                ).encode()
+                id_file.write(payload)
+                ids_bytes += len(payload)
+                rows += int(keep.sum())
+            for f in (vector_file, id_file):
+                f.flush()
+                os.fsync(f.fileno())
+
+        manifest["segments"] = [{"name": name, "rows": rows, "ids_bytes": ids_bytes}]
+        manifest["deleted_log"] = self._next_file(manifest, "deleted", ".log")
+        manifest["deleted_bytes"] = 0
+        self._commit(manifest)
+
+        # Workers still mapping the old files keep valid mappings until they remap
+        for old_file in old_files:
+            try:
+                os.remove(self._path(old_file))
+            except FileNotFoundError:
+                pass
+        logger.info(f"Compacted {self.modality} gallery into {name} ({rows} rows)")
@@ -1,17 +1,36 @@
 """Deceased Registry Matching Engine"""
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import Dict, Any
+from typing import Any, AsyncIterator, Dict
+import asyncio
+import json
 import logging
+import os
+import sys
 from datetime import datetime
 
+# Modules shared by the AI services live in ai-services/shared
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.death_index import DEFAULT_MAX_CANDIDATES, DeathRecordIndex
+from shared.ndjson import NDJSONStreamingResponse, iter_ndjson
+from utils.match_scoring import score_match
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Voters scored per worker-thread call in /match-deceased-batch
+BATCH_CHUNK_SIZE = 1000
+
+# Voters between progress lines in /match-deceased-batch
+STREAM_PROGRESS_EVERY = 10000
+
 app = FastAPI(title="Deceased Registry Matcher", version="1.0.0")
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
 
+death_index = DeathRecordIndex()
+
 class MatchRequest(BaseModel):
     voter_record: Dict[str, Any]
     death_record: Dict[str, Any]
@@ -28,44 +47,116 @@ async def health():
 @app.post("/match-deceased", response_model=MatchResponse)
 async def match_deceased(request: MatchRequest):
     try:
-        vr = request.voter_record
-        dr = request.death_record
-        
-        # Name similarity
-        name1 = vr.get('name', '').lower()
-        name2 = dr.get('name', '').lower()
-        name_score = 1.0 if name1 == name2 else 0.7 if name1 in name2 or name2 in name1 else 0.0
-        
-        # DOB match
-        dob_match = 1.0 if vr.get('dob') == dr.get('death_date') else 0.0
-        
-        # Aadhaar partial match
-        aad1 = str(vr.get('aadhaar_number', ''))[-4:]
-        aad2 = str(dr.get('aadhaar_number', ''))[-4:]
-        aad_match = 1.0 if aad1 == aad2 and len(aad1) == 4 else 0.0
-        
-        # Calculate probability
-        prob = (name_score * 0.4 + dob_match * 0.4 + aad_match * 0.2)
-        
-        reasons = []
-        if name_score > 0.7:
-            reasons.append("Name match")
-        if dob_match == 1.0:
-            reasons.append("DOB match")
-        if aad_match == 1.0:
-            reasons.append("Aadhaar match")
-        
-        return MatchResponse(
-            match_probability=prob,
-            confidence=0.9 if len(reasons) >= 2 else 0.6,
-            reasons=reasons
-        )
+        return MatchResponse(**score_match(request.voter_record, request.death_record))
     except Exception as e:
         logger.error(f"Error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/death-records/load")
+async def load_death_records(records: list[Dict[str, Any]], replace: bool = True):
+    """
+    Bulk-load death records into the in-memory index used by /match-deceased-batch
+    
+    With replace (the default) the records become the whole index;
+    otherwise they are added to it.
+    """
+    try:
+        counts = await asyncio.to_thread(death_index.load, records, replace)
+        return {**counts, **death_index.stats()}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error loading death records: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/death-records/stats")
+async def death_record_stats():
+    """Death-record index size"""
+    return death_index.stats()
+
+@app.post("/match-deceased-batch")
+async def match_deceased_batch(
+    request: Request,
+    threshold: float = 0.5,
+    max_candidates: int = DEFAULT_MAX_CANDIDATES,
+    progress_every: int = STREAM_PROGRESS_EVERY
+):
+    """
+    Match a stream of voter records against the loaded death records
+    
+    The request body is NDJSON, one voter record per line. The response is
+    NDJSON: a "match" line for each voter with death records scoring at
+    least threshold (best first, at most max_candidates), a "progress" line
+    every `progress_every` voters, an "error" line for each unparseable
+    input line, and a final "summary" line.
+    """
+    if not 0 < threshold <= 1:
+        raise HTTPException(status_code=400, detail="threshold must be in (0, 1]")
+    if death_index.size == 0:
+        raise HTTPException(status_code=409, detail="No death records loaded (POST /death-records/load)")
+    
+    async def ndjson():
+        try:
+            async for line in stream_matches(request.stream(), threshold, max_candidates, max(1, progress_every)):
+                yield json.dumps(line) + "\n"
+        except Exception as e:
+            # Headers are already sent, so report the failure in-band
+            logger.error(f"Error in batch deceased matching: {str(e)}")
+            yield json.dumps({"type": "error", "detail": f"Batch matching failed: {str(e)}"}) + "\n"
+    
+    return NDJSONStreamingResponse(ndjson())
+
+async def stream_matches(
+    chunks: AsyncIterator[bytes],
+    threshold: float,
+    max_candidates: int,
+    progress_every: int
+) -> AsyncIterator[Dict[str, Any]]:
+    """Parse voters, match them in chunks off the event loop and emit result lines"""
+    counters = {"candidates_scored": 0}
+    pending = []
+    voters = 0
+    matched = 0
+    
+    async def flush():
+        nonlocal matched
+        results = await asyncio.to_thread(
+            death_index.match_many, [voter for _, voter in pending], threshold, max_candidates, counters
+        )
+        lines = []
+        for (line_no, voter), candidates in zip(pending, results):
+            if candidates:
+                matched += 1
+                lines.append({"type": "match", "line": line_no, "voter_id": voter.get('voter_id'), "candidates": candidates})
+        pending.clear()
+        return lines
+    
+    async for line_no, voter, error in iter_ndjson(chunks):
+        if error:
+            yield {"type": "error", "line": line_no, "detail": error}
+            continue
+        pending.append((line_no, voter))
+        voters += 1
+        at_progress = voters % progress_every == 0
+        if len(pending) >= BATCH_CHUNK_SIZE or at_progress:
+            for line in await flush():
+                yield line
+        if at_progress:
+            yield {"type": "progress", "voters": voters, "voters_matched": matched, **counters}
+    
+    if pending:
+        for line in await flush():
+            yield line
+    
+    logger.info(f"Batch deceased matching: {voters} voters, {matched} matched, {counters['candidates_scored']} candidates scored")
+    yield {
+        "type": "summary",
+        "total_voters": voters,
+        "voters_matched": matched,
+        "candidates_scored": counters["candidates_scored"],
+        "death_records": death_index.size
+    }
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8003)
-
-
@@ -0,0 +1,180 @@
+"""
+In-memory death-record index for bulk deceased matching
+Death records are keyed by death date, Aadhaar last four digits and
+lowercased name, so each voter is scored only against records that can reach
+the threshold
+"""
+
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from utils.match_scoring import (
+    AADHAAR_WEIGHT,
+    DOB_WEIGHT,
+    NAME_WEIGHT,
+    PARTIAL_NAME_SCORE,
+    aadhaar_last4,
+    name_key,
+    score_match
+)
+
+logger = logging.getLogger(__name__)
+
+# Candidates returned per voter unless the caller asks otherwise
+DEFAULT_MAX_CANDIDATES = 10
+
+_EPSILON = 1e-9
+
+
+class _Snapshot:
+    """One loaded generation of the index; replaced whole, never mutated after loading"""
+
+    def __init__(self):
+        self.records: List[Dict[str, Any]] = []
+        self.record_ids: List[Any] = []
+        self.by_date: Dict[str, List[int]] = {}
+        self.by_aadhaar: Dict[str, List[int]] = {}
+        self.by_name: Dict[str, List[int]] = {}
+
+    def add(self, record: Dict[str, Any]) -> None:
+        """Append a record and its keys"""
+        position = len(self.records)
+        self.records.append(record)
+        self.record_ids.append(record.get('death_record_id', record.get('id', position)))
+        death_date = record.get('death_date')
+        if death_date not in (None, ''):
+            self.by_date.setdefault(str(death_date), []).append(position)
+        last4 = aadhaar_last4(record.get('aadhaar_number'))
+        if last4:
+            self.by_aadhaar.setdefault(last4, []).append(position)
+        name = name_key(record.get('name'))
+        if name:
+            self.by_name.setdefault(name, []).append(position)
+
+
+class DeathRecordIndex:
+    """
+    Blocking index over a death registry, scored with score_match
+
+    A voter's DOB can only match a record with the same death_date, its
+    Aadhaar only a record with the same last four digits and its name
+    exactly only a record with the same lowercased name. Which records are
+    scored depends on the threshold: when a signal's weight is needed to
+    reach it (0.5 needs DOB or Aadhaar, above 0.6 needs DOB) only records
+    sharing that key are; at 0.4 and below exact name matches are added;
+    at 0.28 and below, where one name contained in the other is enough,
+    every distinct name is scanned for those. The result is the same as
+    scoring every record, at any threshold.
+    """
+
+    def __init__(self):
+        self._snapshot = _Snapshot()
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        return len(self._snapshot.records)
+
+    def load(self, records: Iterable[Dict[str, Any]], replace: bool = True) -> Dict[str, int]:
+        """
+        Bulk-load death records
+
+        With replace the new records become the whole index, otherwise they
+        are appended. Matching keeps using the previous records until the
+        load completes.
+
+        Raises:
+            ValueError: if a record is not a JSON object
+        """
+        with self._lock:
+            snapshot = _Snapshot()
+            if not replace:
+                for record in self._snapshot.records:
+                    snapshot.add(record)
+            loaded = 0
+            for record in records:
+                if not isinstance(record, dict):
+                    raise ValueError(f"Death record {loaded} is not an object")
+                snapshot.add(record)
+                loaded += 1
+            self._snapshot = snapshot
+        logger.info(f"Loaded {loaded} death records (replace={replace}); index holds {len(snapshot.records)}")
+        return {"loaded": loaded}
+
+    def stats(self) -> Dict[str, Any]:
+        """Index size and key counts"""
+        snapshot = self._snapshot
+        return {
+            "death_records": len(snapshot.records),
+            "death_date_keys": len(snapshot.by_date),
+            "aadhaar_keys": len(snapshot.by_aadhaar),
+            "names": len(snapshot.by_name)
+        }
+
+    def match(
+        self,
+        voter_record: Dict[str, Any],
+        threshold: float = 0.5,
+        max_candidates: int = DEFAULT_MAX_CANDIDATES,
+        counters: Optional[Dict[str, int]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Death records matching a voter at or above threshold, best first
+
+        counters, if given, has "candidates_scored" incremented.
+        """
+        snapshot = self._snapshot
+        candidates = self._candidates(snapshot, voter_record, threshold)
+        if counters is not None:
+            counters["candidates_scored"] = counters.get("candidates_scored", 0) + len(candidates)
+
+        matches = []
+        for position in sorted(candidates):
+            result = score_match(voter_record, snapshot.records[position])
+            if result["match_probability"] >= threshold:
+                matches.append({"death_record_id": snapshot.record_ids[position], **result})
+        matches.sort(key=lambda match: -match["match_probability"])
+        return matches[:max(1, max_candidates)]
+
+    def match_many(
+        self,
+        voter_records: List[Dict[str, Any]],
+        threshold: float = 0.5,
+        max_candidates: int = DEFAULT_MAX_CANDIDATES,
+        counters: Optional[Dict[str, int]] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """match for each voter, in order"""
+        return [self.match(voter, threshold, max_candidates, counters) for voter in voter_records]
+
+    @staticmethod
+    def _candidates(snapshot: _Snapshot, voter_record: Dict[str, Any], threshold: float) -> Set[int]:
+        """Positions of the records that could score at least threshold against a voter"""
+        total = NAME_WEIGHT + DOB_WEIGHT + AADHAAR_WEIGHT
+        dob = voter_record.get('dob')
+        dob_records = snapshot.by_date.get(str(dob), ()) if dob not in (None, '') else ()
+        last4 = aadhaar_last4(voter_record.get('aadhaar_number'))
+        aadhaar_records = snapshot.by_aadhaar.get(last4, ()) if last4 else ()
+
+        # A signal whose weight is needed to reach the threshold must match
+        if total - DOB_WEIGHT < threshold - _EPSILON:
+            candidates = set(dob_records)
+            if total - AADHAAR_WEIGHT < threshold - _EPSILON:
+                candidates.intersection_update(aadhaar_records)
+            return candidates
+        if total - AADHAAR_WEIGHT < threshold - _EPSILON:
+            return set(aadhaar_records)
+
+        candidates = set(dob_records)
+        candidates.update(aadhaar_records)
+        name = name_key(voter_record.get('name'))
+        if not name or NAME_WEIGHT < threshold - _EPSILON:
+            return candidates
+        if PARTIAL_NAME_SCORE * NAME_WEIGHT >= threshold - _EPSILON:
+            # One name contained in the other is enough: no key finds that, so scan the names
+            for other, positions in snapshot.by_name.items():
+                if name in other or other in name:
+                    candidates.update(positions)
+        else:
+            candidates.update(snapshot.by_name.get(name, ()))
+        return candidates
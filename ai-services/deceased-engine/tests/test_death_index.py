@@ -0,0 +1,78 @@
+"""Death-record index: blocked matching returns what scoring every record would"""
+
+import random
+
+import pytest
+
+from services.death_index import DeathRecordIndex
+from utils.match_scoring import score_match
+
+THRESHOLDS = [0.05, 0.2, 0.27, 0.28, 0.29, 0.4, 0.41, 0.5, 0.6, 0.61, 0.8, 1.0]
+
+# Names contained in one another, so partial name matches occur
+NAMES = ["Ram", "Ram Kumar", "Sita", "Sita Devi", "Kumar", "RAM", "Lakshmi", "", None]
+DATES = ["1950-01-01", "1960-05-12", "1971-11-30", "", None]
+AADHAAR = ["123456781234", "999988881234", "111122223333", "4444", "12", "", None]
+
+
+def _record(rng, k):
+    return {
+        "death_record_id": k,
+        "name": rng.choice(NAMES),
+        "death_date": rng.choice(DATES),
+        "aadhaar_number": rng.choice(AADHAAR)
+    }
+
+
+def _voter(rng, k):
+    return {
+        "voter_id": k,
+        "name": rng.choice(NAMES),
+        "dob": rng.choice(DATES),
+        "aadhaar_number": rng.choice(AADHAAR)
+    }
+
+
+def _brute_force(records, voter, threshold):
+    matches = []
+    for record in records:
+        result = score_match(voter, record)
+        if result["match_probability"] >= threshold:
+            matches.append({"death_record_id": record["death_record_id"], **result})
+    matches.sort(key=lambda match: -match["match_probability"])
+    return matches
+
+
+@pytest.fixture(scope="module")
+def loaded():
+    rng = random.Random(7)
+    records = [_record(rng, k) for k in range(400)]
+    index = DeathRecordIndex()
+    index.load(records)
+    voters = [_voter(rng, k) for k in range(150)]
+    return index, records, voters
+
+
+@pytest.mark.parametrize("threshold", THRESHOLDS)
+def test_index_matches_brute_force(loaded, threshold):
+    index, records, voters = loaded
+    for voter in voters:
+        assert index.match(voter, threshold, max_candidates=len(records)) == _brute_force(records, voter, threshold)
+
+
+def test_high_threshold_scores_only_blocked_records(loaded):
+    index, records, voters = loaded
+    counters = {}
+    index.match_many(voters, threshold=0.6, counters=counters)
+    assert counters["candidates_scored"] < len(voters) * len(records) // 2
+
+
+def test_load_without_replace_appends(loaded):
+    _, records, _ = loaded
+    index = DeathRecordIndex()
+    index.load(records[:10])
+    index.load(records[10:20], replace=False)
+    assert index.size == 20
+    with pytest.raises(ValueError):
+        index.load(["not a record"])
+    assert index.size == 20
@@ -0,0 +1,35 @@
+"""/match-deceased-batch: NDJSON in, match, error and summary lines out"""
+
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+
+@pytest.fixture
+def client():
+    return TestClient(main.app)
+
+
+def test_batch_stream_matches_the_single_endpoint(client):
+    death_record = {"death_record_id": "D1", "name": "Ram Kumar", "death_date": "1950-01-01", "aadhaar_number": "123456781234"}
+    assert client.post("/death-records/load", json=[death_record]).status_code == 200
+
+    voter = {"voter_id": "V1", "name": "Ram Kumar", "dob": "1950-01-01"}
+    body = "\n".join([json.dumps(voter), "", "not json", "[1]", json.dumps({"voter_id": "V2", "name": "Sita"})])
+    response = client.post(
+        "/match-deceased-batch",
+        content=body,
+        headers={"Content-Type": "application/x-ndjson"}
+    )
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+
+    single = client.post("/match-deceased", json={"voter_record": voter, "death_record": death_record}).json()
+    assert [line["type"] for line in lines] == ["error", "error", "match", "summary"]
+    assert [line["line"] for line in lines[:3]] == [3, 4, 1]
+    assert lines[2]["candidates"][0]["match_probability"] == single["match_probability"]
+    assert lines[3]["total_voters"] == 2
+    assert lines[3]["voters_matched"] == 1
@@ -0,0 +1,72 @@
+"""
+Voter / death-record match scoring
+One scorer shared by single-pair matching and the bulk death-record index
+"""
+
+from typing import Any, Dict
+
+# Weights of the three match signals in match_probability
+NAME_WEIGHT = 0.4
+DOB_WEIGHT = 0.4
+AADHAAR_WEIGHT = 0.2
+
+# Score of a name contained in the other (as opposed to an exact match)
+PARTIAL_NAME_SCORE = 0.7
+
+
+def name_key(name: Any) -> str:
+    """Comparison form of a name (lowercase), "" if it is missing"""
+    return str(name or '').lower()
+
+
+def aadhaar_last4(value: Any) -> str:
+    """Last four characters of an Aadhaar number, or "" if it is missing or shorter"""
+    if value is None or value == '':
+        return ""
+    last4 = str(value)[-4:]
+    return last4 if len(last4) == 4 else ""
+
+
+def score_match(voter_record: Dict[str, Any], death_record: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Score how likely a voter is the person in a death record
+
+    The voter's DOB is compared with the record's death_date, as the single
+    match endpoint always has; missing names, dates and Aadhaar numbers
+    never count as matches.
+
+    Returns:
+        {match_probability, confidence, reasons}
+    """
+    # Name similarity
+    name1 = name_key(voter_record.get('name'))
+    name2 = name_key(death_record.get('name'))
+    if not name1 or not name2:
+        name_score = 0.0
+    else:
+        name_score = 1.0 if name1 == name2 else PARTIAL_NAME_SCORE if name1 in name2 or name2 in name1 else 0.0
+
+    # DOB match
+    dob = voter_record.get('dob')
+    dob_match = 1.0 if dob not in (None, '') and dob == death_record.get('death_date') else 0.0
+
+    # Aadhaar partial match
+    aad1 = aadhaar_last4(voter_record.get('aadhaar_number'))
+    aad_match = 1.0 if aad1 and aad1 == aadhaar_last4(death_record.get('aadhaar_number')) else 0.0
+
+    # Calculate probability
+    prob = name_score * NAME_WEIGHT + dob_match * DOB_WEIGHT + aad_match * AADHAAR_WEIGHT
+
+    reasons = []
+    if name_score > PARTIAL_NAME_SCORE:
+        reasons.append("Name match")
+    if dob_match == 1.0:
+        reasons.append("DOB match")
+    if aad_match == 1.0:
+        reasons.append("Aadhaar match")
+
+    return {
+        "match_probability": prob,
+        "confidence": 0.9 if len(reasons) >= 2 else 0.6,
+        "reasons": reasons
+    }
@@ -0,0 +1,96 @@
+"""
+Duplicate classifier inference benchmark
+Reports latency percentiles and throughput of DuplicateClassifier.predict
+for the rule-based model or a trained model file, as JSON
+
+Usage (from ai-services/duplicate-engine):
+    python benchmarks/bench_classifier.py
+    python benchmarks/bench_classifier.py --model samples/duplicate_model_trees.json --batch-sizes 1,1000,100000
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.ml_classifier import DuplicateClassifier, FEATURE_NAMES  # noqa: E402
+
+
+def synthetic_features(rows: int, seed: int) -> np.ndarray:
+    """Feature rows shaped like real candidate pairs: similarities in [0, 1], match flags in {0, 0.5, 0.95, 1}"""
+    rng = np.random.default_rng(seed)
+    features = rng.random((rows, len(FEATURE_NAMES)), dtype=np.float32)
+    features[:, 3] = rng.choice([0.0, 0.95, 1.0], size=rows, p=[0.8, 0.05, 0.15])
+    features[:, 5] = rng.random(rows) < 0.1
+    features[:, 6] = rng.choice([0.0, 0.5, 1.0], size=rows, p=[0.9, 0.05, 0.05])
+    features[:, 7] *= rng.random(rows) < 0.3
+    return features
+
+
+def bench_batch(classifier: DuplicateClassifier, features: np.ndarray, repeat: int) -> Dict[str, Any]:
+    """Time repeated predict calls on one batch"""
+    classifier.predict(features)  # warm-up
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        classifier.predict(features)
+        timings.append(time.perf_counter() - start)
+    timings_ms = np.array(timings) * 1000.0
+    rows = features.shape[0]
+    return {
+        "batch_size": rows,
+        "repeat": repeat,
+        "latency_ms": {
+            "p50": round(float(np.percentile(timings_ms, 50)), 4),
+            "p95": round(float(np.percentile(timings_ms, 95)), 4),
+            "p99": round(float(np.percentile(timings_ms, 99)), 4),
+            "mean": round(float(timings_ms.mean()), 4)
+        },
+        "rows_per_second": round(rows * repeat / sum(timings), 1)
+    }
+
+
+def main(argv: List[str] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", help="Model JSON file (default: DUPLICATE_MODEL_PATH, else rule-based)")
+    parser.add_argument("--batch-sizes", default="1,100,10000,100000", help="Comma-separated batch sizes")
+    parser.add_argument("--repeat", type=int, default=0, help="Calls per batch size (default: scaled to the batch size)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Write the JSON report to this file as well as stdout")
+    args = parser.parse_args(argv)
+
+    classifier = DuplicateClassifier(model_path=args.model)
+    if args.model and classifier.source is None:
+        parser.error(f"Could not load model {args.model}")
+
+    results = []
+    for batch_size in (int(size) for size in args.batch_sizes.split(",") if size.strip()):
+        repeat = args.repeat or max(5, min(1000, 1000000 // max(1, batch_size)))
+        results.append(bench_batch(classifier, synthetic_features(batch_size, args.seed), repeat))
+
+    report = {
+        "benchmark": "classifier_inference",
+        "timestamp": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "model": classifier.info(),
+        "results": results
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+"""
+Duplicate-engine benchmark suite
+Measures the hot paths on a seeded synthetic roll and writes one JSON report,
+so runs on different commits can be compared with --compare
+
+Usage (from ai-services/duplicate-engine):
+    python benchmarks/run_benchmarks.py --size 20000 --output bench.json
+    python benchmarks/run_benchmarks.py --size 20000 --compare bench.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+ENGINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ENGINE_DIR)
+sys.path.insert(0, os.path.dirname(ENGINE_DIR))
+
+from benchmarks.bench_classifier import bench_batch, synthetic_features  # noqa: E402
+from benchmarks.synthetic_roll import generate_roll  # noqa: E402
+from services.duplicate_service import DuplicateDetectionService  # noqa: E402
+from utils.string_matching import StringMatcher  # noqa: E402
+
+# Metrics checked by --compare: (dotted path in the report, True if higher is better)
+TRACKED_METRICS = [
+    ("string_matcher.jaro_winkler.ns_per_call", False),
+    ("string_matcher.levenshtein.ns_per_call", False),
+    ("string_matcher.soundex.ns_per_call", False),
+    ("string_matcher.metaphone.ns_per_call", False),
+    ("predict_duplicate.latency_ms.p50", False),
+    ("predict_duplicate.latency_ms.p95", False),
+    ("predict_duplicate.latency_ms.p99", False),
+    ("batch_detect.pairs_per_second", True),
+    ("batch_detect.records_per_second", True),
+    ("batch_detect.peak_traced_mb", False),
+    ("batch_detect.quality.precision", True),
+    ("batch_detect.quality.recall", True),
+    ("classifier.rows_per_second", True),
+]
+
+
+def percentiles(timings_ms: List[float]) -> Dict[str, float]:
+    """p50/p95/p99/mean/max of a list of millisecond timings"""
+    values = np.asarray(timings_ms)
+    return {
+        "p50": round(float(np.percentile(values, 50)), 4),
+        "p95": round(float(np.percentile(values, 95)), 4),
+        "p99": round(float(np.percentile(values, 99)), 4),
+        "mean": round(float(values.mean()), 4),
+        "max": round(float(values.max()), 4)
+    }
+
+
+def name_pairs(records: List[Dict[str, Any]], count: int, seed: int) -> List[Tuple[str, str]]:
+    """Random lowercased name pairs drawn from the roll"""
+    rng = random.Random(seed)
+    names = [(record.get("name") or "").lower().strip() for record in records]
+    return [(rng.choice(names), rng.choice(names)) for _ in range(count)]
+
+
+def bench_string_matcher(records: List[Dict[str, Any]], calls: int, seed: int) -> Dict[str, Any]:
+    """Per-call cost of the StringMatcher kernels used by scoring and blocking"""
+    matcher = StringMatcher()
+    pairs = name_pairs(records, calls, seed)
+    words = [first.split()[0] if first else "" for first, _ in pairs]
+
+    kernels: Dict[str, Callable[[], Any]] = {
+        "jaro_winkler": lambda: [matcher.jaro_winkler_normalized(a, b) for a, b in pairs],
+        "levenshtein": lambda: [matcher.levenshtein(a, b) for a, b in pairs],
+        "soundex": lambda: [matcher.soundex(word) for word in words],
+        "metaphone": lambda: [matcher.metaphone(word) for word in words],
+    }
+    report: Dict[str, Any] = {"backend": matcher.backend, "calls": calls}
+    for name, kernel in kernels.items():
+        kernel()  # warm-up
+        start = time.perf_counter()
+        kernel()
+        elapsed = time.perf_counter() - start
+        report[name] = {"ns_per_call": round(elapsed / calls * 1e9, 1)}
+    return report
+
+
+def bench_predict_duplicate(
+    service: DuplicateDetectionService,
+    records: List[Dict[str, Any]],
+    truth: Set[Tuple[int, int]],
+    calls: int,
+    seed: int
+) -> Dict[str, Any]:
+    """Latency of single predict_duplicate calls on a mix of true duplicates and random pairs"""
+    rng = random.Random(seed)
+    by_id = {record["voter_id"]: record for record in records}
+    true_pairs = sorted(truth)
+    pairs = []
+    for k in range(calls):
+        if true_pairs and k % 2 == 0:
+            first, second = rng.choice(true_pairs)
+            pairs.append((by_id[first], by_id[second]))
+        else:
+            pairs.append((rng.choice(records), rng.choice(records)))
+
+    async def run() -> List[float]:
+        for record1, record2 in pairs[:min(50, calls)]:  # warm-up
+            await service.predict_duplicate(record1, record2)
+        timings = []
+        for record1, record2 in pairs:
+            start = time.perf_counter()
+            await service.predict_duplicate(record1, record2)
+            timings.append((time.perf_counter() - start) * 1000.0)
+        return timings
+
+    return {"calls": calls, "latency_ms": percentiles(asyncio.run(run()))}
+
+
+def bench_batch_detect(
+    service: DuplicateDetectionService,
+    records: List[Dict[str, Any]],
+    truth: Set[Tuple[int, int]],
+    threshold: float,
+    blocking: str,
+    trace_memory: bool
+) -> Dict[str, Any]:
+    """Throughput, memory and match quality of one batch_detect run"""
+    rss_before = _max_rss_mb()
+    start = time.perf_counter()
+    result = asyncio.run(service.batch_detect(records, threshold=threshold, blocking=blocking))
+    elapsed = time.perf_counter() - start
+    rss_after = _max_rss_mb()
+
+    blocking_stats = result["blocking"]
+    found = {
+        (min(pair["record1_id"], pair["record2_id"]), max(pair["record1_id"], pair["record2_id"]))
+        for pair in result["duplicates"]
+    }
+    true_positives = len(found & truth)
+    precision = true_positives / len(found) if found else 1.0
+    recall = true_positives / len(truth) if truth else 1.0
+
+    report = {
+        "records": len(records),
+        "threshold": threshold,
+        "blocking": blocking,
+        "seconds": round(elapsed, 4),
+        "candidate_pairs": blocking_stats["candidate_pairs"],
+        "total_pairs": blocking_stats["total_pairs"],
+        "pairs_per_second": round(blocking_stats["candidate_pairs"] / elapsed, 1) if elapsed else None,
+        "records_per_second": round(len(records) / elapsed, 1) if elapsed else None,
+        "duplicates_found": len(found),
+        "quality": {
+            "true_pairs": len(truth),
+            "true_positives": true_positives,
+            "precision": round(precision, 4),
+            "recall": round(recall, 4),
+            "f1": round(2 * precision * recall / (precision + recall), 4) if precision + recall else 0.0
+        },
+        "max_rss_mb": round(rss_after, 1),
+        "max_rss_growth_mb": round(rss_after - rss_before, 1),
+        "cascade": service.cascade_stats()
+    }
+
+    if trace_memory:
+        # Separate run: tracemalloc slows allocation-heavy code, so it must not skew the timing above
+        tracemalloc.start()
+        asyncio.run(service.batch_detect(records, threshold=threshold, blocking=blocking))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        report["peak_traced_mb"] = round(peak / 2 ** 20, 1)
+    return report
+
+
+def bench_classifier(service: DuplicateDetectionService, batch_size: int, seed: int) -> Dict[str, Any]:
+    """Throughput of the active classifier on one large feature batch"""
+    result = bench_batch(service.ml_classifier, synthetic_features(batch_size, seed), repeat=20)
+    return {"model": service.ml_classifier.info(), **result}
+
+
+def _max_rss_mb() -> float:
+    """Peak resident set size of this process so far"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+def _git_commit() -> Optional[str]:
+    """Current commit of the repository, if git is available"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ENGINE_DIR, capture_output=True, text=True, timeout=10, check=True
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _lookup(report: Dict[str, Any], path: str) -> Optional[float]:
+    """Value at a dotted path, or None if the report lacks it"""
+    value: Any = report
+    for key in path.split("."):
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value if isinstance(value, (int, float)) else None
+
+
+def compare_reports(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> Dict[str, Any]:
+    """
+    Relative change of every tracked metric against a baseline report
+
+    A metric regresses when it moves the wrong way by more than tolerance
+    (a fraction, e.g. 0.1 for 10%).
+    """
+    metrics = []
+    for path, higher_is_better in TRACKED_METRICS:
+        new, old = _lookup(current, path), _lookup(baseline, path)
+        if new is None or old is None:
+            continue
+        change = (new - old) / old if old else 0.0
+        worse = -change if higher_is_better else change
+        metrics.append({
+            "metric": path,
+            "baseline": old,
+            "current": new,
+            "change": round(change, 4),
+            "regressed": worse > tolerance
+        })
+    settings = ("size", "duplicate_rate", "seed")
+    return {
+        "baseline_commit": baseline.get("environment", {}).get("git_commit"),
+        # Rolls of a different size or seed make throughput and quality incomparable
+        "same_roll": all(
+            current.get("roll", {}).get(key) == baseline.get("roll", {}).get(key) for key in settings
+        ),
+        "tolerance": tolerance,
+        "regressions": [metric["metric"] for metric in metrics if metric["regressed"]],
+        "metrics": metrics
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=10000, help="Records in the synthetic roll")
+    parser.add_argument("--duplicate-rate", type=float, default=0.05, help="Share of records that are extra registrations")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--threshold", type=float, default=0.7)
+    parser.add_argument("--blocking", default="standard")
+    parser.add_argument("--workers", type=int, default=0, help="Scoring worker processes (default 0: score in-process)")
+    parser.add_argument("--string-calls", type=int, default=20000)
+    parser.add_argument("--predict-calls", type=int, default=1000)
+    parser.add_argument("--classifier-batch", type=int, default=100000)
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc run of batch_detect")
+    parser.add_argument("--output", help="Write the JSON report to this file as well as stdout")
+    parser.add_argument("--compare", help="Baseline JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed relative regression for --compare")
+    args = parser.parse_args(argv)
+
+    roll_start = time.perf_counter()
+    records, truth = generate_roll(args.size, args.duplicate_rate, args.seed)
+    roll_seconds = time.perf_counter() - roll_start
+
+    service = DuplicateDetectionService(workers=args.workers)
+    try:
+        report = {
+            "benchmark": "duplicate_engine",
+            "timestamp": datetime.utcnow().isoformat(),
+            "environment": {
+                "git_commit": _git_commit(),
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "workers": args.workers
+            },
+            "roll": {
+                "size": len(records),
+                "true_pairs": len(truth),
+                "duplicate_rate": args.duplicate_rate,
+                "seed": args.seed,
+                "generate_seconds": round(roll_seconds, 3)
+            },
+            "string_matcher": bench_string_matcher(records, args.string_calls, args.seed),
+            "predict_duplicate": bench_predict_duplicate(service, records, truth, args.predict_calls, args.seed),
+            "batch_detect": bench_batch_detect(
+                service, records, truth, args.threshold, args.blocking, not args.no_memory
+            ),
+            "classifier": bench_classifier(service, args.classifier_batch, args.seed)
+        }
+    finally:
+        service.shutdown()
+
+    status = 0
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            report["comparison"] = compare_reports(report, json.load(f), args.tolerance)
+        status = 1 if report["comparison"]["regressions"] else 0
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
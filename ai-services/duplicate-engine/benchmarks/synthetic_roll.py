@@ -0,0 +1,303 @@
+"""
+Synthetic voter roll generator for benchmarks
+Builds rolls with the record layout of samples/sample_records.json and
+injects known duplicates (typos, transliteration variants, abbreviated names,
+DOB slips, shortened addresses) so precision and recall can be measured
+"""
+
+import json
+import os
+import random
+from datetime import date, timedelta
+from itertools import combinations
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+SAMPLE_RECORDS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "samples", "sample_records.json")
+
+MALE_NAMES = [
+    "Rajesh", "Ramesh", "Suresh", "Mahesh", "Mohammed", "Abdul", "Srinivas", "Venkatesh",
+    "Arjun", "Vijay", "Sanjay", "Anil", "Sunil", "Prakash", "Ganesh", "Krishna", "Harish",
+    "Manoj", "Deepak", "Ravi", "Gopal", "Mukesh", "Dinesh", "Naresh", "Yusuf", "Gurpreet",
+    "Harpreet", "Subramanian", "Karthik", "Ashok", "Bhaskar", "Chandrasekhar", "Rakesh", "Satish"
+]
+FEMALE_NAMES = [
+    "Sunita", "Lakshmi", "Priya", "Anita", "Kavita", "Fatima", "Geeta", "Sita", "Radha",
+    "Meena", "Rekha", "Pooja", "Shabana", "Jaspreet", "Savitri", "Parvati", "Kamala",
+    "Usha", "Asha", "Nirmala", "Saraswati", "Durga", "Vijaya", "Shanti", "Lata"
+]
+SURNAMES = [
+    "Kumar", "Sharma", "Verma", "Singh", "Patel", "Reddy", "Rao", "Nair", "Iyer", "Khan",
+    "Ansari", "Gupta", "Yadav", "Das", "Chatterjee", "Mukherjee", "Pillai", "Naidu",
+    "Choudhary", "Mishra", "Pandey", "Shaikh", "Joshi", "Kulkarni", "Gill", "Devi"
+]
+
+# Common romanization variants of the same name
+TRANSLITERATIONS = {
+    "Mohammed": ["Mohammad", "Muhammad", "Mohamed", "Mohd"],
+    "Lakshmi": ["Laxmi", "Lakshmy"],
+    "Srinivas": ["Shrinivas", "Sreenivas", "Srinivasa"],
+    "Venkatesh": ["Venkatesan", "Venkatesha"],
+    "Chatterjee": ["Chattopadhyay", "Chaterjee"],
+    "Mukherjee": ["Mukhopadhyay", "Mukerji"],
+    "Choudhary": ["Chaudhary", "Chowdhury", "Choudhury"],
+    "Yusuf": ["Yousuf", "Yousaf"],
+    "Shaikh": ["Sheikh", "Shaik"],
+    "Gurpreet": ["Gurprit"],
+    "Harpreet": ["Harprit"],
+    "Subramanian": ["Subramaniam", "Subramanyam"],
+    "Chandrasekhar": ["Chandrashekar", "Chandrasekar"],
+    "Savitri": ["Savithri"],
+    "Parvati": ["Parvathi"],
+    "Saraswati": ["Saraswathi"],
+    "Kavita": ["Kavitha"],
+    "Geeta": ["Gita", "Geetha"],
+    "Sita": ["Seeta", "Seetha"],
+    "Devi": ["Debi"],
+    "Kumar": ["Kumaar"],
+    "Reddy": ["Reddi"],
+    "Iyer": ["Aiyar", "Ayyar"],
+    "Krishna": ["Krishnan", "Krushna"],
+    "Shanti": ["Shanthi"],
+}
+
+STREETS = [
+    ("Main Street", "Main St"), ("Station Road", "Station Rd"), ("Gandhi Nagar", "Gandhi Ngr"),
+    ("Mahatma Gandhi Road", "MG Road"), ("Nehru Colony", "Nehru Clny"), ("Temple Street", "Temple St"),
+    ("Market Road", "Market Rd"), ("Church Lane", "Church Ln"), ("Ambedkar Nagar", "Ambedkar Ngr"),
+    ("Subhash Chowk", "Subhash Chk"), ("Old Bazaar", "Old Bazar"), ("Railway Colony", "Rly Colony")
+]
+LOCALITIES = [
+    ("Delhi", "New Delhi", "Delhi", "110001"),
+    ("Delhi", "South Delhi", "Delhi", "110017"),
+    ("Mumbai", "Mumbai Suburban", "Maharashtra", "400053"),
+    ("Pune", "Pune", "Maharashtra", "411001"),
+    ("Bengaluru", "Bangalore Urban", "Karnataka", "560001"),
+    ("Mysuru", "Mysore", "Karnataka", "570001"),
+    ("Chennai", "Chennai", "Tamil Nadu", "600001"),
+    ("Madurai", "Madurai", "Tamil Nadu", "625001"),
+    ("Kolkata", "Kolkata", "West Bengal", "700001"),
+    ("Hyderabad", "Hyderabad", "Telangana", "500001"),
+    ("Lucknow", "Lucknow", "Uttar Pradesh", "226001"),
+    ("Patna", "Patna", "Bihar", "800001"),
+    ("Jaipur", "Jaipur", "Rajasthan", "302001"),
+    ("Amritsar", "Amritsar", "Punjab", "143001"),
+    ("Kochi", "Ernakulam", "Kerala", "682001"),
+    ("Bhopal", "Bhopal", "Madhya Pradesh", "462001")
+]
+
+_LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+# Registrations per duplicate group, drawn uniformly
+_GROUP_SIZES = (2, 2, 2, 3, 4)
+_EXTRA_COPIES = sum(size - 1 for size in _GROUP_SIZES) / len(_GROUP_SIZES)
+
+
+def sample_layout(path: str = SAMPLE_RECORDS) -> Tuple[List[str], List[str]]:
+    """Record keys and address keys of the sample roll, in order"""
+    with open(path, "r", encoding="utf-8") as f:
+        sample = json.load(f)[0]
+    return list(sample), list(sample["address"])
+
+
+class SyntheticRollGenerator:
+    """
+    Seeded generator of voter rolls with known duplicate groups
+
+    Each duplicate group is one person registered 2-4 times. Copies get a
+    random mix of perturbations: a typo or transliteration variant in a
+    name, a surname cut to its initial, a DOB off by a day, a different
+    mobile number, a missing Aadhaar, or the short form of the street.
+    """
+
+    def __init__(self, seed: int = 42, face_dim: int = 0):
+        self.random = random.Random(seed)
+        self.numpy_random = np.random.default_rng(seed)
+        self.face_dim = face_dim
+        self.record_keys, self.address_keys = sample_layout()
+
+    def generate(
+        self,
+        size: int,
+        duplicate_rate: float = 0.05,
+        face_rate: float = 0.0
+    ) -> Tuple[List[Dict[str, Any]], Set[Tuple[int, int]]]:
+        """
+        Generate a roll of exactly size records
+
+        Args:
+            size: Number of records
+            duplicate_rate: Fraction of records that are extra registrations of someone else
+            face_rate: Fraction of people with a face embedding (needs face_dim)
+
+        Returns:
+            Tuple of (records in shuffled order, set of true duplicate (id, id) pairs with the smaller id first)
+        """
+        rng = self.random
+        records: List[Dict[str, Any]] = []
+        groups: List[List[int]] = []
+        next_id = 1
+
+        # Groups average _EXTRA_COPIES extra registrations; pick the share of
+        # people with a group so extras make up duplicate_rate of the roll
+        duplicate_rate = min(max(duplicate_rate, 0.0), 0.9)
+        group_rate = min(1.0, duplicate_rate / (_EXTRA_COPIES * (1 - duplicate_rate)))
+
+        while len(records) < size:
+            person = self._person(face_rate)
+            copies = 1
+            if rng.random() < group_rate:
+                copies = rng.choice(_GROUP_SIZES)
+            copies = min(copies, size - len(records))
+            group = []
+            for k in range(copies):
+                record = person if k == 0 else self._perturb(person)
+                records.append(self._layout({**record, "voter_id": next_id}))
+                group.append(next_id)
+                next_id += 1
+            if len(group) > 1:
+                groups.append(group)
+
+        rng.shuffle(records)
+        truth = {
+            (min(a, b), max(a, b))
+            for group in groups
+            for a, b in combinations(group, 2)
+        }
+        return records, truth
+
+    def _person(self, face_rate: float) -> Dict[str, Any]:
+        """One distinct person"""
+        rng = self.random
+        female = rng.random() < 0.5
+        surname = rng.choice(SURNAMES)
+        street_full, _ = rng.choice(STREETS)
+        city, district, state, pin = rng.choice(LOCALITIES)
+        born = date(1940, 1, 1) + timedelta(days=rng.randrange(365 * 65))
+
+        person = {
+            "name": f"{rng.choice(FEMALE_NAMES if female else MALE_NAMES)} {surname}",
+            "father_name": f"{rng.choice(MALE_NAMES)} {surname}",
+            "mother_name": f"{rng.choice(FEMALE_NAMES)} {rng.choice(SURNAMES)}",
+            "dob": born.isoformat(),
+            "mobile_number": f"{rng.choice('6789')}{rng.randrange(10 ** 9):09d}",
+            "aadhaar_number": f"{rng.randrange(2, 10)}{rng.randrange(10 ** 11):011d}",
+            "address": {
+                "house_number": str(rng.randrange(1, 999)),
+                "street": street_full,
+                "village_city": city,
+                "district": district,
+                "state": state,
+                "pin_code": pin
+            }
+        }
+        if self.face_dim and rng.random() < face_rate:
+            vector = self.numpy_random.standard_normal(self.face_dim).astype(np.float32)
+            person["face_embedding"] = (vector / np.linalg.norm(vector)).tolist()
+        return person
+
+    def _perturb(self, person: Dict[str, Any]) -> Dict[str, Any]:
+        """A second registration of the same person"""
+        rng = self.random
+        record = {**person, "address": dict(person["address"])}
+
+        name_edits = [self._transliterate, self._typo, self._initial_surname]
+        record["name"] = rng.choice(name_edits)(record["name"]) if rng.random() < 0.8 else record["name"]
+        if rng.random() < 0.3:
+            record["father_name"] = rng.choice(name_edits)(record["father_name"])
+        if rng.random() < 0.2:
+            record["mother_name"] = self._typo(record["mother_name"])
+        if rng.random() < 0.15:
+            born = date.fromisoformat(record["dob"]) + timedelta(days=rng.choice([-1, 1]))
+            record["dob"] = born.isoformat()
+        if rng.random() < 0.4:
+            record["mobile_number"] = f"{rng.choice('6789')}{rng.randrange(10 ** 9):09d}"
+        if rng.random() < 0.3:
+            record["aadhaar_number"] = None
+        if rng.random() < 0.5:
+            short = dict(STREETS).get(record["address"]["street"])
+            if short:
+                record["address"]["street"] = short
+        if rng.random() < 0.2:
+            record["address"]["house_number"] = str(rng.randrange(1, 999))
+        if "face_embedding" in record and rng.random() < 0.9:
+            noise = self.numpy_random.normal(0.0, 0.02, len(record["face_embedding"]))
+            vector = np.asarray(record["face_embedding"]) + noise
+            record["face_embedding"] = (vector / np.linalg.norm(vector)).astype(np.float32).tolist()
+        return record
+
+    def _transliterate(self, name: str) -> str:
+        """Swap one word for a romanization variant, or fall back to a typo"""
+        words = name.split()
+        options = [k for k, word in enumerate(words) if word in TRANSLITERATIONS]
+        if not options:
+            return self._typo(name)
+        k = self.random.choice(options)
+        words[k] = self.random.choice(TRANSLITERATIONS[words[k]])
+        return " ".join(words)
+
+    def _typo(self, name: str) -> str:
+        """One substitution, deletion, insertion or transposition, never on the first letter"""
+        rng = self.random
+        if len(name) < 4:
+            return name
+        k = rng.randrange(1, len(name) - 1)
+        edit = rng.choice(("substitute", "delete", "insert", "transpose"))
+        if edit == "substitute":
+            return name[:k] + rng.choice(_LETTERS) + name[k + 1:]
+        if edit == "delete":
+            return name[:k] + name[k + 1:]
+        if edit == "insert":
+            return name[:k] + rng.choice(_LETTERS) + name[k:]
+        return name[:k] + name[k + 1] + name[k] + name[k + 2:]
+
+    def _initial_surname(self, name: str) -> str:
+        """'Rajesh Kumar' -> 'Rajesh K'"""
+        words = name.split()
+        if len(words) < 2:
+            return name
+        return " ".join(words[:-1] + [words[-1][0]])
+
+    def _layout(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Order keys like the sample roll (face_embedding, when present, last)"""
+        ordered = {key: record.get(key) for key in self.record_keys}
+        ordered["address"] = {key: record["address"].get(key) for key in self.address_keys}
+        if "face_embedding" in record:
+            ordered["face_embedding"] = record["face_embedding"]
+        return ordered
+
+
+def generate_roll(
+    size: int,
+    duplicate_rate: float = 0.05,
+    seed: int = 42,
+    face_dim: int = 0,
+    face_rate: float = 0.0
+) -> Tuple[List[Dict[str, Any]], Set[Tuple[int, int]]]:
+    """Convenience wrapper around SyntheticRollGenerator.generate"""
+    return SyntheticRollGenerator(seed=seed, face_dim=face_dim).generate(size, duplicate_rate, face_rate)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Write a synthetic roll (and its true pairs) to JSON files"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate a synthetic voter roll with known duplicates")
+    parser.add_argument("--size", type=int, default=10000)
+    parser.add_argument("--duplicate-rate", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="synthetic_roll.json")
+    parser.add_argument("--truth", default="synthetic_roll_truth.json")
+    args = parser.parse_args(argv)
+
+    records, truth = generate_roll(args.size, args.duplicate_rate, args.seed)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(records, f)
+    with open(args.truth, "w", encoding="utf-8") as f:
+        json.dump(sorted(truth), f)
+    print(f"Wrote {len(records)} records to {args.output} and {len(truth)} true pairs to {args.truth}")
+
+
+if __name__ == "__main__":
+    main()
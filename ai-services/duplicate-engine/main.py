@@ -3,15 +3,39 @@ AI Duplicate Voter Detection Engine
 FastAPI microservice for detecting duplicate voter records using ML and fuzzy matching
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, File, HTTPException, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Optional, Dict, Any
+import asyncio
+import json
 import logging
+import os
+import sys
 from datetime import datetime
 
-from services.duplicate_service import DuplicateDetectionService
-from models.duplicate_models import DuplicateRequest, DuplicateResponse
+# Modules shared by the AI services live in ai-services/shared
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.duplicate_service import DuplicateDetectionService, STREAM_PROGRESS_EVERY
+from shared.job_queue import JobQueue
+from shared.ndjson import NDJSONStreamingResponse
+from utils.blocking import DEFAULT_BLOCKING_STRATEGY
+from utils.columnar_ingest import detect_format
+from utils.clustering import OUTPUT_MODES
+from models.duplicate_models import (
+    DuplicateRequest,
+    DuplicateResponse,
+    BulkDuplicateRequest,
+    BulkDuplicateResponse,
+    FaceIndexAddRequest,
+    FaceIndexRemoveRequest,
+    FaceSearchRequest,
+    FaceSearchResponse,
+    VoterIndexDeleteRequest,
+    FindDuplicatesRequest,
+    FindDuplicatesResponse
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -32,14 +56,51 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Directory that /batch-run/file may read roll files from (path mode is disabled when unset)
+BATCH_INPUT_DIR = os.getenv("BATCH_INPUT_DIR")
+
 # Initialize service
 duplicate_service = DuplicateDetectionService()
+job_queue = JobQueue(
+    os.getenv("JOB_DB_PATH", "duplicate-jobs.sqlite3"),
+    max_workers=int(os.getenv("JOB_WORKERS", "2"))
+)
+
+@app.on_event("shutdown")
+async def shutdown_scoring_workers():
+    """Stop background jobs and batch scoring worker processes"""
+    job_queue.shutdown()
+    duplicate_service.shutdown()
 
 class HealthResponse(BaseModel):
     status: str
     timestamp: str
     service: str
 
+def batch_response(total_records: int, result: Dict[str, Any], output: str) -> Dict[str, Any]:
+    """Build a batch-run response with duplicate pairs, clusters or both"""
+    response = {
+        "total_records": total_records,
+        "potential_duplicates": len(result["duplicates"]),
+        "pairs_scored": result["blocking"]["candidate_pairs"],
+        "pairs_pruned": result["blocking"]["pruned_pairs"],
+        "blocking": result["blocking"]
+    }
+    if "ingest" in result:
+        response["ingest"] = result["ingest"]
+    if output in ("clusters", "both"):
+        clusters = duplicate_service.clusterer.cluster(result["duplicates"])
+        response["total_clusters"] = len(clusters)
+        response["clusters"] = clusters
+    if output in ("pairs", "both"):
+        response["duplicates"] = result["duplicates"]
+    return response
+
+def check_output_mode(output: str) -> None:
+    """Reject unknown batch output modes"""
+    if output not in OUTPUT_MODES:
+        raise ValueError(f"Unknown output {output!r}; expected one of {list(OUTPUT_MODES)}")
+
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
     """Health check endpoint"""
@@ -49,6 +110,28 @@ async def health_check():
         "service": "duplicate-detection-engine"
     }
 
+@app.get("/model")
+async def model_info():
+    """Active duplicate classifier backend and model file"""
+    return duplicate_service.ml_classifier.info()
+
+@app.post("/model/reload")
+async def reload_model():
+    """
+    Reload the model file at DUPLICATE_MODEL_PATH without restarting
+    
+    Replace the file (ideally by an atomic rename) and call this endpoint.
+    Batch scoring workers pick the new model up with their next shard. If
+    the file is not a valid model the previous model stays active.
+    """
+    try:
+        return await asyncio.to_thread(duplicate_service.ml_classifier.reload)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error reloading model: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Model reload failed: {str(e)}")
+
 @app.post("/predict-duplicate", response_model=DuplicateResponse)
 async def predict_duplicate(request: DuplicateRequest):
     """
@@ -76,27 +159,356 @@ async def predict_duplicate(request: DuplicateRequest):
         logger.error(f"Error in duplicate prediction: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Duplicate prediction failed: {str(e)}")
 
+@app.post("/predict-duplicates", response_model=BulkDuplicateResponse)
+async def predict_duplicates(request: BulkDuplicateRequest):
+    """
+    Predict duplicates for many record pairs in one round-trip
+    
+    Features for all pairs are extracted into a single matrix and classified
+    in one call; results are returned in request order.
+    """
+    try:
+        logger.info(f"Processing bulk duplicate prediction for {len(request.pairs)} pairs")
+        
+        results = await asyncio.to_thread(
+            duplicate_service.predict_many,
+            [(pair.record1, pair.record2) for pair in request.pairs]
+        )
+        
+        return {
+            "total_pairs": len(results),
+            "results": results
+        }
+    except Exception as e:
+        logger.error(f"Error in bulk duplicate prediction: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Bulk duplicate prediction failed: {str(e)}")
+
 @app.post("/batch-run")
-async def batch_run_duplicate_detection(records: list[Dict[str, Any]], threshold: float = 0.7):
+async def batch_run_duplicate_detection(
+    records: list[Dict[str, Any]],
+    threshold: float = 0.7,
+    blocking: str = DEFAULT_BLOCKING_STRATEGY,
+    max_block_size: Optional[int] = None,
+    output: str = "pairs"
+):
     """
     Run duplicate detection on a batch of records
     
-    Returns pairs of potential duplicates with scores above threshold
+    Candidate pairs come from the blocking stage (`blocking` is a strategy
+    name such as "standard", "phonetic", "strict" or "none", or a custom spec
+    like "soundex+birth_year,aadhaar_last4").
+    
+    Returns pairs of potential duplicates with scores above threshold,
+    plus how many pairs were pruned by blocking versus scored. With
+    output=clusters (or both), matched pairs are grouped into duplicate
+    clusters: connected components with a representative record, size and
+    min/max score.
     """
     try:
+        check_output_mode(output)
         logger.info(f"Running batch duplicate detection on {len(records)} records")
         
-        results = await duplicate_service.batch_detect(records, threshold)
+        result = await duplicate_service.batch_detect(
+            records,
+            threshold,
+            blocking=blocking,
+            max_block_size=max_block_size
+        )
         
-        return {
-            "total_records": len(records),
-            "potential_duplicates": len(results),
-            "duplicates": results
-        }
+        return batch_response(len(records), result, output)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error in batch duplicate detection: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Batch detection failed: {str(e)}")
 
+@app.post("/batch-run/stream")
+async def batch_run_stream(
+    request: Request,
+    threshold: float = 0.7,
+    blocking: str = DEFAULT_BLOCKING_STRATEGY,
+    max_block_size: Optional[int] = None,
+    progress_every: int = STREAM_PROGRESS_EVERY
+):
+    """
+    Streaming batch duplicate detection
+    
+    The request body is NDJSON, one voter record per line. The response is
+    NDJSON as well: a "duplicate" line for each pair above threshold as soon
+    as it is scored, a "progress" line every `progress_every` records, an
+    "error" line for each unparseable input line, and a final "summary" line
+    with the same counters and blocking statistics as /batch-run.
+    """
+    try:
+        results = duplicate_service.stream_detect(
+            request.stream(),
+            threshold,
+            blocking=blocking,
+            max_block_size=max_block_size,
+            progress_every=progress_every
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    async def ndjson():
+        try:
+            async for line in results:
+                yield json.dumps(line) + "\n"
+        except Exception as e:
+            # Headers are already sent, so report the failure in-band
+            logger.error(f"Error in streaming batch detection: {str(e)}")
+            yield json.dumps({"type": "error", "detail": f"Batch detection failed: {str(e)}"}) + "\n"
+    
+    return NDJSONStreamingResponse(ndjson())
+
+@app.post("/batch-run/file")
+async def batch_run_file(
+    file: Optional[UploadFile] = File(None),
+    path: Optional[str] = None,
+    format: Optional[str] = None,
+    threshold: float = 0.7,
+    blocking: str = DEFAULT_BLOCKING_STRATEGY,
+    max_block_size: Optional[int] = None,
+    output: str = "pairs"
+):
+    """
+    Run duplicate detection on a roll file instead of a JSON record list
+    
+    The roll is either uploaded as `file` or read from `path` under
+    BATCH_INPUT_DIR. CSV, Parquet and Arrow IPC are read column-wise
+    (format is taken from the extension unless given); records have flat
+    columns (voter_id, name, ..., house_number, ..., pin_code) and face
+    embeddings as face_0..face_N columns or a face_embedding list column.
+    The response matches /batch-run (including `output`), plus ingest statistics.
+    """
+    try:
+        check_output_mode(output)
+        duplicate_service.candidate_generator.parse_strategy(blocking)
+        if (file is None) == (path is None):
+            raise ValueError("Provide exactly one of an uploaded file or a path")
+        
+        if file is not None:
+            file_format = detect_format(file.filename, format)
+            result = await duplicate_service.batch_detect_file(
+                file.file, file_format, threshold, blocking=blocking, max_block_size=max_block_size
+            )
+        else:
+            if not BATCH_INPUT_DIR:
+                raise ValueError("Reading rolls from a server path is disabled; set BATCH_INPUT_DIR")
+            root = os.path.realpath(BATCH_INPUT_DIR)
+            full_path = os.path.realpath(os.path.join(root, path))
+            if os.path.commonpath([root, full_path]) != root or not os.path.isfile(full_path):
+                raise ValueError(f"Roll file {path!r} not found under BATCH_INPUT_DIR")
+            file_format = detect_format(full_path, format)
+            with open(full_path, 'rb') as source:
+                result = await duplicate_service.batch_detect_file(
+                    source, file_format, threshold, blocking=blocking, max_block_size=max_block_size
+                )
+        
+        return batch_response(result["ingest"]["rows"], result, output)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error in file batch duplicate detection: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Batch detection failed: {str(e)}")
+
+@app.post("/jobs/batch-run", status_code=202)
+async def submit_batch_run_job(
+    records: list[Dict[str, Any]],
+    threshold: float = 0.7,
+    blocking: str = DEFAULT_BLOCKING_STRATEGY,
+    max_block_size: Optional[int] = None
+):
+    """
+    Queue batch duplicate detection as a background job
+    
+    Takes the same body and parameters as /batch-run and returns the job
+    status immediately; poll /jobs/{job_id} and page through
+    /jobs/{job_id}/results for the duplicates.
+    """
+    try:
+        duplicate_service.candidate_generator.parse_strategy(blocking)
+        logger.info(f"Queueing batch duplicate detection job for {len(records)} records")
+        
+        return job_queue.submit(
+            "batch-run",
+            lambda job: duplicate_service.run_batch_job(
+                job, records, threshold, blocking=blocking, max_block_size=max_block_size
+            ),
+            params={
+                "total_records": len(records),
+                "threshold": threshold,
+                "blocking": blocking,
+                "max_block_size": max_block_size
+            }
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error queueing batch job: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Job submission failed: {str(e)}")
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Job status, progress percentage and summary"""
+    try:
+        return job_queue.get(job_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+
+@app.get("/jobs/{job_id}/results")
+async def get_job_results(job_id: str, offset: int = 0, limit: int = 1000):
+    """Page through a job's results; available while the job is still running"""
+    try:
+        job = job_queue.get(job_id)
+        return {
+            "job_id": job_id,
+            "status": job["status"],
+            "total": job["result_count"],
+            "offset": offset,
+            "results": job_queue.results(job_id, offset=offset, limit=min(limit, 10000))
+        }
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+
+@app.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """Cancel a queued or running job; results produced so far are kept"""
+    try:
+        return job_queue.cancel(job_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.post("/voter-index/load")
+async def voter_index_load(records: list[Dict[str, Any]], replace: bool = True):
+    """
+    Bulk-load the resident voter index
+    
+    With replace (the default) the index and face index are cleared first;
+    otherwise records are upserted into the existing index.
+    """
+    try:
+        logger.info(f"Loading {len(records)} records into the voter index")
+        counts = await asyncio.to_thread(duplicate_service.index_records, records, replace)
+        return {**counts, **duplicate_service.voter_index.stats()}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error loading voter index: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Voter index load failed: {str(e)}")
+
+@app.post("/voter-index/upsert")
+async def voter_index_upsert(records: list[Dict[str, Any]]):
+    """Insert new voters or update existing ones (matched on voter_id)"""
+    try:
+        counts = await asyncio.to_thread(duplicate_service.index_records, records)
+        return {**counts, **duplicate_service.voter_index.stats()}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error updating voter index: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Voter index upsert failed: {str(e)}")
+
+@app.post("/voter-index/delete")
+async def voter_index_delete(request: VoterIndexDeleteRequest):
+    """Remove voters from the resident voter index"""
+    try:
+        removed = duplicate_service.remove_records(request.voter_ids)
+        return {"removed": removed, **duplicate_service.voter_index.stats()}
+    except Exception as e:
+        logger.error(f"Error deleting from voter index: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Voter index delete failed: {str(e)}")
+
+@app.get("/voter-index/stats")
+async def voter_index_stats():
+    """Resident voter index size and blocking configuration"""
+    return duplicate_service.voter_index.stats()
+
+@app.post("/find-duplicates", response_model=FindDuplicatesResponse)
+async def find_duplicates(request: FindDuplicatesRequest):
+    """
+    Check one incoming record for duplicates in the resident voter index
+    
+    Only voters sharing a blocking key with the record, plus its nearest
+    face-embedding neighbours, are scored, so the check does not grow with
+    the size of the roll.
+    """
+    try:
+        return duplicate_service.find_duplicates(
+            request.record,
+            threshold=request.threshold,
+            max_results=request.max_results
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error finding duplicates: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Duplicate lookup failed: {str(e)}")
+
+@app.post("/face-index/add")
+async def face_index_add(request: FaceIndexAddRequest):
+    """Add or replace voter face embeddings in the face index"""
+    try:
+        # Adding can trigger IVF k-means training
+        added = await asyncio.to_thread(
+            duplicate_service.face_index.add,
+            [item.voter_id for item in request.items],
+            [item.embedding for item in request.items]
+        )
+        return {"added": added, **duplicate_service.face_index.stats()}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error adding to face index: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Face index add failed: {str(e)}")
+
+@app.post("/face-index/remove")
+async def face_index_remove(request: FaceIndexRemoveRequest):
+    """Remove voter face embeddings from the face index"""
+    try:
+        removed = duplicate_service.face_index.remove(request.voter_ids)
+        return {"removed": removed, **duplicate_service.face_index.stats()}
+    except Exception as e:
+        logger.error(f"Error removing from face index: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Face index remove failed: {str(e)}")
+
+@app.post("/face-index/search", response_model=FaceSearchResponse)
+async def face_index_search(request: FaceSearchRequest):
+    """
+    Find the voters whose face embeddings are most similar to a probe
+    
+    Exact search for small indexes, IVF approximate search for large ones
+    """
+    try:
+        matches = duplicate_service.face_index.search(
+            request.embedding,
+            top_k=request.top_k,
+            min_similarity=request.min_similarity,
+            nprobe=request.nprobe
+        )
+        return {
+            "matches": [{"voter_id": voter_id, "similarity": score} for voter_id, score in matches],
+            "index_size": len(duplicate_service.face_index),
+            "mode": duplicate_service.face_index.mode
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error searching face index: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Face index search failed: {str(e)}")
+
+@app.get("/face-index/stats")
+async def face_index_stats():
+    """Face index size and configuration"""
+    return duplicate_service.face_index.stats()
+
+@app.get("/scoring/cascade-stats")
+async def cascade_stats():
+    """Pairs the scoring cascade dropped at each stage since startup"""
+    return duplicate_service.cascade_stats()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8001)
@@ -3,7 +3,7 @@ Pydantic models for duplicate detection service
 """
 
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 
 class DuplicateRequest(BaseModel):
     """Request model for duplicate prediction"""
@@ -18,4 +18,65 @@ class DuplicateResponse(BaseModel):
     algorithm_flags: list[str] = Field(default_factory=list, description="Algorithms that flagged this as duplicate")
     recommendation: str = Field(..., description="Recommendation: 'merge', 'review', or 'dismiss'")
 
+class BulkDuplicateRequest(BaseModel):
+    """Request model for bulk duplicate prediction"""
+    pairs: List[DuplicateRequest] = Field(..., description="Record pairs to compare")
 
+class BulkDuplicateResponse(BaseModel):
+    """Response model for bulk duplicate prediction"""
+    total_pairs: int = Field(..., description="Number of pairs scored")
+    results: List[DuplicateResponse] = Field(..., description="Predictions, in the same order as the request pairs")
+
+class FaceIndexItem(BaseModel):
+    """A voter's face embedding for the face index"""
+    voter_id: Any = Field(..., description="Voter ID")
+    embedding: List[float] = Field(..., description="Face embedding vector")
+
+class FaceIndexAddRequest(BaseModel):
+    """Request model for adding embeddings to the face index"""
+    items: List[FaceIndexItem] = Field(..., description="Embeddings to add or replace")
+
+class FaceIndexRemoveRequest(BaseModel):
+    """Request model for removing embeddings from the face index"""
+    voter_ids: List[Any] = Field(..., description="Voter IDs to remove")
+
+class FaceSearchRequest(BaseModel):
+    """Request model for face index search"""
+    embedding: List[float] = Field(..., description="Probe face embedding")
+    top_k: int = Field(10, ge=1, le=1000, description="Number of matches to return")
+    min_similarity: float = Field(0.0, ge=0.0, le=1.0, description="Minimum cosine similarity")
+    nprobe: Optional[int] = Field(None, ge=1, description="Inverted lists to scan (IVF mode only)")
+
+class FaceMatch(BaseModel):
+    """A face index search hit"""
+    voter_id: Any
+    similarity: float
+
+class FaceSearchResponse(BaseModel):
+    """Response model for face index search"""
+    matches: List[FaceMatch]
+    index_size: int
+    mode: str
+
+
+class VoterIndexDeleteRequest(BaseModel):
+    """Request model for removing voters from the resident voter index"""
+    voter_ids: List[Any] = Field(..., description="Voter IDs to remove")
+
+class FindDuplicatesRequest(BaseModel):
+    """Request model for checking one record against the resident voter index"""
+    record: Dict[str, Any] = Field(..., description="Incoming voter record")
+    threshold: float = Field(0.7, ge=0.0, le=1.0, description="Minimum duplicate probability")
+    max_results: int = Field(20, ge=1, le=1000, description="Maximum matches to return")
+
+class DuplicateMatch(DuplicateResponse):
+    """An indexed voter that may duplicate the incoming record"""
+    voter_id: Any = Field(..., description="Voter ID of the indexed record")
+
+class FindDuplicatesResponse(BaseModel):
+    """Response model for resident-index duplicate lookup"""
+    voter_id: Any = Field(None, description="Voter ID of the incoming record")
+    candidates_scored: int = Field(..., description="Indexed records compared with the incoming one")
+    skipped_blocks: int = Field(..., description="Oversized blocks left out of the candidate set")
+    index_size: int = Field(..., description="Records in the resident voter index")
+    matches: List[DuplicateMatch] = Field(..., description="Matches above threshold, best first")
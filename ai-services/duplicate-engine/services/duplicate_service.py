@@ -3,24 +3,249 @@ Duplicate Detection Service
 Implements ML and fuzzy matching algorithms for duplicate detection
 """
 
+import asyncio
 import logging
-from typing import Dict, Any, List
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, BinaryIO, Dict, Any, Iterator, List, Optional, Sequence, Tuple
 import numpy as np
-from datetime import datetime
 
 from utils.string_matching import StringMatcher
-from utils.ml_classifier import DuplicateClassifier
+from utils.ml_classifier import (
+    DuplicateClassifier, FEATURE_NAMES,
+    NAME, FATHER_NAME, MOTHER_NAME, DOB, ADDRESS, PHONE, AADHAAR, FACE
+)
+from utils.blocking import CandidateGenerator, IncrementalBlocker, DEFAULT_BLOCKING_STRATEGY
+from utils.record_preprocessing import PreparedRecord, RecordPreprocessor
+from utils.voter_index import VoterIndex
+from utils.columnar_ingest import read_roll
+from utils.clustering import DuplicateClusterer
+from shared.embedding_index import EmbeddingIndex
+from shared.job_queue import JobContext
+from shared.ndjson import iter_ndjson
 
 logger = logging.getLogger(__name__)
 
+# Candidate pairs scored per feature matrix in batch runs
+BATCH_CHUNK_SIZE = 10000
+
+# Records between progress lines in streaming batch runs
+STREAM_PROGRESS_EVERY = 1000
+
+# Nearest face-index neighbours added to a /find-duplicates probe's block candidates
+FIND_FACE_CANDIDATES = 20
+FIND_FACE_MIN_SIMILARITY = 0.8
+
+# Batch runs with fewer candidate pairs than this are scored in a thread
+# instead of being sharded across worker processes
+PARALLEL_MIN_PAIRS = 20000
+
+# Cascade scoring stages, cheapest first: (stage name, feature columns it computes).
+# After each stage, pairs that can no longer reach the threshold are dropped.
+CASCADE_STAGES = (
+    ("exact_fields", (DOB, PHONE, AADHAAR, FACE)),
+    ("name", (NAME,)),
+    ("address", (ADDRESS,)),
+    ("parent_names", (FATHER_NAME, MOTHER_NAME)),
+)
+
+# Per-process service used by scoring workers
+_worker_service: Optional["DuplicateDetectionService"] = None
+
+
+def _init_scoring_worker() -> None:
+    """Build the scoring service once per worker process"""
+    global _worker_service
+    _worker_service = DuplicateDetectionService(workers=0)
+
+
+def _score_shard(
+    records: List[PreparedRecord],
+    pairs: List[Tuple[int, int]],
+    threshold: float,
+    model_source: Optional[Tuple[str, int]] = None
+) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    """Score one shard of candidate pairs in a worker process, with its cascade counters"""
+    _worker_service.ml_classifier.use_source(model_source)
+    counters = _new_cascade_counters()
+    return _worker_service._score_pairs(records, pairs, threshold, counters), counters
+
+
+def _new_cascade_counters() -> Dict[str, int]:
+    """Zeroed cascade counters: pairs seen, pairs pruned per stage, pairs fully scored"""
+    counters = {"pairs": 0, "fully_scored": 0}
+    counters.update((stage, 0) for stage, _ in CASCADE_STAGES)
+    return counters
+
+
+def _cascade_enabled() -> bool:
+    """Cascade scoring switch from DUPLICATE_CASCADE (on unless set to 0/false/off)"""
+    return os.getenv("DUPLICATE_CASCADE", "1").strip().lower() not in ("0", "false", "off", "no")
+
+
+def _default_workers() -> int:
+    """Worker process count from DUPLICATE_ENGINE_WORKERS (0 disables the pool)"""
+    value = os.getenv("DUPLICATE_ENGINE_WORKERS")
+    if value is None or value == "":
+        return os.cpu_count() or 1
+    return max(0, int(value))
+
+
 class DuplicateDetectionService:
     """Service for detecting duplicate voter records"""
     
-    def __init__(self):
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = _default_workers() if workers is None else workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
         self.string_matcher = StringMatcher()
         self.ml_classifier = DuplicateClassifier()
+        self.cascade = _cascade_enabled()
+        self._cascade_counters = _new_cascade_counters()
+        self._cascade_lock = threading.Lock()
+        self.preprocessor = RecordPreprocessor(self.string_matcher)
+        self.candidate_generator = CandidateGenerator()
+        self.clusterer = DuplicateClusterer()
+        self.face_index = EmbeddingIndex(
+            ivf_threshold=int(os.getenv("FACE_INDEX_IVF_THRESHOLD", "50000")),
+            nprobe=int(os.getenv("FACE_INDEX_NPROBE", "8"))
+        )
+        self.voter_index = VoterIndex(
+            self.candidate_generator,
+            strategy=os.getenv("VOTER_INDEX_BLOCKING", DEFAULT_BLOCKING_STRATEGY),
+            max_block_size=int(os.getenv("VOTER_INDEX_MAX_BLOCK_SIZE", "5000"))
+        )
         logger.info("DuplicateDetectionService initialized")
     
+    def index_records(self, records: List[Dict[str, Any]], replace: bool = False) -> Dict[str, int]:
+        """
+        Add or update records in the resident voter index
+        
+        Face embeddings are mirrored into the face index so /find-duplicates
+        can also reach look-alikes outside the probe's blocks. With replace,
+        both indexes are cleared first (a full roll reload).
+        
+        Returns:
+            Counts of inserted and updated records
+        """
+        prepared = self.preprocessor.prepare_many(records)
+        if any(record.voter_id is None for record in prepared):
+            raise ValueError("Every indexed record needs a voter_id")
+        
+        if replace:
+            self.voter_index.clear()
+            self.face_index.clear()
+        inserted, updated = self.voter_index.upsert(prepared)
+        
+        with_face = [record for record in prepared if record.face_embedding is not None]
+        if with_face:
+            self.face_index.add(
+                [record.voter_id for record in with_face],
+                np.stack([record.face_embedding for record in with_face])
+            )
+        if updated:
+            # An update without an embedding drops the voter's previous one
+            self.face_index.remove([record.voter_id for record in prepared if record.face_embedding is None])
+        
+        return {"inserted": inserted, "updated": updated}
+    
+    def remove_records(self, voter_ids: List[Any]) -> int:
+        """Remove voters from the resident voter index and the face index"""
+        self.face_index.remove(voter_ids)
+        return self.voter_index.remove(voter_ids)
+    
+    def find_duplicates(
+        self,
+        record: Dict[str, Any],
+        threshold: float = 0.7,
+        max_results: int = 20
+    ) -> Dict[str, Any]:
+        """
+        Score one incoming record against its candidates in the resident index
+        
+        Candidates are the indexed voters sharing a block with the record plus
+        its nearest neighbours in the face index; no other voter is compared.
+        
+        Returns:
+            Dictionary with matches above threshold (best first) and lookup counters
+        """
+        prepared = self.preprocessor.prepare(record)
+        candidates, skipped_blocks = self.voter_index.candidates(prepared)
+        
+        if prepared.face_embedding is not None and len(self.face_index):
+            seen = {candidate.voter_id for candidate in candidates}
+            seen.add(prepared.voter_id)
+            for voter_id, _ in self.face_index.search(
+                prepared.face_embedding,
+                top_k=FIND_FACE_CANDIDATES,
+                min_similarity=FIND_FACE_MIN_SIMILARITY
+            ):
+                candidate = self.voter_index.get(voter_id)
+                if candidate is not None and voter_id not in seen:
+                    candidates.append(candidate)
+        
+        matches = []
+        if candidates:
+            features, valid, probabilities = self._threshold_features(
+                [(prepared, candidate) for candidate in candidates],
+                threshold
+            )
+            hits = np.flatnonzero(valid & (probabilities >= threshold))
+            hits = hits[np.argsort(-probabilities[hits], kind='stable')][:max_results]
+            predictions = self._predictions_from_matrix(features[hits])
+            matches = [
+                {"voter_id": candidates[k].voter_id, **prediction}
+                for k, prediction in zip(hits.tolist(), predictions)
+            ]
+        
+        return {
+            "voter_id": prepared.voter_id,
+            "candidates_scored": len(candidates),
+            "skipped_blocks": skipped_blocks,
+            "index_size": len(self.voter_index),
+            "matches": matches
+        }
+    
+    def cascade_stats(self) -> Dict[str, Any]:
+        """Cumulative cascade counters across all threshold-scored pairs"""
+        with self._cascade_lock:
+            counters = dict(self._cascade_counters)
+        pairs = counters.pop("pairs")
+        fully_scored = counters.pop("fully_scored")
+        pruned = sum(counters.values())
+        return {
+            "enabled": self.cascade and self.ml_classifier.supports_upper_bound,
+            "pairs": pairs,
+            "fully_scored": fully_scored,
+            "pruned": pruned,
+            "pruned_by_stage": counters,
+            "pruned_fraction": round(pruned / pairs, 4) if pairs else 0.0
+        }
+    
+    def shutdown(self) -> None:
+        """Stop the scoring worker processes, if any were started"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+    
+    def _get_pool(self) -> Optional[ProcessPoolExecutor]:
+        """Start the scoring worker pool on first use"""
+        if self.workers < 2:
+            return None
+        with self._pool_lock:
+            if self._pool is None:
+                # spawn: forking a process that already runs the event loop's threads is unsafe
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_scoring_worker
+                )
+                logger.info(f"Started {self.workers} scoring worker processes")
+            return self._pool
+    
     async def predict_duplicate(
         self, 
         record1: Dict[str, Any], 
@@ -33,240 +258,641 @@ class DuplicateDetectionService:
             Dictionary with duplicate_probability, features, and recommendation
         """
         try:
-            # Extract features
-            features = self._extract_features(record1, record2)
-            
-            # Calculate individual similarity scores
-            name_score = self.string_matcher.jaro_winkler(
-                record1.get('name', ''), 
-                record2.get('name', '')
-            )
-            
-            father_name_score = self.string_matcher.jaro_winkler(
-                record1.get('father_name', '') or '',
-                record2.get('father_name', '') or ''
-            )
-            
-            mother_name_score = self.string_matcher.jaro_winkler(
-                record1.get('mother_name', '') or '',
-                record2.get('mother_name', '') or ''
-            )
-            
-            # DOB match (exact or within 1 day tolerance)
-            dob_match = self._compare_dob(
-                record1.get('dob'),
-                record2.get('dob')
-            )
-            
-            # Address similarity
-            address_score = self._compare_address(
-                record1.get('address', {}),
-                record2.get('address', {})
-            )
-            
-            # Phone number match
-            phone_match = 1.0 if (
-                record1.get('mobile_number') and 
-                record2.get('mobile_number') and
-                record1.get('mobile_number') == record2.get('mobile_number')
-            ) else 0.0
-            
-            # Aadhaar partial match (last 4 digits)
-            aadhaar_match = self._compare_aadhaar(
-                record1.get('aadhaar_number'),
-                record2.get('aadhaar_number')
-            )
-            
-            # Face embedding similarity (if available)
-            face_score = self._compare_face_embeddings(
-                record1.get('face_embedding'),
-                record2.get('face_embedding')
-            )
-            
-            # Compile feature dictionary
-            feature_dict = {
-                "name_similarity": name_score,
-                "father_name_similarity": father_name_score,
-                "mother_name_similarity": mother_name_score,
-                "dob_match": dob_match,
-                "address_similarity": address_score,
-                "phone_match": phone_match,
-                "aadhaar_match": aadhaar_match,
-                "face_similarity": face_score
-            }
-            
-            # Use ML classifier to predict duplicate probability
-            ml_features = np.array([
-                name_score,
-                father_name_score,
-                mother_name_score,
-                dob_match,
-                address_score,
-                phone_match,
-                aadhaar_match,
-                face_score
-            ]).reshape(1, -1)
-            
-            duplicate_probability = self.ml_classifier.predict(ml_features)[0]
-            confidence = self.ml_classifier.get_confidence(ml_features)
-            
-            # Determine algorithm flags
-            algorithm_flags = []
-            if name_score > 0.85:
-                algorithm_flags.append("jaro_winkler_name")
-            if dob_match == 1.0 and name_score > 0.7:
-                algorithm_flags.append("dob_name_match")
-            if address_score > 0.8 and name_score > 0.75:
-                algorithm_flags.append("address_name_match")
-            if face_score > 0.9:
-                algorithm_flags.append("face_embedding_match")
-            if phone_match == 1.0:
-                algorithm_flags.append("phone_exact_match")
-            
-            # Generate recommendation
-            if duplicate_probability >= 0.9:
-                recommendation = "merge"
-            elif duplicate_probability >= 0.7:
-                recommendation = "review"
-            else:
-                recommendation = "dismiss"
-            
-            return {
-                "duplicate_probability": float(duplicate_probability),
-                "confidence": float(confidence),
-                "features": {k: float(v) for k, v in feature_dict.items()},
-                "algorithm_flags": algorithm_flags,
-                "recommendation": recommendation
-            }
-            
+            return self.predict_many([(record1, record2)])[0]
         except Exception as e:
             logger.error(f"Error in predict_duplicate: {str(e)}")
             raise
     
-    def _extract_features(self, record1: Dict, record2: Dict) -> Dict[str, float]:
-        """Extract features for ML model"""
-        # This is a placeholder - in production, extract all relevant features
-        return {}
+    def predict_many(
+        self,
+        pairs: Sequence[Tuple[Dict[str, Any], Dict[str, Any]]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Predict duplicates for many record pairs in one classifier call
+        
+        Features for all pairs are extracted into one preallocated (n, 8)
+        float32 matrix which is classified in a single call.
+        
+        Returns:
+            List of prediction dictionaries, in the same order as pairs
+        """
+        features, _ = self._feature_matrix(self._prepare_pairs(pairs))
+        return self._predictions_from_matrix(features)
+    
+    def _prepare_pairs(
+        self,
+        pairs: Sequence[Tuple[Dict[str, Any], Dict[str, Any]]]
+    ) -> List[Tuple[PreparedRecord, PreparedRecord]]:
+        """Preprocess the records of raw pairs, once per distinct record object"""
+        prepared: Dict[int, PreparedRecord] = {}
+        
+        def get(record: Dict[str, Any]) -> PreparedRecord:
+            key = id(record)
+            if key not in prepared:
+                prepared[key] = self.preprocessor.prepare(record)
+            return prepared[key]
+        
+        return [(get(record1), get(record2)) for record1, record2 in pairs]
     
-    def _compare_dob(self, dob1: Any, dob2: Any) -> float:
-        """Compare dates of birth"""
-        if not dob1 or not dob2:
-            return 0.0
+    def _feature_matrix(
+        self,
+        pairs: Sequence[Tuple[PreparedRecord, PreparedRecord]],
+        skip_errors: bool = False
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Extract features for every pair into an (n, 8) float32 matrix
         
-        try:
-            from datetime import datetime
-            d1 = datetime.strptime(str(dob1), "%Y-%m-%d") if isinstance(dob1, str) else dob1
-            d2 = datetime.strptime(str(dob2), "%Y-%m-%d") if isinstance(dob2, str) else dob2
-            
-            # Exact match
-            if d1 == d2:
-                return 1.0
-            
-            # Within 1 day tolerance (typo tolerance)
-            diff = abs((d1 - d2).days)
-            if diff <= 1:
-                return 0.95
-            
-            return 0.0
-        except:
-            return 0.0
+        With skip_errors, pairs whose features cannot be extracted are logged
+        and flagged in the returned validity mask instead of raising.
+        
+        Returns:
+            Tuple of (feature matrix, boolean mask of valid rows)
+        """
+        n = len(pairs)
+        features = np.zeros((n, len(FEATURE_NAMES)), dtype=np.float32)
+        valid = np.ones(n, dtype=bool)
+        
+        for k, (record1, record2) in enumerate(pairs):
+            try:
+                features[k] = self._extract_features(record1, record2)
+            except Exception as e:
+                if not skip_errors:
+                    raise
+                logger.warning(
+                    f"Error comparing records {record1.voter_id} and "
+                    f"{record2.voter_id}: {str(e)}"
+                )
+                valid[k] = False
+        
+        return features, valid
     
-    def _compare_address(self, addr1: Dict, addr2: Dict) -> float:
-        """Compare addresses using multiple methods"""
-        if not addr1 or not addr2:
-            return 0.0
+    def _predictions_from_matrix(self, features: np.ndarray) -> List[Dict[str, Any]]:
+        """Classify a feature matrix and build one prediction per row"""
+        if features.shape[0] == 0:
+            return []
+        
+        # Use ML classifier to predict duplicate probabilities for all rows at once
+        probabilities = self.ml_classifier.predict(features)
+        confidences = self.ml_classifier.get_confidence(features)
+        
+        return [
+            self._build_prediction(row, probability, confidence)
+            for row, probability, confidence in zip(features.tolist(), probabilities, confidences)
+        ]
+    
+    def _build_prediction(
+        self,
+        row: List[float],
+        duplicate_probability: float,
+        confidence: float
+    ) -> Dict[str, Any]:
+        """Build the prediction dictionary for one feature row"""
+        name_score, _, _, dob_match, address_score, phone_match, _, face_score = row
+        
+        # Determine algorithm flags
+        algorithm_flags = []
+        if name_score > 0.85:
+            algorithm_flags.append("jaro_winkler_name")
+        if dob_match == 1.0 and name_score > 0.7:
+            algorithm_flags.append("dob_name_match")
+        if address_score > 0.8 and name_score > 0.75:
+            algorithm_flags.append("address_name_match")
+        if face_score > 0.9:
+            algorithm_flags.append("face_embedding_match")
+        if phone_match == 1.0:
+            algorithm_flags.append("phone_exact_match")
         
-        # Convert to strings for comparison
-        addr1_str = self._address_to_string(addr1)
-        addr2_str = self._address_to_string(addr2)
+        # Generate recommendation
+        if duplicate_probability >= 0.9:
+            recommendation = "merge"
+        elif duplicate_probability >= 0.7:
+            recommendation = "review"
+        else:
+            recommendation = "dismiss"
         
-        if not addr1_str or not addr2_str:
+        return {
+            "duplicate_probability": float(duplicate_probability),
+            "confidence": float(confidence),
+            # Rounded to float32 precision so the response carries no representation noise
+            "features": {name: round(value, 6) for name, value in zip(FEATURE_NAMES, row)},
+            "algorithm_flags": algorithm_flags,
+            "recommendation": recommendation
+        }
+    
+    def _extract_features(self, record1: PreparedRecord, record2: PreparedRecord) -> Tuple[float, ...]:
+        """
+        Extract the eight ML features for a pair of preprocessed records
+        
+        Returns:
+            Feature values in classifier column order:
+            [name, father_name, mother_name, dob, address, phone, aadhaar, face]
+        """
+        jaro_winkler = self.string_matcher.jaro_winkler_normalized
+        
+        # Name similarities
+        name_score = jaro_winkler(record1.name, record2.name)
+        father_name_score = jaro_winkler(record1.father_name, record2.father_name)
+        mother_name_score = jaro_winkler(record1.mother_name, record2.mother_name)
+        
+        # DOB match (exact or within 1 day tolerance)
+        dob_match = self._compare_dob(record1.dob_ordinal, record2.dob_ordinal)
+        
+        # Address similarity
+        address_score = jaro_winkler(record1.address, record2.address)
+        
+        # Phone number match
+        phone_match = 1.0 if (
+            record1.mobile_number is not None and
+            record1.mobile_number == record2.mobile_number
+        ) else 0.0
+        
+        # Aadhaar partial match (last 4 digits)
+        aadhaar_match = self._compare_aadhaar(record1.aadhaar, record2.aadhaar)
+        
+        # Face embedding similarity (if available)
+        face_score = self._compare_face_embeddings(
+            record1.face_embedding,
+            record2.face_embedding
+        )
+        
+        return (
+            name_score,
+            father_name_score,
+            mother_name_score,
+            dob_match,
+            address_score,
+            phone_match,
+            aadhaar_match,
+            face_score
+        )
+    
+    def _compare_dob(self, dob1: Optional[int], dob2: Optional[int]) -> float:
+        """Compare dates of birth given as date ordinals"""
+        if dob1 is None or dob2 is None:
             return 0.0
         
-        # Use Jaro-Winkler for address similarity
-        return self.string_matcher.jaro_winkler(addr1_str, addr2_str)
-    
-    def _address_to_string(self, addr: Dict) -> str:
-        """Convert address dict to normalized string"""
-        parts = []
-        if isinstance(addr, dict):
-            parts = [
-                addr.get('house_number', ''),
-                addr.get('street', ''),
-                addr.get('village_city', ''),
-                addr.get('district', ''),
-                addr.get('state', ''),
-                str(addr.get('pin_code', ''))
-            ]
-        elif isinstance(addr, str):
-            return addr
+        # Exact match
+        diff = abs(dob1 - dob2)
+        if diff == 0:
+            return 1.0
+        
+        # Within 1 day tolerance (typo tolerance)
+        if diff <= 1:
+            return 0.95
         
-        return ' '.join(filter(None, parts)).lower()
+        return 0.0
     
-    def _compare_aadhaar(self, aad1: Optional[str], aad2: Optional[str]) -> float:
-        """Compare Aadhaar numbers (partial match on last 4 digits)"""
+    def _compare_aadhaar(self, aad1: str, aad2: str) -> float:
+        """Compare stripped Aadhaar numbers (partial match on last 4 digits)"""
         if not aad1 or not aad2:
             return 0.0
         
-        aad1_str = str(aad1).strip()
-        aad2_str = str(aad2).strip()
-        
         # Exact match
-        if aad1_str == aad2_str:
+        if aad1 == aad2:
             return 1.0
         
         # Last 4 digits match
-        if len(aad1_str) >= 4 and len(aad2_str) >= 4:
-            if aad1_str[-4:] == aad2_str[-4:]:
+        if len(aad1) >= 4 and len(aad2) >= 4:
+            if aad1[-4:] == aad2[-4:]:
                 return 0.5
         
         return 0.0
     
-    def _compare_face_embeddings(self, emb1: Any, emb2: Any) -> float:
-        """Compare face embeddings using cosine similarity"""
-        if not emb1 or not emb2:
+    def _compare_face_embeddings(self, emb1: Optional[np.ndarray], emb2: Optional[np.ndarray]) -> float:
+        """Compare unit-norm face embeddings using cosine similarity"""
+        if emb1 is None or emb2 is None or emb1.shape != emb2.shape:
             return 0.0
         
+        similarity = np.dot(emb1, emb2)
+        return float(np.clip(similarity, 0, 1))
+    
+    async def batch_detect(
+        self,
+        records: List[Dict[str, Any]],
+        threshold: float = 0.7,
+        blocking: str = DEFAULT_BLOCKING_STRATEGY,
+        max_block_size: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Run batch duplicate detection
+
+        Candidate pairs are generated by the blocking stage, so only records
+        sharing a block key (phonetic name code, birth year, PIN code, last-4
+        Aadhaar) are scored. Use blocking="none" to compare every pair.
+        Preprocessing and blocking run in a thread and scoring is sharded
+        across the worker pool, so the event loop keeps serving requests.
+
+        Returns:
+            Dictionary with the duplicate pairs above threshold and blocking statistics
+        """
+        prepared = await asyncio.to_thread(self.preprocessor.prepare_many, records)
+        return await self._detect_prepared(prepared, threshold, blocking, max_block_size)
+    
+    async def batch_detect_file(
+        self,
+        source: BinaryIO,
+        file_format: str,
+        threshold: float = 0.7,
+        blocking: str = DEFAULT_BLOCKING_STRATEGY,
+        max_block_size: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Run batch duplicate detection on a CSV, Parquet or Arrow roll
+        
+        The file is read column-wise and records are prepared straight from
+        the columns, skipping the per-record dicts of the JSON path; the
+        columns are released before scoring starts.
+        
+        Returns:
+            batch_detect's result plus ingest statistics
+        """
+        prepared, ingest = await asyncio.to_thread(self._prepare_file, source, file_format)
+        result = await self._detect_prepared(prepared, threshold, blocking, max_block_size)
+        result["ingest"] = ingest
+        return result
+    
+    def _prepare_file(self, source: BinaryIO, file_format: str) -> Tuple[List[PreparedRecord], Dict[str, Any]]:
+        """Read a roll file and prepare its records"""
+        roll = read_roll(source, file_format)
+        logger.info(f"Read {len(roll)} rows from {file_format} roll")
+        return self.preprocessor.prepare_columns(roll), roll.stats()
+    
+    async def _detect_prepared(
+        self,
+        prepared: List[PreparedRecord],
+        threshold: float,
+        blocking: str,
+        max_block_size: Optional[int]
+    ) -> Dict[str, Any]:
+        """Block and score prepared records"""
+        pairs, blocking_stats = await asyncio.to_thread(
+            self.candidate_generator.generate, prepared, blocking, max_block_size
+        )
+        logger.info(
+            f"Blocking '{blocking}': scoring {blocking_stats['candidate_pairs']} of "
+            f"{blocking_stats['total_pairs']} pairs"
+        )
+        
+        return {
+            "duplicates": await self._score_candidates(prepared, pairs, threshold),
+            "blocking": blocking_stats
+        }
+    
+    def _prepare_and_block(
+        self,
+        records: List[Dict[str, Any]],
+        blocking: str,
+        max_block_size: Optional[int]
+    ) -> Tuple[List[PreparedRecord], List[Tuple[int, int]], Dict[str, Any]]:
+        """Preprocess records and generate their candidate pairs"""
+        prepared = self.preprocessor.prepare_many(records)
+        pairs, blocking_stats = self.candidate_generator.generate(
+            prepared, strategy=blocking, max_block_size=max_block_size
+        )
+        return prepared, pairs, blocking_stats
+    
+    async def _score_candidates(
+        self,
+        prepared: List[PreparedRecord],
+        pairs: List[Tuple[int, int]],
+        threshold: float
+    ) -> List[Dict[str, Any]]:
+        """Score candidate pairs in a background thread so the event loop stays free"""
+        def score_all() -> List[Dict[str, Any]]:
+            results = []
+            for _, chunk_results in self._iter_scored_chunks(prepared, pairs, threshold):
+                results.extend(chunk_results)
+            return results
+        
+        return await asyncio.to_thread(score_all)
+    
+    def _iter_scored_chunks(
+        self,
+        prepared: List[PreparedRecord],
+        pairs: List[Tuple[int, int]],
+        threshold: float
+    ) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+        """
+        Score candidate pairs chunk by chunk, yielding (pairs done, duplicates)
+        
+        Large jobs are split into BATCH_CHUNK_SIZE shards that are scored in
+        parallel by the worker pool; each shard carries only the records its
+        pairs reference, and at most two shards per worker are in flight.
+        Small jobs, or any job when the pool is disabled, are scored inline.
+        Chunks are yielded in candidate-pair order.
+        """
+        chunks = [
+            pairs[start:start + BATCH_CHUNK_SIZE]
+            for start in range(0, len(pairs), BATCH_CHUNK_SIZE)
+        ]
+        pool = self._get_pool() if len(pairs) >= PARALLEL_MIN_PAIRS else None
+        
+        done = 0
+        if pool is None:
+            for chunk in chunks:
+                done += len(chunk)
+                yield done, self._score_pairs(prepared, chunk, threshold)
+            return
+        
+        def collect(future) -> List[Dict[str, Any]]:
+            results, counters = future.result()
+            self._add_cascade_counters(counters)
+            return results
+        
+        in_flight = deque()
         try:
-            import numpy as np
-            
-            # Convert to numpy arrays if needed
-            if isinstance(emb1, list):
-                emb1 = np.array(emb1)
-            if isinstance(emb2, list):
-                emb2 = np.array(emb2)
+            for chunk in chunks:
+                in_flight.append((
+                    len(chunk),
+                    pool.submit(_score_shard, *self._shard(prepared, chunk), threshold, self.ml_classifier.source)
+                ))
+                if len(in_flight) >= 2 * self.workers:
+                    size, future = in_flight.popleft()
+                    done += size
+                    yield done, collect(future)
+            while in_flight:
+                size, future = in_flight.popleft()
+                done += size
+                yield done, collect(future)
+        finally:
+            # Reached when the consumer stops early, e.g. a cancelled job
+            for _, future in in_flight:
+                future.cancel()
+    
+    def _shard(
+        self,
+        prepared: List[PreparedRecord],
+        pairs: List[Tuple[int, int]]
+    ) -> Tuple[List[PreparedRecord], List[Tuple[int, int]]]:
+        """Pick out the records a chunk of pairs needs and renumber the pairs"""
+        local: Dict[int, int] = {}
+        records = []
+        
+        def index(i: int) -> int:
+            k = local.get(i)
+            if k is None:
+                k = local[i] = len(records)
+                records.append(prepared[i])
+            return k
+        
+        return records, [(index(i), index(j)) for i, j in pairs]
+    
+    def run_batch_job(
+        self,
+        job: JobContext,
+        records: List[Dict[str, Any]],
+        threshold: float = 0.7,
+        blocking: str = DEFAULT_BLOCKING_STRATEGY,
+        max_block_size: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Batch duplicate detection as a background job
+        
+        Duplicates are written to the job store chunk by chunk, progress is
+        the fraction of candidate pairs scored, and cancellation is honoured
+        between chunks.
+        
+        Returns:
+            Job summary with the same counters as /batch-run
+        """
+        prepared, pairs, blocking_stats = self._prepare_and_block(records, blocking, max_block_size)
+        job.check_cancelled()
+        
+        duplicates = 0
+        total = len(pairs)
+        for done, chunk_results in self._iter_scored_chunks(prepared, pairs, threshold):
+            job.add_results(chunk_results)
+            duplicates += len(chunk_results)
+            job.set_progress(done / total)
+            job.check_cancelled()
+        
+        return {
+            "total_records": len(prepared),
+            "potential_duplicates": duplicates,
+            "pairs_scored": blocking_stats["candidate_pairs"],
+            "pairs_pruned": blocking_stats["pruned_pairs"],
+            "blocking": blocking_stats
+        }
+    
+    def stream_detect(
+        self,
+        chunks: AsyncIterator[bytes],
+        threshold: float = 0.7,
+        blocking: str = DEFAULT_BLOCKING_STRATEGY,
+        max_block_size: Optional[int] = None,
+        progress_every: int = STREAM_PROGRESS_EVERY
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Run batch duplicate detection over an NDJSON record stream
+        
+        Validates the blocking strategy up front (raising ValueError), then
+        returns an async generator of result lines. Records are parsed,
+        preprocessed and blocked one at a time against the records seen so
+        far; candidate pairs are scored in chunks and every duplicate is
+        yielded as soon as its chunk is scored. Only PreparedRecords are
+        retained, never the raw request body.
+        
+        Yields dictionaries with a "type" of "duplicate", "progress", "error"
+        (an unparseable line, which is skipped) or a final "summary".
+        """
+        blocker = IncrementalBlocker(self.candidate_generator, blocking, max_block_size)
+        return self._stream_detect(chunks, blocker, threshold, max(1, progress_every))
+    
+    async def _stream_detect(
+        self,
+        chunks: AsyncIterator[bytes],
+        blocker: IncrementalBlocker,
+        threshold: float,
+        progress_every: int
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Parse → block → score → emit pipeline behind stream_detect"""
+        prepared: List[PreparedRecord] = []
+        pending: List[Tuple[int, int]] = []
+        duplicates = 0
+        
+        async def flush():
+            results = await self._score_candidates(prepared, pending, threshold)
+            pending.clear()
+            return results
+        
+        async for line_no, record, error in iter_ndjson(chunks):
+            if error:
+                yield {"type": "error", "line": line_no, "detail": error}
+                continue
             
-            # Normalize
-            emb1_norm = emb1 / (np.linalg.norm(emb1) + 1e-8)
-            emb2_norm = emb2 / (np.linalg.norm(emb2) + 1e-8)
+            record = self.preprocessor.prepare(record)
+            prepared.append(record)
+            idx, candidates = blocker.add(record)
+            pending.extend((j, idx) for j in candidates)
             
-            # Cosine similarity
-            similarity = np.dot(emb1_norm, emb2_norm)
-            return float(np.clip(similarity, 0, 1))
-        except:
-            return 0.0
+            at_progress = blocker.size % progress_every == 0
+            if len(pending) >= BATCH_CHUNK_SIZE or (at_progress and pending):
+                for result in await flush():
+                    duplicates += 1
+                    yield {"type": "duplicate", **result}
+            if at_progress:
+                yield {
+                    "type": "progress",
+                    "records": blocker.size,
+                    "pairs_scored": blocker.candidate_pairs,
+                    "potential_duplicates": duplicates
+                }
+        
+        if pending:
+            for result in await flush():
+                duplicates += 1
+                yield {"type": "duplicate", **result}
+        
+        blocking_stats = blocker.stats()
+        logger.info(
+            f"Streaming batch run: {blocker.size} records, "
+            f"{blocking_stats['candidate_pairs']} pairs scored, {duplicates} duplicates"
+        )
+        yield {
+            "type": "summary",
+            "total_records": blocker.size,
+            "potential_duplicates": duplicates,
+            "pairs_scored": blocking_stats["candidate_pairs"],
+            "pairs_pruned": blocking_stats["pruned_pairs"],
+            "blocking": blocking_stats
+        }
     
-    async def batch_detect(self, records: List[Dict[str, Any]], threshold: float = 0.7) -> List[Dict[str, Any]]:
-        """Run batch duplicate detection"""
+    def _score_pairs(
+        self,
+        prepared: Sequence[PreparedRecord],
+        pairs: Sequence[Tuple[int, int]],
+        threshold: float,
+        counters: Optional[Dict[str, int]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Score candidate pairs of prepared records and keep those above threshold
+        
+        Cascade counters go to counters when given (worker processes hand
+        them back to the parent) and to the service's own totals otherwise.
+        """
+        features, valid, probabilities = self._threshold_features(
+            [(prepared[i], prepared[j]) for i, j in pairs],
+            threshold,
+            counters
+        )
+        hits = np.flatnonzero(valid & (probabilities >= threshold))
+        if hits.size == 0:
+            return []
+        
         results = []
+        predictions = self._predictions_from_matrix(features[hits])
+        for k, prediction in zip(hits.tolist(), predictions):
+            i, j = pairs[k]
+            results.append({
+                "record1_id": prepared[i].voter_id,
+                "record2_id": prepared[j].voter_id,
+                "score": prediction['duplicate_probability'],
+                "features": prediction['features'],
+                "recommendation": prediction['recommendation']
+            })
+        return results
+    
+    def _threshold_features(
+        self,
+        pairs: Sequence[Tuple[PreparedRecord, PreparedRecord]],
+        threshold: float,
+        counters: Optional[Dict[str, int]] = None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Feature matrix, validity mask and probabilities for threshold scoring
         
-        for i in range(len(records)):
-            for j in range(i + 1, len(records)):
+        Uses the cascade when it is enabled and the active model can be
+        bounded, and plain extraction otherwise. Rows dropped by the cascade
+        are marked invalid with probability 0.
+        """
+        if not (self.cascade and self.ml_classifier.supports_upper_bound):
+            features, valid = self._feature_matrix(pairs, skip_errors=True)
+            return features, valid, self.ml_classifier.predict(features)
+        
+        features, valid = self._cascade_feature_matrix(pairs, threshold, counters)
+        probabilities = np.zeros(len(pairs), dtype=np.float64)
+        rows = np.flatnonzero(valid)
+        if rows.size:
+            probabilities[rows] = self.ml_classifier.predict(features[rows])
+        return features, valid, probabilities
+    
+    def _cascade_feature_matrix(
+        self,
+        pairs: Sequence[Tuple[PreparedRecord, PreparedRecord]],
+        threshold: float,
+        counters: Optional[Dict[str, int]] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Extract features stage by stage (CASCADE_STAGES), cheapest first
+        
+        After each stage the classifier's upper bound, with the features not
+        yet computed taken at their maximum, is checked against threshold;
+        pairs that can no longer reach it are dropped, so their string
+        comparisons are never run. Every pair above threshold still gets all
+        eight features, and its score is the same as with full extraction.
+        
+        Returns:
+            Tuple of (feature matrix, boolean mask of rows that survived every
+            stage without errors)
+        """
+        n = len(pairs)
+        features = np.zeros((n, len(FEATURE_NAMES)), dtype=np.float32)
+        alive = np.ones(n, dtype=bool)
+        known = np.zeros(len(FEATURE_NAMES), dtype=bool)
+        stage_counts = _new_cascade_counters()
+        stage_counts["pairs"] = n
+        jaro_winkler = self.string_matcher.jaro_winkler_normalized
+        
+        for stage, columns in CASCADE_STAGES:
+            rows = np.flatnonzero(alive)
+            if rows.size == 0:
+                break
+            for k in rows.tolist():
+                record1, record2 = pairs[k]
                 try:
-                    prediction = await self.predict_duplicate(records[i], records[j])
-                    
-                    if prediction['duplicate_probability'] >= threshold:
-                        results.append({
-                            "record1_id": records[i].get('voter_id'),
-                            "record2_id": records[j].get('voter_id'),
-                            "score": prediction['duplicate_probability'],
-                            "features": prediction['features'],
-                            "recommendation": prediction['recommendation']
-                        })
+                    if stage == "exact_fields":
+                        features[k, DOB] = self._compare_dob(record1.dob_ordinal, record2.dob_ordinal)
+                        features[k, PHONE] = 1.0 if (
+                            record1.mobile_number is not None and
+                            record1.mobile_number == record2.mobile_number
+                        ) else 0.0
+                        features[k, AADHAAR] = self._compare_aadhaar(record1.aadhaar, record2.aadhaar)
+                        features[k, FACE] = self._compare_face_embeddings(
+                            record1.face_embedding,
+                            record2.face_embedding
+                        )
+                    elif stage == "name":
+                        features[k, NAME] = jaro_winkler(record1.name, record2.name)
+                    elif stage == "address":
+                        features[k, ADDRESS] = jaro_winkler(record1.address, record2.address)
+                    else:
+                        features[k, FATHER_NAME] = jaro_winkler(record1.father_name, record2.father_name)
+                        features[k, MOTHER_NAME] = jaro_winkler(record1.mother_name, record2.mother_name)
                 except Exception as e:
-                    logger.warning(f"Error comparing records {i} and {j}: {str(e)}")
-                    continue
+                    logger.warning(
+                        f"Error comparing records {record1.voter_id} and "
+                        f"{record2.voter_id}: {str(e)}"
+                    )
+                    alive[k] = False
+            
+            known[list(columns)] = True
+            rows = np.flatnonzero(alive)
+            if known.all() or rows.size == 0:
+                break
+            reachable = self.ml_classifier.upper_bound(features[rows], known) >= threshold
+            alive[rows[~reachable]] = False
+            stage_counts[stage] += int(rows.size - np.count_nonzero(reachable))
         
-        return results
-
-
+        stage_counts["fully_scored"] = int(np.count_nonzero(alive))
+        if counters is None:
+            self._add_cascade_counters(stage_counts)
+        else:
+            for key, value in stage_counts.items():
+                counters[key] += value
+        return features, alive
+    
+    def _add_cascade_counters(self, counters: Dict[str, int]) -> None:
+        """Add a scoring call's cascade counters to the service totals"""
+        with self._cascade_lock:
+            for key, value in counters.items():
+                self._cascade_counters[key] += value
@@ -0,0 +1,9 @@
+"""Make the engine's services/, utils/ and models/ importable as they are under uvicorn"""
+
+import os
+import sys
+
+ENGINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ENGINE_DIR)
+# Modules shared by the AI services live in ai-services/shared
+sys.path.insert(0, os.path.dirname(ENGINE_DIR))
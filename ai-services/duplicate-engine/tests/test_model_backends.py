@@ -0,0 +1,55 @@
+"""Conversion of XGBoost JSON models to the tree_ensemble backend"""
+
+import json
+import math
+
+import numpy as np
+import pytest
+
+from utils.ml_classifier import FEATURE_NAMES
+from utils.model_backends import load_model_file
+
+
+def xgboost_model(base_score):
+    """A one-stump binary:logistic model: name_similarity < 0.5 gives -1, otherwise +1"""
+    return {
+        "learner": {
+            "objective": {"name": "binary:logistic"},
+            "learner_model_param": {"base_score": base_score},
+            "feature_names": ["name_similarity"],
+            "gradient_booster": {
+                "name": "gbtree",
+                "model": {
+                    "trees": [{
+                        "left_children": [1, -1, -1],
+                        "right_children": [2, -1, -1],
+                        "split_indices": [0, 0, 0],
+                        "split_conditions": [0.5, -1.0, 1.0]
+                    }]
+                }
+            }
+        }
+    }
+
+
+def load(tmp_path, model):
+    path = tmp_path / "model.json"
+    path.write_text(json.dumps(model))
+    return load_model_file(str(path), FEATURE_NAMES)
+
+
+@pytest.mark.parametrize("base_score", ["5E-1", "[5E-1]", "[2.5E-1]", 0.25])
+def test_xgboost_base_score_formats(tmp_path, base_score):
+    model = load(tmp_path, xgboost_model(base_score))
+    probability = float(str(base_score).strip("[]"))
+    base_margin = math.log(probability / (1 - probability))
+    features = np.zeros((2, len(FEATURE_NAMES)), dtype=np.float32)
+    features[1, FEATURE_NAMES.index("name_similarity")] = 0.9
+
+    expected = 1 / (1 + np.exp(-(base_margin + np.array([-1.0, 1.0]))))
+    np.testing.assert_allclose(model.predict(features), expected, rtol=1e-6)
+
+
+def test_xgboost_multi_target_base_score_is_rejected(tmp_path):
+    with pytest.raises(ValueError, match="single-target"):
+        load(tmp_path, xgboost_model("[5E-1,5E-1]"))
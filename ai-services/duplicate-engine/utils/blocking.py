@@ -0,0 +1,261 @@
+"""
+Blocking (candidate generation) for batch duplicate detection
+Only pairs of records that share at least one blocking key are scored
+"""
+
+import logging
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from utils.record_preprocessing import PreparedRecord
+
+logger = logging.getLogger(__name__)
+
+# Named blocking strategies: each is a list of compound keys, and each compound
+# key is a tuple of key-function names whose values are joined into one block key.
+BLOCKING_STRATEGIES: Dict[str, List[Tuple[str, ...]]] = {
+    "none": [],
+    "standard": [
+        ("soundex", "birth_year"),
+        ("metaphone", "pin_code"),
+        ("aadhaar_last4",),
+    ],
+    "phonetic": [
+        ("soundex",),
+        ("metaphone",),
+    ],
+    "strict": [
+        ("soundex", "birth_year", "pin_code"),
+        ("aadhaar_last4", "birth_year"),
+    ],
+}
+
+DEFAULT_BLOCKING_STRATEGY = "standard"
+
+
+class CandidateGenerator:
+    """
+    Generates candidate record pairs from blocking keys
+
+    A strategy is either the name of an entry in BLOCKING_STRATEGIES or a
+    custom spec such as "soundex+birth_year,aadhaar_last4" (comma separates
+    blocking passes, plus joins keys within a pass). The "none" strategy
+    disables blocking and yields every pair.
+    """
+
+    def __init__(self):
+        self.key_functions: Dict[str, Callable[[PreparedRecord], str]] = {
+            "soundex": self._soundex_key,
+            "metaphone": self._metaphone_key,
+            "birth_year": self._birth_year_key,
+            "pin_code": self._pin_code_key,
+            "aadhaar_last4": self._aadhaar_last4_key,
+        }
+
+    def parse_strategy(self, strategy: str) -> List[Tuple[str, ...]]:
+        """Resolve a strategy name or custom spec into compound keys"""
+        strategy = (strategy or DEFAULT_BLOCKING_STRATEGY).strip().lower()
+        if strategy in BLOCKING_STRATEGIES:
+            return BLOCKING_STRATEGIES[strategy]
+
+        passes = []
+        for spec in strategy.split(','):
+            keys = tuple(k.strip() for k in spec.split('+') if k.strip())
+            if not keys:
+                continue
+            unknown = [k for k in keys if k not in self.key_functions]
+            if unknown:
+                raise ValueError(
+                    f"Unknown blocking key(s) {unknown}; valid keys are "
+                    f"{sorted(self.key_functions)} and valid strategies are "
+                    f"{sorted(BLOCKING_STRATEGIES)}"
+                )
+            passes.append(keys)
+
+        if not passes:
+            raise ValueError(f"Empty blocking strategy: {strategy!r}")
+        return passes
+
+    def block_keys(self, record: PreparedRecord, passes: List[Tuple[str, ...]]) -> List[str]:
+        """
+        Compute the block keys of a record for every blocking pass
+
+        A pass contributes no key if any of its components is missing, so
+        records with an empty PIN code are never blocked together on PIN.
+        """
+        keys = []
+        for pass_no, pass_keys in enumerate(passes):
+            parts = []
+            for key_name in pass_keys:
+                value = self.key_functions[key_name](record)
+                if not value:
+                    break
+                parts.append(value)
+            else:
+                keys.append(f"{pass_no}:{'|'.join(parts)}")
+        return keys
+
+    def generate(
+        self,
+        records: List[PreparedRecord],
+        strategy: str = DEFAULT_BLOCKING_STRATEGY,
+        max_block_size: Optional[int] = None
+    ) -> Tuple[List[Tuple[int, int]], Dict[str, Any]]:
+        """
+        Generate candidate pairs (i, j) with i < j
+
+        Returns:
+            Tuple of (sorted candidate pairs, blocking statistics)
+        """
+        n = len(records)
+        total_pairs = n * (n - 1) // 2
+        passes = self.parse_strategy(strategy)
+
+        if not passes:
+            pairs = [(i, j) for i in range(n) for j in range(i + 1, n)]
+            return pairs, self._stats("none", n, total_pairs, len(pairs), 0, n, 0)
+
+        blocks: Dict[str, List[int]] = {}
+        for idx, record in enumerate(records):
+            for key in self.block_keys(record, passes):
+                blocks.setdefault(key, []).append(idx)
+
+        candidates: Set[Tuple[int, int]] = set()
+        largest_block = 0
+        skipped_blocks = 0
+        for key, members in blocks.items():
+            size = len(members)
+            if size < 2:
+                continue
+            if max_block_size and size > max_block_size:
+                skipped_blocks += 1
+                logger.warning(f"Skipping oversized block {key} ({size} records)")
+                continue
+            largest_block = max(largest_block, size)
+            for a in range(size):
+                i = members[a]
+                for b in range(a + 1, size):
+                    candidates.add((i, members[b]))
+
+        pairs = sorted(candidates)
+        return pairs, self._stats(
+            strategy, n, total_pairs, len(pairs), len(blocks), largest_block, skipped_blocks
+        )
+
+    def _stats(
+        self,
+        strategy: str,
+        total_records: int,
+        total_pairs: int,
+        candidate_pairs: int,
+        blocks: int,
+        largest_block: int,
+        skipped_blocks: int
+    ) -> Dict[str, Any]:
+        """Build blocking statistics for the batch response"""
+        return {
+            "strategy": strategy,
+            "total_records": total_records,
+            "total_pairs": total_pairs,
+            "candidate_pairs": candidate_pairs,
+            "pruned_pairs": total_pairs - candidate_pairs,
+            "reduction_ratio": (1 - candidate_pairs / total_pairs) if total_pairs else 0.0,
+            "blocks": blocks,
+            "largest_block": largest_block,
+            "skipped_blocks": skipped_blocks
+        }
+
+    def _soundex_key(self, record: PreparedRecord) -> str:
+        """Soundex code of the voter name"""
+        return record.name_soundex
+
+    def _metaphone_key(self, record: PreparedRecord) -> str:
+        """Metaphone code of the voter name"""
+        return record.name_metaphone
+
+    def _birth_year_key(self, record: PreparedRecord) -> str:
+        """Year of birth"""
+        return record.birth_year
+
+    def _pin_code_key(self, record: PreparedRecord) -> str:
+        """PIN code of the address"""
+        return record.pin_code
+
+    def _aadhaar_last4_key(self, record: PreparedRecord) -> str:
+        """Last 4 digits of the Aadhaar number"""
+        return record.aadhaar_last4
+
+
+class IncrementalBlocker:
+    """
+    Block index that grows one record at a time
+
+    Each added record is assigned the next sequence number and paired with
+    every earlier record that shares one of its block keys, so candidate
+    pairs are produced as records arrive instead of after the whole batch
+    is known. A block stops producing pairs once it holds max_block_size
+    records; since later arrivals cannot be predicted, pairs already produced
+    from a block before it overflowed are kept.
+    """
+
+    def __init__(
+        self,
+        candidate_generator: CandidateGenerator,
+        strategy: str = DEFAULT_BLOCKING_STRATEGY,
+        max_block_size: Optional[int] = None
+    ):
+        self.candidate_generator = candidate_generator
+        self.strategy = strategy
+        self.max_block_size = max_block_size
+        self.passes = candidate_generator.parse_strategy(strategy)
+
+        self.size = 0
+        self.candidate_pairs = 0
+        self._blocks: Dict[str, List[int]] = {}
+        self._overflowed: Set[str] = set()
+
+    def add(self, record: PreparedRecord) -> Tuple[int, List[int]]:
+        """
+        Index a record and find its candidates among earlier records
+
+        Returns:
+            Tuple of (sequence number of the record, sorted earlier sequence numbers)
+        """
+        idx = self.size
+        self.size += 1
+
+        if not self.passes:
+            candidates = list(range(idx))
+            self.candidate_pairs += idx
+            return idx, candidates
+
+        matches: Set[int] = set()
+        for key in self.candidate_generator.block_keys(record, self.passes):
+            members = self._blocks.setdefault(key, [])
+            if key in self._overflowed:
+                continue
+            if self.max_block_size and len(members) >= self.max_block_size:
+                self._overflowed.add(key)
+                logger.warning(f"Block {key} exceeded {self.max_block_size} records; no further pairs from it")
+                continue
+            matches.update(members)
+            members.append(idx)
+
+        candidates = sorted(matches)
+        self.candidate_pairs += len(candidates)
+        return idx, candidates
+
+    def stats(self) -> Dict[str, Any]:
+        """Blocking statistics so far, in the same shape as CandidateGenerator.generate"""
+        total_pairs = self.size * (self.size - 1) // 2
+        if not self.passes:
+            return self.candidate_generator._stats("none", self.size, total_pairs, self.candidate_pairs, 0, self.size, 0)
+        largest_block = max((len(members) for members in self._blocks.values() if len(members) > 1), default=0)
+        return self.candidate_generator._stats(
+            self.strategy,
+            self.size,
+            total_pairs,
+            self.candidate_pairs,
+            len(self._blocks),
+            largest_block,
+            len(self._overflowed)
+        )
@@ -0,0 +1,67 @@
+"""
+Duplicate clustering for batch duplicate detection
+Groups matched pairs into connected components so one person registered
+many times becomes one cluster instead of many pairs
+"""
+
+import logging
+from typing import Any, Dict, List
+
+from shared.union_find import UnionFind
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_MODES = ("pairs", "clusters", "both")
+
+
+class DuplicateClusterer:
+    """
+    Turns pairwise duplicate matches into duplicate clusters
+
+    Each cluster is a connected component of the match graph. Its
+    representative is the member with the highest total match score (the
+    record most strongly tied to the others), ties going to the member seen
+    first.
+    """
+
+    def cluster(self, duplicates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Group duplicate pairs ({record1_id, record2_id, score}) into clusters
+
+        Returns:
+            Clusters sorted by size, then by highest score, both descending
+        """
+        forest = UnionFind()
+        strength: Dict[Any, float] = {}
+        for pair in duplicates:
+            first, second, score = pair["record1_id"], pair["record2_id"], pair["score"]
+            forest.union(first, second)
+            strength[first] = strength.get(first, 0.0) + score
+            strength[second] = strength.get(second, 0.0) + score
+
+        stats: Dict[int, List[Any]] = {}
+        for pair in duplicates:
+            root = forest.find(forest.add(pair["record1_id"]))
+            entry = stats.setdefault(root, [0, pair["score"], pair["score"]])
+            entry[0] += 1
+            entry[1] = min(entry[1], pair["score"])
+            entry[2] = max(entry[2], pair["score"])
+
+        clusters = []
+        for members in forest.groups():
+            pair_count, min_score, max_score = stats[forest.find(forest.add(members[0]))]
+            clusters.append((members, pair_count, min_score, max_score))
+        clusters.sort(key=lambda cluster: (-len(cluster[0]), -cluster[3]))
+
+        return [
+            {
+                "cluster_id": cluster_id,
+                "representative_id": max(members, key=lambda voter_id: strength[voter_id]),
+                "size": len(members),
+                "member_ids": members,
+                "pair_count": pair_count,
+                "min_score": min_score,
+                "max_score": max_score
+            }
+            for cluster_id, (members, pair_count, min_score, max_score) in enumerate(clusters)
+        ]
@@ -0,0 +1,289 @@
+"""
+Columnar roll ingest for batch duplicate detection
+Reads a voter roll from CSV, Parquet or Arrow column-wise instead of as a JSON list of record dicts
+"""
+
+import csv
+import io
+import logging
+import os
+import re
+from typing import Any, BinaryIO, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.record_preprocessing import ADDRESS_FIELDS
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pacsv
+    import pyarrow.ipc as ipc
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+# Flat column names; address parts (ADDRESS_FIELDS) are top-level columns
+# rather than a nested dict, or a single pre-formatted "address" column
+RECORD_COLUMNS = (
+    'voter_id', 'name', 'father_name', 'mother_name', 'dob', 'mobile_number', 'aadhaar_number'
+)
+
+# Face embeddings come either as one list column or as face_0 ... face_{d-1}
+EMBEDDING_COLUMN = 'face_embedding'
+_EMBEDDING_PART = re.compile(r'^face_(\d+)$')
+_EMBEDDING_SEPARATOR_CHARS = ',; \t\r\n\f\v'
+_EMBEDDING_SEPARATORS = re.compile(r'[\s,;]+')
+
+FILE_FORMATS = {
+    '.csv': 'csv',
+    '.parquet': 'parquet',
+    '.pq': 'parquet',
+    '.arrow': 'arrow',
+    '.feather': 'arrow',
+    '.ipc': 'arrow',
+}
+
+# CSV embedding rows converted to float32 per block by the stdlib reader
+_CSV_EMBEDDING_BLOCK = 4096
+
+
+class ColumnarRoll:
+    """
+    A voter roll held column-wise
+
+    Each known field is one list of values; face embeddings are a single
+    (n, d) float32 block with a boolean mask of the rows that have one.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        columns: Dict[str, Sequence[Any]],
+        embeddings: Optional[np.ndarray] = None,
+        has_embedding: Optional[np.ndarray] = None,
+        file_format: str = 'csv'
+    ):
+        self.size = size
+        self.columns = columns
+        self.embeddings = embeddings
+        self.has_embedding = has_embedding
+        self.file_format = file_format
+
+    def __len__(self) -> int:
+        return self.size
+
+    def column(self, name: str) -> Sequence[Any]:
+        """Values of a column, or a column of empty values if the file lacks it"""
+        values = self.columns.get(name)
+        return values if values is not None else [None] * self.size
+
+    def stats(self) -> Dict[str, Any]:
+        """Shape of the ingested roll for the batch response"""
+        return {
+            "format": self.file_format,
+            "rows": self.size,
+            "columns": sorted(self.columns),
+            "embedding_dim": int(self.embeddings.shape[1]) if self.embeddings is not None else None,
+            "embeddings": int(self.has_embedding.sum()) if self.has_embedding is not None else 0
+        }
+
+
+def detect_format(filename: str, file_format: Optional[str] = None) -> str:
+    """Resolve the roll format from an explicit value or the file extension"""
+    if file_format:
+        file_format = file_format.strip().lower()
+        if file_format not in FILE_FORMATS.values():
+            raise ValueError(f"Unknown roll format {file_format!r}; expected one of {sorted(set(FILE_FORMATS.values()))}")
+        return file_format
+    extension = os.path.splitext(filename or '')[1].lower()
+    if extension not in FILE_FORMATS:
+        raise ValueError(f"Cannot infer roll format from {filename!r}; pass format=csv|parquet|arrow")
+    return FILE_FORMATS[extension]
+
+
+def read_roll(source: BinaryIO, file_format: str) -> ColumnarRoll:
+    """Read a roll from a binary file object in the given format"""
+    if file_format == 'csv':
+        return read_csv_roll(source)
+    return read_arrow_roll(source, file_format)
+
+
+def read_csv_roll(source: BinaryIO) -> ColumnarRoll:
+    """
+    Read a CSV roll column by column
+
+    Uses pyarrow's multithreaded CSV reader when it is installed and the
+    standard library csv module otherwise. Record fields are always read
+    as text, so IDs and numbers keep their leading zeros.
+    """
+    if PYARROW_AVAILABLE:
+        return _read_csv_pyarrow(source)
+    return _read_csv_stdlib(source)
+
+
+def _read_csv_pyarrow(source: BinaryIO) -> ColumnarRoll:
+    """Read a CSV roll into Arrow columns"""
+    text_columns = RECORD_COLUMNS + ADDRESS_FIELDS + ('address', EMBEDDING_COLUMN)
+    table = pacsv.read_csv(
+        source,
+        convert_options=pacsv.ConvertOptions(
+            column_types={name: pa.string() for name in text_columns},
+            strings_can_be_null=False
+        )
+    )
+    if EMBEDDING_COLUMN in table.column_names and not any(_EMBEDDING_PART.match(name) for name in table.column_names):
+        # Vectors stored as text: "[0.1, 0.2, ...]" or "0.1 0.2 ...". Separators
+        # are trimmed too, so a trailing "," yields no empty item (as in _read_csv_stdlib)
+        texts = pc.utf8_trim(table.column(EMBEDDING_COLUMN), characters=' []' + _EMBEDDING_SEPARATOR_CHARS)
+        texts = pc.if_else(pc.equal(texts, ''), pa.scalar(None, pa.string()), texts)
+        vectors = pc.cast(
+            pc.split_pattern_regex(texts, pattern=_EMBEDDING_SEPARATORS.pattern),
+            pa.list_(pa.float32())
+        )
+        table = table.set_column(table.column_names.index(EMBEDDING_COLUMN), EMBEDDING_COLUMN, vectors)
+    return _roll_from_table(table, 'csv')
+
+
+def _read_csv_stdlib(source: BinaryIO) -> ColumnarRoll:
+    """
+    Read a CSV roll with the csv module
+
+    Embeddings are taken from face_0 ... face_{d-1} columns, or from a
+    face_embedding column holding the vector as comma/space separated floats.
+    """
+    reader = csv.reader(io.TextIOWrapper(source, encoding='utf-8-sig', newline=''))
+    header = next(reader, None)
+    if header is None:
+        return ColumnarRoll(0, {}, file_format='csv')
+    header = [name.strip() for name in header]
+
+    field_positions = [
+        (name, position) for position, name in enumerate(header)
+        if name in RECORD_COLUMNS or name in ADDRESS_FIELDS or name == 'address'
+    ]
+    part_positions = sorted(
+        (int(match.group(1)), position)
+        for position, match in ((p, _EMBEDDING_PART.match(name)) for p, name in enumerate(header))
+        if match
+    )
+    part_positions = [position for _, position in part_positions]
+    list_position = header.index(EMBEDDING_COLUMN) if EMBEDDING_COLUMN in header else None
+
+    columns: Dict[str, List[str]] = {name: [] for name, _ in field_positions}
+    column_lists = [(columns[name], position) for name, position in field_positions]
+    embedding_blocks: List[np.ndarray] = []
+    mask: List[bool] = []
+    pending: List[Optional[List[Any]]] = []
+    dim = len(part_positions) or None
+
+    def flush_embeddings():
+        block = np.zeros((len(pending), dim), dtype=np.float32)
+        rows = [k for k, vector in enumerate(pending) if vector is not None]
+        if rows:
+            block[rows] = np.array([pending[k] for k in rows], dtype=np.float32)
+        embedding_blocks.append(block)
+        pending.clear()
+
+    size = 0
+    for row in reader:
+        if not row:
+            continue
+        size += 1
+        width = len(row)
+        for values, position in column_lists:
+            values.append(row[position] if position < width else '')
+
+        if part_positions:
+            vector = [row[p] if p < width else '' for p in part_positions]
+            present = all(vector)
+        elif list_position is not None:
+            text = row[list_position].strip(' []') if list_position < width else ''
+            vector = [value for value in _EMBEDDING_SEPARATORS.split(text) if value] if text else []
+            if vector and dim is None:
+                dim = len(vector)
+            present = bool(vector) and len(vector) == dim
+        else:
+            continue
+        pending.append(vector if present else None)
+        mask.append(present)
+        if dim is not None and len(pending) >= _CSV_EMBEDDING_BLOCK:
+            flush_embeddings()
+
+    embeddings = None
+    has_embedding = None
+    if dim is not None and mask:
+        flush_embeddings()
+        embeddings = np.concatenate(embedding_blocks)
+        has_embedding = np.array(mask, dtype=bool)
+
+    return ColumnarRoll(size, columns, embeddings, has_embedding, file_format='csv')
+
+
+def read_arrow_roll(source: Any, file_format: str) -> ColumnarRoll:
+    """Read a Parquet or Arrow IPC roll with pyarrow"""
+    if not PYARROW_AVAILABLE:
+        raise ValueError(f"Reading {file_format} rolls requires pyarrow (pip install pyarrow); CSV works without it")
+
+    if file_format == 'parquet':
+        table = pq.read_table(source)
+    else:
+        try:
+            table = ipc.open_file(source).read_all()
+        except pa.ArrowInvalid:
+            source.seek(0)
+            table = ipc.open_stream(source).read_all()
+
+    return _roll_from_table(table, file_format)
+
+
+def _roll_from_table(table: Any, file_format: str) -> ColumnarRoll:
+    """Turn an Arrow table into a ColumnarRoll"""
+    columns = {
+        name: table.column(name).to_pylist()
+        for name in table.column_names
+        if name in RECORD_COLUMNS or name in ADDRESS_FIELDS or name == 'address'
+    }
+    embeddings, has_embedding = _arrow_embeddings(table)
+    return ColumnarRoll(table.num_rows, columns, embeddings, has_embedding, file_format=file_format)
+
+
+def _arrow_embeddings(table: Any) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+    """Build the (n, d) float32 embedding block straight from Arrow buffers"""
+    n = table.num_rows
+    parts = sorted(
+        (int(match.group(1)), name)
+        for name, match in ((name, _EMBEDDING_PART.match(name)) for name in table.column_names)
+        if match
+    )
+    if parts:
+        block = np.column_stack([
+            table.column(name).to_numpy(zero_copy_only=False).astype(np.float32)
+            for _, name in parts
+        ])
+        has_embedding = ~np.isnan(block).any(axis=1)
+        block[~has_embedding] = 0.0
+        return np.ascontiguousarray(block), has_embedding
+
+    if EMBEDDING_COLUMN not in table.column_names:
+        return None, None
+
+    column = table.column(EMBEDDING_COLUMN).combine_chunks()
+    lengths = pc.list_value_length(column).to_numpy(zero_copy_only=False)
+    lengths = np.nan_to_num(lengths.astype(np.float64), nan=0).astype(np.int64)
+    if not lengths.any():
+        return None, None
+    dim = int(np.bincount(lengths[lengths > 0]).argmax())
+    has_embedding = lengths == dim
+
+    # Flattened values of all non-null lists, in row order
+    values = pc.list_flatten(column).to_numpy(zero_copy_only=False).astype(np.float32)
+    starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    block = np.zeros((n, dim), dtype=np.float32)
+    rows = np.flatnonzero(has_embedding)
+    if rows.size:
+        block[rows] = values[starts[rows][:, None] + np.arange(dim)]
+    return block, has_embedding
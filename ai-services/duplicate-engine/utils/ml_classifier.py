@@ -1,36 +1,117 @@
 """
 ML Classifier for duplicate detection
-Uses XGBoost or RandomForest to predict duplicate probability
+Uses a trained logistic or gradient-boosted model to predict duplicate
+probability, falling back to a rule-based classifier
 """
 
 import logging
+import os
+import threading
+from datetime import datetime
 import numpy as np
-from typing import Any
+from typing import Any, Dict, Optional, Tuple
+
+from utils.model_backends import describe_model, load_model_file
 
 logger = logging.getLogger(__name__)
 
+# Column layout of the feature matrix
+NAME, FATHER_NAME, MOTHER_NAME, DOB, ADDRESS, PHONE, AADHAAR, FACE = range(8)
+FEATURE_NAMES = [
+    "name_similarity",
+    "father_name_similarity",
+    "mother_name_similarity",
+    "dob_match",
+    "address_similarity",
+    "phone_match",
+    "aadhaar_match",
+    "face_similarity",
+]
+
+# Weights of the rule-based classifier, in feature column order
+RULE_WEIGHTS = np.array([0.25, 0.10, 0.10, 0.20, 0.15, 0.05, 0.05, 0.10])
+
+# Rows per trained-model inference call; bounds the temporaries of tree walks
+INFERENCE_BATCH_SIZE = 65536
+
 class DuplicateClassifier:
     """
     ML Classifier for duplicate detection
-    In production, this would load a trained XGBoost/RandomForest model
-    For now, uses a simple rule-based classifier as placeholder
+    
+    Loads a trained model from the JSON file at DUPLICATE_MODEL_PATH (see
+    utils/model_backends.py) and uses the rule-based classifier when no
+    model is configured or the file cannot be loaded. reload() swaps in a
+    new model file without restarting the service.
     """
     
-    def __init__(self):
-        self.model = None
+    def __init__(self, model_path: Optional[str] = None):
+        self.model_path = model_path if model_path is not None else (os.getenv("DUPLICATE_MODEL_PATH") or None)
+        self.model = "rule_based"
+        # (path, mtime_ns) of the loaded model file, None for the rule-based model
+        self.source: Optional[Tuple[str, int]] = None
+        self.loaded_at: Optional[str] = None
+        self._reload_lock = threading.Lock()
         self._load_model()
         logger.info("DuplicateClassifier initialized")
     
     def _load_model(self):
-        """Load trained model (placeholder - in production, load actual model)"""
-        # In production, load a trained model:
-        # import pickle
-        # with open('models/duplicate_classifier.pkl', 'rb') as f:
-        #     self.model = pickle.load(f)
+        """Load the configured model, falling back to the rule-based classifier"""
+        if not self.model_path:
+            logger.info("Using rule-based classifier (DUPLICATE_MODEL_PATH not set)")
+            return
+        try:
+            self.reload()
+        except Exception as e:
+            logger.error(f"Could not load model {self.model_path}, using rule-based classifier: {str(e)}")
+    
+    def reload(self) -> Dict[str, Any]:
+        """
+        Load the model file again and swap it in
         
-        # For now, use rule-based classifier
-        self.model = "rule_based"
-        logger.info("Using rule-based classifier (placeholder)")
+        In-flight predictions finish with the model they started with. If the
+        file cannot be loaded, the current model stays in use.
+        
+        Raises:
+            ValueError: if no model path is configured or the file is not a valid model
+        """
+        if not self.model_path:
+            raise ValueError("No model file configured; set DUPLICATE_MODEL_PATH")
+        with self._reload_lock:
+            try:
+                mtime_ns = os.stat(self.model_path).st_mtime_ns
+            except OSError as e:
+                raise ValueError(f"Cannot read model file {self.model_path}: {str(e)}")
+            model = load_model_file(self.model_path, FEATURE_NAMES)
+            self.model = model
+            self.source = (self.model_path, mtime_ns)
+            self.loaded_at = datetime.utcnow().isoformat()
+        logger.info(f"Loaded {model.kind} model from {self.model_path}")
+        return self.info()
+    
+    def use_source(self, source: Optional[Tuple[str, int]]) -> None:
+        """
+        Make this classifier use the same model as another one
+        
+        Scoring worker processes call this with the parent's source before
+        each shard, so a hot-swapped model reaches them too.
+        """
+        if source == self.source:
+            return
+        if source is None:
+            self.model = "rule_based"
+            self.source = None
+            return
+        self.model_path = source[0]
+        self.reload()
+    
+    def info(self) -> Dict[str, Any]:
+        """Active model backend, file and load time"""
+        return {
+            **describe_model(self.model),
+            "path": self.source[0] if self.source else None,
+            "loaded_at": self.loaded_at if self.source else None,
+            "configured_path": self.model_path
+        }
     
     def predict(self, features: np.ndarray) -> np.ndarray:
         """
@@ -44,11 +125,62 @@ class DuplicateClassifier:
         Returns:
             Array of duplicate probabilities (0-1)
         """
-        if self.model == "rule_based":
+        model = self.model
+        if model == "rule_based":
             return self._rule_based_predict(features)
-        else:
-            # In production, use actual model
-            return self.model.predict_proba(features)[:, 1]
+        return self._model_predict(model, features)
+    
+    def _model_predict(self, model: Any, features: np.ndarray) -> np.ndarray:
+        """Trained-model inference in INFERENCE_BATCH_SIZE row batches"""
+        features = np.asarray(features, dtype=np.float32)
+        if features.ndim == 1:
+            features = features.reshape(1, -1)
+        n = features.shape[0]
+        if n <= INFERENCE_BATCH_SIZE:
+            return np.clip(model.predict(features), 0.0, 1.0)
+        probabilities = np.empty(n, dtype=np.float64)
+        for start in range(0, n, INFERENCE_BATCH_SIZE):
+            stop = start + INFERENCE_BATCH_SIZE
+            probabilities[start:stop] = model.predict(features[start:stop])
+        return np.clip(probabilities, 0.0, 1.0)
+    
+    @property
+    def supports_upper_bound(self) -> bool:
+        """True if upper_bound can bound this model's score from partial features"""
+        model = self.model
+        return model == "rule_based" or model.bound_values is not None
+    
+    def upper_bound(self, features: np.ndarray, known: np.ndarray) -> np.ndarray:
+        """
+        Highest probability each row can still reach
+        
+        The rule-based score never decreases when a feature increases (the
+        weights are positive and the boost and face override only kick in
+        above feature thresholds), so scoring with every unknown column set
+        to its maximum of 1.0 gives an exact upper bound. A logistic model
+        is bounded the same way, with each unknown column at 1.0 or 0.0
+        depending on the sign of its coefficient. Tree ensembles have no
+        bound.
+        
+        Args:
+            features: Array of shape (n_samples, 8); unknown columns are ignored
+            known: Boolean mask over the 8 columns marking the computed ones
+        
+        Returns:
+            Array of upper bounds on the duplicate probability (0-1)
+        """
+        model = self.model
+        if model != "rule_based" and model.bound_values is None:
+            raise ValueError(f"Score upper bounds are not available for {model.kind} models")
+        bounded = np.array(features, dtype=np.float64)
+        if bounded.ndim == 1:
+            bounded = bounded.reshape(1, -1)
+        unknown = ~np.asarray(known, dtype=bool)
+        if model == "rule_based":
+            bounded[:, unknown] = 1.0
+            return self._rule_based_predict(bounded)
+        bounded[:, unknown] = model.bound_values[unknown]
+        return self._model_predict(model, bounded)
     
     def _rule_based_predict(self, features: np.ndarray) -> np.ndarray:
         """
@@ -58,70 +190,59 @@ class DuplicateClassifier:
         - High name similarity + DOB match = high probability
         - Multiple matching features = higher probability
         - Face match = very high probability
+        
+        Fully vectorized over the (n_samples, 8) feature matrix.
         """
-        probabilities = []
-        
-        for feature_row in features:
-            name_score, father_score, mother_score, dob_match, \
-            address_score, phone_match, aadhaar_match, face_score = feature_row
-            
-            # Weighted combination
-            score = (
-                0.25 * name_score +
-                0.10 * father_score +
-                0.10 * mother_score +
-                0.20 * dob_match +
-                0.15 * address_score +
-                0.05 * phone_match +
-                0.05 * aadhaar_match +
-                0.10 * face_score
-            )
-            
-            # Boost for multiple matches
-            match_count = sum([
-                name_score > 0.8,
-                dob_match == 1.0,
-                address_score > 0.7,
-                phone_match == 1.0,
-                face_score > 0.9
-            ])
-            
-            if match_count >= 3:
-                score = min(1.0, score * 1.2)
-            
-            # Face match is very strong indicator
-            if face_score > 0.9:
-                score = max(score, 0.95)
-            
-            probabilities.append(np.clip(score, 0.0, 1.0))
-        
-        return np.array(probabilities)
+        features = np.asarray(features, dtype=np.float64)
+        if features.ndim == 1:
+            features = features.reshape(1, -1)
+        if features.shape[0] == 0:
+            return np.zeros(0, dtype=np.float64)
+        
+        # Weighted combination
+        score = features @ RULE_WEIGHTS
+        
+        # Boost for multiple matches
+        match_count = (
+            (features[:, NAME] > 0.8).astype(np.int8) +
+            (features[:, DOB] == 1.0) +
+            (features[:, ADDRESS] > 0.7) +
+            (features[:, PHONE] == 1.0) +
+            (features[:, FACE] > 0.9)
+        )
+        boosted = match_count >= 3
+        score[boosted] = np.minimum(1.0, score[boosted] * 1.2)
+        
+        # Face match is very strong indicator
+        face_match = features[:, FACE] > 0.9
+        score[face_match] = np.maximum(score[face_match], 0.95)
+        
+        return np.clip(score, 0.0, 1.0)
     
-    def get_confidence(self, features: np.ndarray) -> float:
+    def get_confidence(self, features: np.ndarray) -> np.ndarray:
         """
-        Get confidence in prediction
+        Get confidence in each prediction
         
         Higher confidence when:
         - More features are available
         - Feature values are extreme (very high or very low)
-        """
-        if len(features) == 0:
-            return 0.0
         
-        feature_row = features[0]
+        Returns:
+            Array of per-row confidences (0-1)
+        """
+        features = np.asarray(features, dtype=np.float64)
+        if features.ndim == 1:
+            features = features.reshape(1, -1)
+        if features.shape[0] == 0:
+            return np.zeros(0, dtype=np.float64)
         
-        # Count non-zero features
-        non_zero_count = np.count_nonzero(feature_row)
-        feature_completeness = non_zero_count / len(feature_row)
+        # Fraction of non-zero features
+        feature_completeness = np.count_nonzero(features, axis=1) / features.shape[1]
         
-        # Check for extreme values (high confidence)
-        max_val = np.max(feature_row)
-        min_val = np.min(feature_row)
-        value_range = max_val - min_val
+        # Spread between extreme values (high confidence)
+        value_range = features.max(axis=1) - features.min(axis=1)
         
         # Confidence based on completeness and value range
         confidence = 0.5 + (feature_completeness * 0.3) + (value_range * 0.2)
         
-        return float(np.clip(confidence, 0.0, 1.0))
-
-
+        return np.clip(confidence, 0.0, 1.0)
@@ -0,0 +1,246 @@
+"""
+Trained model backends for the duplicate classifier
+Loads logistic and gradient-boosted tree models from portable JSON files and
+scores whole feature matrices with numpy (no pickle, no ML library at runtime)
+"""
+
+import json
+import logging
+import math
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MODEL_TYPES = ("logistic", "tree_ensemble")
+
+
+def _sigmoid(margin: np.ndarray) -> np.ndarray:
+    """Logistic link, stable for large negative margins"""
+    return 0.5 * (1.0 + np.tanh(0.5 * margin))
+
+
+def _column_order(model: Dict[str, Any], feature_names: Sequence[str]) -> np.ndarray:
+    """
+    Map the model's feature order onto the classifier's feature columns
+
+    Models may list their features in any order; a model without a
+    "features" list is taken to use the classifier's order.
+    """
+    names = model.get("features") or list(feature_names)
+    unknown = [name for name in names if name not in feature_names]
+    if unknown:
+        raise ValueError(f"Model uses unknown features {unknown}; expected names from {list(feature_names)}")
+    return np.array([list(feature_names).index(name) for name in names], dtype=np.intp)
+
+
+class LogisticModel:
+    """
+    Logistic regression: sigmoid(features @ coefficients + intercept)
+
+    JSON form:
+        {"type": "logistic", "features": [...], "coefficients": [...], "intercept": -4.2}
+    """
+
+    kind = "logistic"
+
+    def __init__(self, coefficients: Sequence[float], intercept: float, columns: np.ndarray, width: int):
+        if len(coefficients) != len(columns):
+            raise ValueError(f"Logistic model has {len(coefficients)} coefficients for {len(columns)} features")
+        self.columns = columns
+        self.intercept = float(intercept)
+        self.weights = np.zeros(width, dtype=np.float64)
+        self.weights[columns] = np.asarray(coefficients, dtype=np.float64)
+
+    @property
+    def bound_values(self) -> np.ndarray:
+        """Per-column feature value (0 or 1) that maximizes the probability"""
+        return (self.weights > 0).astype(np.float64)
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        """Duplicate probabilities for an (n, 8) feature matrix"""
+        return _sigmoid(np.asarray(features, dtype=np.float64) @ self.weights + self.intercept)
+
+    def describe(self) -> Dict[str, Any]:
+        return {"features": len(self.columns)}
+
+
+class TreeEnsembleModel:
+    """
+    Gradient-boosted trees: sigmoid(base_margin + sum of leaf values)
+
+    Each tree is stored as parallel node arrays, the layout XGBoost uses in
+    its JSON model files. A node whose left child is -1 is a leaf and its
+    split condition holds the leaf value; otherwise rows go left when
+    feature[split_index] < split_condition.
+
+    JSON form:
+        {"type": "tree_ensemble", "features": [...], "base_margin": 0.0,
+         "trees": [{"left_children": [...], "right_children": [...],
+                    "split_indices": [...], "split_conditions": [...]}, ...]}
+
+    All rows walk every tree together, one level per numpy step, so the cost
+    is trees × depth vectorized operations per batch rather than per row.
+    """
+
+    kind = "tree_ensemble"
+    bound_values = None
+
+    def __init__(self, trees: List[Dict[str, Sequence[Any]]], base_margin: float, columns: np.ndarray):
+        if not trees:
+            raise ValueError("Tree ensemble has no trees")
+        self.base_margin = float(base_margin)
+        self.trees = [self._compile_tree(tree, columns, k) for k, tree in enumerate(trees)]
+
+    @staticmethod
+    def _compile_tree(tree: Dict[str, Sequence[Any]], columns: np.ndarray, number: int):
+        """Turn node arrays into (children, feature, condition, leaf value, depth) arrays"""
+        left = np.asarray(tree["left_children"], dtype=np.intp)
+        right = np.asarray(tree["right_children"], dtype=np.intp)
+        split_index = np.asarray(tree["split_indices"], dtype=np.intp)
+        condition = np.asarray(tree["split_conditions"], dtype=np.float64)
+        size = len(left)
+        if not (len(right) == len(split_index) == len(condition) == size) or size == 0:
+            raise ValueError(f"Tree {number} has node arrays of different lengths")
+
+        leaf = left < 0
+        if np.any(right[~leaf] < 0) or np.any(left[~leaf] >= size) or np.any(right[~leaf] >= size):
+            raise ValueError(f"Tree {number} has an invalid child index")
+        if np.any(split_index[~leaf] >= len(columns)) or np.any(split_index[~leaf] < 0):
+            raise ValueError(f"Tree {number} splits on a feature the model does not list")
+
+        # Leaves point at themselves, so every row can take the same number of steps
+        nodes = np.arange(size)
+        left = np.where(leaf, nodes, left)
+        right = np.where(leaf, nodes, right)
+        feature = np.where(leaf, 0, columns[np.where(leaf, 0, split_index)])
+        values = np.where(leaf, condition, 0.0)
+
+        # Deepest root-to-leaf path; a node reached twice means the arrays are not a tree
+        depth = 0
+        seen = np.zeros(size, dtype=bool)
+        stack = [(0, 0)]
+        while stack:
+            node, level = stack.pop()
+            if seen[node]:
+                raise ValueError(f"Tree {number} is not a tree (node {node} is reached twice)")
+            seen[node] = True
+            depth = max(depth, level)
+            if not leaf[node]:
+                stack.append((left[node], level + 1))
+                stack.append((right[node], level + 1))
+
+        # Features are float32, so split conditions are compared at float32 precision too
+        condition = np.where(leaf, np.inf, condition).astype(np.float32)
+        return left, right, feature, condition, values, depth
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        """Duplicate probabilities for an (n, 8) feature matrix"""
+        features = np.asarray(features, dtype=np.float32)
+        n = features.shape[0]
+        rows = np.arange(n)
+        margin = np.full(n, self.base_margin, dtype=np.float64)
+        for left, right, feature, condition, values, depth in self.trees:
+            node = np.zeros(n, dtype=np.intp)
+            for _ in range(depth):
+                go_left = features[rows, feature[node]] < condition[node]
+                node = np.where(go_left, left[node], right[node])
+            margin += values[node]
+        return _sigmoid(margin)
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "trees": len(self.trees),
+            "max_depth": max(tree[5] for tree in self.trees)
+        }
+
+
+def load_model_file(path: str, feature_names: Sequence[str]):
+    """
+    Load a model from a JSON file
+
+    Accepts this service's own format ({"type": "logistic" | "tree_ensemble", ...})
+    and binary:logistic models saved by XGBoost with Booster.save_model("model.json").
+
+    Raises:
+        ValueError: if the file is not a supported model
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        try:
+            model = json.load(f)
+        except ValueError as e:
+            raise ValueError(f"Model file {path} is not valid JSON: {str(e)}")
+    if not isinstance(model, dict):
+        raise ValueError(f"Model file {path} must hold a JSON object")
+
+    try:
+        if "learner" in model:
+            model = _from_xgboost(model)
+        kind = model.get("type")
+        if kind == "logistic":
+            return LogisticModel(
+                model["coefficients"],
+                model.get("intercept", 0.0),
+                _column_order(model, feature_names),
+                len(feature_names)
+            )
+        if kind == "tree_ensemble":
+            return TreeEnsembleModel(model["trees"], model.get("base_margin", 0.0), _column_order(model, feature_names))
+    except KeyError as e:
+        raise ValueError(f"Model file {path} is missing {str(e)}")
+    except (TypeError, IndexError) as e:
+        raise ValueError(f"Model file {path} is malformed: {str(e)}")
+    raise ValueError(f"Model file {path} has unknown type {kind!r}; expected one of {list(MODEL_TYPES)}")
+
+
+def _from_xgboost(model: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert an XGBoost JSON model (binary:logistic gbtree) to the tree_ensemble form"""
+    learner = model["learner"]
+    objective = learner.get("objective", {}).get("name")
+    if objective != "binary:logistic":
+        raise ValueError(f"Only binary:logistic XGBoost models are supported, not {objective!r}")
+    booster = learner["gradient_booster"]
+    if booster.get("name") != "gbtree":
+        raise ValueError(f"Only gbtree XGBoost models are supported, not {booster.get('name')!r}")
+
+    # base_score is stored as a probability for the logistic objective
+    base_score = _xgboost_scalar(learner["learner_model_param"]["base_score"], "base_score")
+    base_score = min(max(base_score, 1e-12), 1 - 1e-12)
+    return {
+        "type": "tree_ensemble",
+        "features": learner.get("feature_names") or None,
+        "base_margin": math.log(base_score / (1 - base_score)),
+        "trees": [
+            {
+                "left_children": tree["left_children"],
+                "right_children": tree["right_children"],
+                "split_indices": tree["split_indices"],
+                "split_conditions": tree["split_conditions"]
+            }
+            for tree in booster["model"]["trees"]
+        ]
+    }
+
+
+def _xgboost_scalar(value: Any, name: str) -> float:
+    """
+    A single number from an XGBoost learner parameter
+
+    XGBoost 1.x writes "5E-1"; 2.x and later write a one-element vector
+    "[5E-1]" (several elements only for multi-target models).
+    """
+    text = str(value).strip()
+    if text.startswith('[') and text.endswith(']'):
+        items = [item for item in text[1:-1].split(',') if item.strip()]
+        if len(items) != 1:
+            raise ValueError(f"XGBoost {name} {text} is not a single value; only single-target models are supported")
+        text = items[0]
+    return float(text)
+
+
+def describe_model(model: Optional[Any]) -> Dict[str, Any]:
+    """Backend name and shape of a loaded model"""
+    if model is None or model == "rule_based":
+        return {"backend": "rule_based"}
+    return {"backend": model.kind, **model.describe()}
@@ -0,0 +1,264 @@
+"""
+Per-record preprocessing for duplicate matching
+Normalizes each voter record once so pairwise scoring never re-parses raw fields
+"""
+
+import logging
+import re
+from datetime import date, datetime
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from utils.string_matching import StringMatcher
+
+if TYPE_CHECKING:
+    from utils.columnar_ingest import ColumnarRoll
+
+logger = logging.getLogger(__name__)
+
+_NON_ALPHA = re.compile(r'[^a-z]')
+_NON_DIGIT = re.compile(r'\D')
+
+# Address dict fields, in the order they are joined into the address string
+ADDRESS_FIELDS = ('house_number', 'street', 'village_city', 'district', 'state', 'pin_code')
+
+
+class PreparedRecord:
+    """
+    Compact normalized form of a voter record
+
+    Holds only what pair scoring and blocking need: lowercased/stripped name
+    strings, phonetic codes, DOB as a date ordinal, the flattened address
+    string, and a unit-norm float32 face embedding.
+    """
+
+    __slots__ = (
+        'voter_id',
+        'name',
+        'father_name',
+        'mother_name',
+        'name_soundex',
+        'name_metaphone',
+        'dob_ordinal',
+        'birth_year',
+        'address',
+        'pin_code',
+        'mobile_number',
+        'aadhaar',
+        'face_embedding',
+    )
+
+    def __init__(
+        self,
+        voter_id: Any = None,
+        name: str = '',
+        father_name: str = '',
+        mother_name: str = '',
+        name_soundex: str = '',
+        name_metaphone: str = '',
+        dob_ordinal: Optional[int] = None,
+        birth_year: str = '',
+        address: str = '',
+        pin_code: str = '',
+        mobile_number: Any = None,
+        aadhaar: str = '',
+        face_embedding: Optional[np.ndarray] = None
+    ):
+        self.voter_id = voter_id
+        self.name = name
+        self.father_name = father_name
+        self.mother_name = mother_name
+        self.name_soundex = name_soundex
+        self.name_metaphone = name_metaphone
+        self.dob_ordinal = dob_ordinal
+        self.birth_year = birth_year
+        self.address = address
+        self.pin_code = pin_code
+        self.mobile_number = mobile_number
+        self.aadhaar = aadhaar
+        self.face_embedding = face_embedding
+
+    @property
+    def aadhaar_last4(self) -> str:
+        """Last 4 digits of the Aadhaar number"""
+        return self.aadhaar[-4:] if len(self.aadhaar) >= 4 else ''
+
+
+class RecordPreprocessor:
+    """Turns raw voter record dicts into PreparedRecord objects"""
+
+    def __init__(self, string_matcher: Optional[StringMatcher] = None):
+        self.string_matcher = string_matcher or StringMatcher()
+
+    def prepare(self, record: Dict[str, Any]) -> PreparedRecord:
+        """Normalize one raw record"""
+        address = record.get('address', {})
+
+        return self._build(
+            voter_id=record.get('voter_id'),
+            name=record.get('name'),
+            father_name=record.get('father_name'),
+            mother_name=record.get('mother_name'),
+            dob=record.get('dob'),
+            address=self.address_to_string(address),
+            pin_code=address.get('pin_code') if isinstance(address, dict) else None,
+            mobile_number=record.get('mobile_number'),
+            aadhaar=record.get('aadhaar_number'),
+            face_embedding=self._unit_embedding(record.get('face_embedding'))
+        )
+
+    def prepare_many(self, records: Iterable[Dict[str, Any]]) -> List[PreparedRecord]:
+        """Normalize a sequence of raw records"""
+        return [self.prepare(record) for record in records]
+
+    def prepare_columns(self, roll: "ColumnarRoll") -> List[PreparedRecord]:
+        """
+        Normalize a column-wise roll without building per-record dicts
+
+        Embeddings are normalized as one block and each record keeps a row
+        view into it, so they stay in a single contiguous float32 array.
+        """
+        embeddings = None
+        if roll.embeddings is not None:
+            norms = np.linalg.norm(roll.embeddings, axis=1, keepdims=True)
+            embeddings = roll.embeddings / (norms + 1e-8)
+
+        address_parts = [roll.column(field) for field in ADDRESS_FIELDS]
+        if 'address' in roll.columns and not any(field in roll.columns for field in ADDRESS_FIELDS):
+            # A single pre-formatted address column
+            addresses = (self.address_to_string(value or '') for value in roll.column('address'))
+        else:
+            addresses = (self._join_address(parts) for parts in zip(*address_parts))
+
+        columns = zip(
+            roll.column('voter_id'),
+            roll.column('name'),
+            roll.column('father_name'),
+            roll.column('mother_name'),
+            roll.column('dob'),
+            roll.column('mobile_number'),
+            roll.column('aadhaar_number'),
+            addresses,
+            address_parts[-1]
+        )
+        # Names and dates repeat heavily across a roll; derive each distinct value once
+        memo: Dict[Any, Any] = {}
+        prepared = []
+        for k, (voter_id, name, father_name, mother_name, dob, mobile_number, aadhaar, address, pin_code) in enumerate(columns):
+            has_embedding = embeddings is not None and roll.has_embedding[k]
+            prepared.append(self._build(
+                voter_id=voter_id,
+                name=name,
+                father_name=father_name,
+                mother_name=mother_name,
+                dob=dob,
+                address=address,
+                pin_code=pin_code,
+                mobile_number=mobile_number,
+                aadhaar=aadhaar,
+                face_embedding=embeddings[k] if has_embedding else None,
+                memo=memo
+            ))
+        return prepared
+
+    def _build(
+        self,
+        voter_id: Any,
+        name: Any,
+        father_name: Any,
+        mother_name: Any,
+        dob: Any,
+        address: str,
+        pin_code: Any,
+        mobile_number: Any,
+        aadhaar: Any,
+        face_embedding: Optional[np.ndarray],
+        memo: Optional[Dict[Any, Any]] = None
+    ) -> PreparedRecord:
+        """
+        Normalize raw field values into a PreparedRecord
+
+        memo, when given, caches the phonetic codes of each distinct name and
+        the parsed form of each distinct DOB across calls.
+        """
+        name = self._normalize_name(name)
+
+        codes = memo.get(('name', name)) if memo is not None else None
+        if codes is None:
+            codes = (
+                self.string_matcher.soundex(name),
+                self.string_matcher.metaphone(_NON_ALPHA.sub('', name))
+            )
+            if memo is not None:
+                memo[('name', name)] = codes
+
+        dob_key = ('dob', dob)
+        if memo is not None and dob_key in memo:
+            dob_ordinal, birth_year = memo[dob_key]
+        else:
+            dob_ordinal = self._dob_ordinal(dob)
+            birth_year = str(date.fromordinal(dob_ordinal).year) if dob_ordinal else ''
+            if memo is not None:
+                memo[dob_key] = (dob_ordinal, birth_year)
+
+        return PreparedRecord(
+            voter_id=voter_id,
+            name=name,
+            father_name=self._normalize_name(father_name),
+            mother_name=self._normalize_name(mother_name),
+            name_soundex=codes[0],
+            name_metaphone=codes[1],
+            dob_ordinal=dob_ordinal,
+            birth_year=birth_year,
+            address=address,
+            pin_code=_NON_DIGIT.sub('', str(pin_code or '')),
+            mobile_number=mobile_number or None,
+            aadhaar=str(aadhaar or '').strip(),
+            face_embedding=face_embedding
+        )
+
+    def address_to_string(self, addr: Any) -> str:
+        """Convert address dict to normalized string"""
+        parts = []
+        if isinstance(addr, dict):
+            parts = [addr.get(field, '') for field in ADDRESS_FIELDS]
+        elif isinstance(addr, str):
+            return addr.lower().strip()
+
+        return self._join_address(parts)
+
+    def _join_address(self, parts: Iterable[Any]) -> str:
+        """Join address parts, in ADDRESS_FIELDS order, into the normalized string"""
+        return ' '.join(str(part) for part in parts if part).lower().strip()
+
+    def _normalize_name(self, value: Any) -> str:
+        """Lowercase and strip a name field"""
+        if not value:
+            return ''
+        return str(value).lower().strip()
+
+    def _dob_ordinal(self, dob: Any) -> Optional[int]:
+        """Parse a date of birth into a proleptic Gregorian ordinal"""
+        if not dob:
+            return None
+        try:
+            if isinstance(dob, datetime):
+                return dob.date().toordinal()
+            if isinstance(dob, date):
+                return dob.toordinal()
+            return datetime.strptime(str(dob), "%Y-%m-%d").toordinal()
+        except (TypeError, ValueError):
+            return None
+
+    def _unit_embedding(self, embedding: Any) -> Optional[np.ndarray]:
+        """Convert a face embedding to a unit-norm float32 vector"""
+        if embedding is None:
+            return None
+        try:
+            vector = np.asarray(embedding, dtype=np.float32).ravel()
+        except (TypeError, ValueError):
+            return None
+        if vector.size == 0:
+            return None
+        return vector / (np.linalg.norm(vector) + 1e-8)
@@ -1,15 +1,46 @@
 """
 String matching utilities for duplicate detection
 Implements Jaro-Winkler, Levenshtein, Soundex, Metaphone
+
+The Levenshtein kernel uses the C++-backed rapidfuzz library when it is
+installed, falling back to the pure-Python implementation below. Both
+backends produce identical scores. Set STRING_MATCHER_BACKEND=python to force
+the fallback. Jaro always uses the Python kernel: rapidfuzz counts
+half-transpositions with integer division, which changes scores.
 """
 
 import logging
+import os
+from typing import Optional
 
 logger = logging.getLogger(__name__)
 
+try:
+    from rapidfuzz.distance import Levenshtein as _RapidLevenshtein
+except ImportError:  # pragma: no cover - depends on the environment
+    _RapidLevenshtein = None
+
+if _RapidLevenshtein is not None and os.getenv("STRING_MATCHER_BACKEND", "").lower() != "python":
+    DEFAULT_BACKEND = "rapidfuzz"
+else:
+    DEFAULT_BACKEND = "python"
+
+logger.info(f"StringMatcher backend: {DEFAULT_BACKEND}")
+
 class StringMatcher:
     """String matching utilities"""
     
+    def __init__(self, backend: Optional[str] = None):
+        self.backend = backend or DEFAULT_BACKEND
+        if self.backend == "rapidfuzz":
+            if _RapidLevenshtein is None:
+                raise ValueError("rapidfuzz backend requested but rapidfuzz is not installed")
+            self._levenshtein = self._levenshtein_rapidfuzz
+        elif self.backend == "python":
+            self._levenshtein = self._levenshtein_python
+        else:
+            raise ValueError(f"Unknown string matcher backend: {self.backend}")
+    
     def jaro_winkler(self, s1: str, s2: str, prefix_weight: float = 0.1) -> float:
         """
         Jaro-Winkler similarity (0-1)
@@ -18,11 +49,18 @@ class StringMatcher:
         if not s1 or not s2:
             return 0.0
         
-        s1 = s1.lower().strip()
-        s2 = s2.lower().strip()
+        return self.jaro_winkler_normalized(s1.lower().strip(), s2.lower().strip(), prefix_weight)
+    
+    def jaro_winkler_normalized(self, s1: str, s2: str, prefix_weight: float = 0.1) -> float:
+        """
+        Jaro-Winkler similarity for strings that are already lowercased and stripped
         
+        Used by pair scoring on preprocessed records to skip re-normalization
+        """
         if s1 == s2:
-            return 1.0
+            return 1.0 if s1 else 0.0
+        if not s1 or not s2:
+            return 0.0
         
         # Jaro distance
         jaro = self._jaro_distance(s1, s2)
@@ -91,28 +129,72 @@ class StringMatcher:
         
         return jaro
     
-    def levenshtein(self, s1: str, s2: str) -> int:
-        """Levenshtein distance (edit distance)"""
+    def levenshtein(self, s1: str, s2: str, max_distance: Optional[int] = None) -> int:
+        """
+        Levenshtein distance (edit distance)
+        
+        With max_distance, computation stops as soon as the distance is known
+        to exceed it, and max_distance + 1 is returned in that case.
+        """
+        if max_distance is not None:
+            max_distance = max(0, max_distance)
+        return self._levenshtein(s1, s2, max_distance)
+    
+    def _levenshtein_rapidfuzz(self, s1: str, s2: str, max_distance: Optional[int]) -> int:
+        """Levenshtein distance using rapidfuzz"""
+        return _RapidLevenshtein.distance(s1, s2, score_cutoff=max_distance)
+    
+    def _levenshtein_python(self, s1: str, s2: str, max_distance: Optional[int]) -> int:
+        """
+        Levenshtein distance (pure-Python fallback)
+        
+        With max_distance only the diagonal band of width 2 * max_distance + 1
+        is filled, and the loop exits once a whole row exceeds max_distance.
+        """
         if len(s1) < len(s2):
-            return self.levenshtein(s2, s1)
+            s1, s2 = s2, s1
+        
+        if max_distance is None:
+            max_distance = len(s1)
+        elif len(s1) - len(s2) > max_distance:
+            return max_distance + 1
         
         if len(s2) == 0:
             return len(s1)
         
-        previous_row = range(len(s2) + 1)
+        over = max_distance + 1
+        previous_row = list(range(len(s2) + 1))
         for i, c1 in enumerate(s1):
-            current_row = [i + 1]
-            for j, c2 in enumerate(s2):
+            # Band of columns that can still lie within max_distance
+            lo = max(0, i - max_distance)
+            hi = min(len(s2), i + max_distance + 1)
+            
+            current_row = [over] * (len(s2) + 1)
+            if lo == 0:
+                current_row[0] = i + 1
+            row_min = current_row[0]
+            for j in range(lo, hi):
                 insertions = previous_row[j + 1] + 1
                 deletions = current_row[j] + 1
-                substitutions = previous_row[j] + (c1 != c2)
-                current_row.append(min(insertions, deletions, substitutions))
+                substitutions = previous_row[j] + (c1 != s2[j])
+                value = min(insertions, deletions, substitutions)
+                current_row[j + 1] = value
+                if value < row_min:
+                    row_min = value
+            
+            if row_min > max_distance:
+                return over
             previous_row = current_row
         
-        return previous_row[-1]
+        return min(previous_row[-1], over)
     
-    def levenshtein_similarity(self, s1: str, s2: str) -> float:
-        """Normalized Levenshtein similarity (0-1)"""
+    def levenshtein_similarity(self, s1: str, s2: str, threshold: Optional[float] = None) -> float:
+        """
+        Normalized Levenshtein similarity (0-1)
+        
+        With threshold, the distance computation exits early once the
+        similarity can no longer reach it, and 0.0 is returned.
+        """
         if not s1 or not s2:
             return 0.0
         
@@ -120,7 +202,14 @@ class StringMatcher:
         if max_len == 0:
             return 1.0
         
-        distance = self.levenshtein(s1, s2)
+        if threshold is None:
+            distance = self.levenshtein(s1, s2)
+        else:
+            max_distance = int((1.0 - threshold) * max_len + 1e-9)
+            distance = self.levenshtein(s1, s2, max_distance)
+            if distance > max_distance:
+                return 0.0
+        
         return 1.0 - (distance / max_len)
     
     def soundex(self, word: str) -> str:
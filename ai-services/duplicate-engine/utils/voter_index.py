@@ -0,0 +1,145 @@
+"""
+Resident voter index for incremental duplicate detection
+Keeps preprocessed records and their blocking keys in memory so a new
+registration is compared only against the records sharing one of its blocks
+"""
+
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from utils.blocking import CandidateGenerator, DEFAULT_BLOCKING_STRATEGY
+from utils.record_preprocessing import PreparedRecord
+
+logger = logging.getLogger(__name__)
+
+
+class VoterIndex:
+    """
+    Block-key inverted index over PreparedRecords, keyed by voter ID
+
+    Every record is filed under the block keys of the index's blocking
+    strategy. Candidate lookup unions the members of a probe record's
+    blocks, skipping blocks larger than max_block_size, so its cost depends
+    on block sizes rather than on the size of the roll.
+    """
+
+    def __init__(
+        self,
+        candidate_generator: CandidateGenerator,
+        strategy: str = DEFAULT_BLOCKING_STRATEGY,
+        max_block_size: Optional[int] = 5000
+    ):
+        self.candidate_generator = candidate_generator
+        self.strategy = strategy
+        self.max_block_size = max_block_size
+        self.passes = candidate_generator.parse_strategy(strategy)
+        if not self.passes:
+            raise ValueError("The voter index needs a blocking strategy other than 'none'")
+
+        self._lock = threading.RLock()
+        self._records: Dict[Any, PreparedRecord] = {}
+        self._keys: Dict[Any, List[str]] = {}
+        self._blocks: Dict[str, Set[Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __contains__(self, voter_id: Any) -> bool:
+        return voter_id in self._records
+
+    def get(self, voter_id: Any) -> Optional[PreparedRecord]:
+        """Indexed record for a voter ID, if any"""
+        return self._records.get(voter_id)
+
+    def upsert(self, records: Iterable[PreparedRecord]) -> Tuple[int, int]:
+        """
+        Insert new records and replace existing ones with the same voter ID
+
+        Returns:
+            Tuple of (inserted, updated) counts
+        """
+        inserted = updated = 0
+        with self._lock:
+            for record in records:
+                if record.voter_id is None:
+                    raise ValueError("Every indexed record needs a voter_id")
+                if record.voter_id in self._records:
+                    self._unfile(record.voter_id)
+                    updated += 1
+                else:
+                    inserted += 1
+                keys = self.candidate_generator.block_keys(record, self.passes)
+                self._records[record.voter_id] = record
+                self._keys[record.voter_id] = keys
+                for key in keys:
+                    self._blocks.setdefault(key, set()).add(record.voter_id)
+        return inserted, updated
+
+    def remove(self, voter_ids: Iterable[Any]) -> int:
+        """
+        Remove records by voter ID (unknown IDs are ignored)
+
+        Returns:
+            Number of records removed
+        """
+        removed = 0
+        with self._lock:
+            for voter_id in voter_ids:
+                if voter_id in self._records:
+                    self._unfile(voter_id)
+                    del self._records[voter_id]
+                    removed += 1
+        return removed
+
+    def clear(self) -> None:
+        """Remove every record"""
+        with self._lock:
+            self._records = {}
+            self._keys = {}
+            self._blocks = {}
+
+    def candidates(self, record: PreparedRecord) -> Tuple[List[PreparedRecord], int]:
+        """
+        Indexed records sharing at least one block with a probe record
+
+        The probe's own voter ID is never returned, so re-checking an
+        indexed voter does not match it against itself.
+
+        Returns:
+            Tuple of (candidate records, number of oversized blocks skipped)
+        """
+        ids: Set[Any] = set()
+        skipped = 0
+        with self._lock:
+            for key in self.candidate_generator.block_keys(record, self.passes):
+                members = self._blocks.get(key)
+                if not members:
+                    continue
+                if self.max_block_size and len(members) > self.max_block_size:
+                    skipped += 1
+                    continue
+                ids.update(members)
+            ids.discard(record.voter_id)
+            return [self._records[voter_id] for voter_id in ids], skipped
+
+    def stats(self) -> Dict[str, Any]:
+        """Index size and blocking configuration"""
+        with self._lock:
+            return {
+                "size": len(self._records),
+                "strategy": self.strategy,
+                "blocks": len(self._blocks),
+                "largest_block": max((len(members) for members in self._blocks.values()), default=0),
+                "max_block_size": self.max_block_size
+            }
+
+    def _unfile(self, voter_id: Any) -> None:
+        """Drop a record from the blocks it is filed under"""
+        for key in self._keys.pop(voter_id, []):
+            members = self._blocks.get(key)
+            if members is None:
+                continue
+            members.discard(voter_id)
+            if not members:
+                del self._blocks[key]
@@ -0,0 +1,305 @@
+"""
+In-process embedding index, shared by the AI services
+Exact brute-force search for small indexes, IVF (inverted file) ANN search for large ones
+"""
+
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingIndex:
+    """
+    Cosine-similarity index over unit-norm float32 embeddings
+
+    Embeddings are kept in one contiguous (capacity, dim) float32 matrix;
+    removal swaps the last row into the freed slot so the live rows stay
+    dense. Below ivf_threshold vectors, search is an exact matrix-vector
+    product. Above it, a spherical k-means coarse quantizer partitions the
+    rows into inverted lists and only the nprobe closest lists are scanned.
+    Once trained, IVF is kept until removals shrink the index below
+    ivf_threshold / retrain_growth. With ivf_threshold None search is always
+    exact. name appears in error messages.
+    """
+
+    def __init__(
+        self,
+        ivf_threshold: Optional[int] = 50000,
+        nprobe: int = 8,
+        retrain_growth: float = 2.0,
+        kmeans_iterations: int = 10,
+        seed: int = 0,
+        name: str = "index"
+    ):
+        self.ivf_threshold = ivf_threshold
+        self.name = name
+        self.nprobe = nprobe
+        self.retrain_growth = retrain_growth
+        self.kmeans_iterations = kmeans_iterations
+        self.seed = seed
+
+        self._lock = threading.RLock()
+        self.dim: Optional[int] = None
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+        self._ids: List[Any] = []
+        self._rows: Dict[Any, int] = {}
+
+        # IVF state (None while in exact mode)
+        self._centroids: Optional[np.ndarray] = None
+        self._assign = np.zeros(0, dtype=np.int32)
+        self._lists: List[Set[int]] = []
+        self._trained_size = 0
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @property
+    def mode(self) -> str:
+        """Current search mode: "exact" or "ivf" """
+        return "ivf" if self._centroids is not None else "exact"
+
+    def add(self, ids: Sequence[Any], embeddings: Any) -> int:
+        """
+        Add or replace embeddings for the given IDs
+
+        Returns:
+            Number of embeddings stored
+        """
+        vectors = normalize_rows(embeddings)
+        if len(ids) != vectors.shape[0]:
+            raise ValueError(f"Got {len(ids)} IDs for {vectors.shape[0]} embeddings")
+
+        # The last embedding wins when an ID is repeated within one call
+        positions = {item_id: k for k, item_id in enumerate(ids)}
+        if len(positions) != len(ids):
+            ids = list(positions)
+            vectors = vectors[list(positions.values())]
+
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                self._matrix = np.zeros((0, self.dim), dtype=np.float32)
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match {self.name} dimension {self.dim}")
+
+            existing = len(self._ids)
+            rows = np.empty(len(ids), dtype=np.int64)
+            for k, item_id in enumerate(ids):
+                row = self._rows.get(item_id)
+                if row is None:
+                    row = len(self._ids)
+                    self._ids.append(item_id)
+                    self._rows[item_id] = row
+                rows[k] = row
+            self._ensure_capacity(len(self._ids))
+
+            self._matrix[rows] = vectors
+            if self._centroids is not None:
+                for row in rows[rows < existing].tolist():
+                    self._lists[self._assign[row]].discard(row)
+                labels = np.argmax(vectors @ self._centroids.T, axis=1)
+                self._assign[rows] = labels
+                for row, list_no in zip(rows.tolist(), labels.tolist()):
+                    self._lists[list_no].add(row)
+
+            self._maybe_retrain()
+            return vectors.shape[0]
+
+    def remove(self, ids: Sequence[Any]) -> int:
+        """
+        Remove embeddings for the given IDs (unknown IDs are ignored)
+
+        Returns:
+            Number of embeddings removed
+        """
+        removed = 0
+        with self._lock:
+            for item_id in ids:
+                row = self._rows.pop(item_id, None)
+                if row is None:
+                    continue
+                last = len(self._ids) - 1
+                if self._centroids is not None:
+                    self._lists[self._assign[row]].discard(row)
+
+                if row != last:
+                    # Move the last row into the freed slot to keep rows dense
+                    moved_id = self._ids[last]
+                    self._matrix[row] = self._matrix[last]
+                    self._ids[row] = moved_id
+                    self._rows[moved_id] = row
+                    if self._centroids is not None:
+                        list_no = self._assign[last]
+                        self._lists[list_no].discard(last)
+                        self._lists[list_no].add(row)
+                        self._assign[row] = list_no
+                self._ids.pop()
+                removed += 1
+
+            # Hysteresis: a roll hovering around ivf_threshold must not retrain on every crossing
+            if self._centroids is not None and len(self._ids) < self.ivf_threshold / max(self.retrain_growth, 1.0):
+                self._drop_ivf()
+        return removed
+
+    def clear(self) -> None:
+        """Remove every embedding and reset the dimension"""
+        with self._lock:
+            self.dim = None
+            self._matrix = np.zeros((0, 0), dtype=np.float32)
+            self._ids = []
+            self._rows = {}
+            self._drop_ivf()
+
+    def search(
+        self,
+        embedding: Any,
+        top_k: int = 10,
+        min_similarity: Optional[float] = 0.0,
+        nprobe: Optional[int] = None
+    ) -> List[Tuple[Any, float]]:
+        """
+        Find the top_k most similar stored embeddings
+
+        Similarities below min_similarity are dropped and the rest clipped
+        to [0, 1]; with min_similarity None raw cosines are returned.
+
+        Returns:
+            List of (ID, cosine similarity) sorted by decreasing similarity
+        """
+        query = normalize_rows(embedding)
+        if query.shape[0] != 1:
+            raise ValueError("Search expects a single embedding")
+        query = query[0]
+
+        with self._lock:
+            n = len(self._ids)
+            if n == 0 or top_k <= 0:
+                return []
+            if query.shape[0] != self.dim:
+                raise ValueError(f"Embedding dimension {query.shape[0]} does not match {self.name} dimension {self.dim}")
+
+            if self._centroids is None:
+                rows = None
+                scores = self._matrix[:n] @ query
+            else:
+                probe = min(nprobe or self.nprobe, self._centroids.shape[0])
+                centroid_scores = self._centroids @ query
+                probed = np.argpartition(-centroid_scores, probe - 1)[:probe]
+                rows = np.fromiter(
+                    (row for list_no in probed for row in self._lists[list_no]),
+                    dtype=np.int64
+                )
+                if rows.size == 0:
+                    return []
+                scores = self._matrix[rows] @ query
+
+            k = min(top_k, scores.shape[0])
+            best = np.argpartition(-scores, k - 1)[:k]
+            best = best[np.argsort(-scores[best])]
+
+            results = []
+            for position in best:
+                score = float(scores[position])
+                if min_similarity is not None:
+                    if score < min_similarity:
+                        break
+                    score = min(1.0, max(0.0, score))
+                row = position if rows is None else rows[position]
+                results.append((self._ids[row], score))
+            return results
+
+    def stats(self) -> Dict[str, Any]:
+        """Index size and configuration"""
+        with self._lock:
+            return {
+                "size": len(self._ids),
+                "dimension": self.dim,
+                "mode": self.mode,
+                "lists": len(self._lists),
+                "nprobe": self.nprobe,
+                "ivf_threshold": self.ivf_threshold,
+                "trained_size": self._trained_size,
+                "memory_bytes": int(self._matrix.nbytes)
+            }
+
+    def _ensure_capacity(self, size: int) -> None:
+        """Grow the backing matrix geometrically"""
+        capacity = self._matrix.shape[0]
+        if size <= capacity:
+            return
+        new_capacity = max(size, capacity * 2, 1024)
+        matrix = np.zeros((new_capacity, self.dim), dtype=np.float32)
+        matrix[:capacity] = self._matrix
+        self._matrix = matrix
+        if self._centroids is not None:
+            assign = np.zeros(new_capacity, dtype=np.int32)
+            assign[:capacity] = self._assign
+            self._assign = assign
+
+    def _maybe_retrain(self) -> None:
+        """(Re)build the IVF quantizer once the index is large enough"""
+        n = len(self._ids)
+        if self.ivf_threshold is None or n < self.ivf_threshold:
+            return
+        if self._centroids is None or n >= self._trained_size * self.retrain_growth:
+            self._train_ivf()
+
+    def _train_ivf(self) -> None:
+        """Train a spherical k-means coarse quantizer and rebuild inverted lists"""
+        n = len(self._ids)
+        nlist = int(min(4096, max(1, np.sqrt(n))))
+        rng = np.random.default_rng(self.seed)
+        data = self._matrix[:n]
+
+        sample_size = min(n, nlist * 64)
+        sample = data[rng.choice(n, size=sample_size, replace=False)]
+        centroids = sample[rng.choice(sample_size, size=nlist, replace=False)].copy()
+
+        for _ in range(self.kmeans_iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            order = np.argsort(labels, kind='stable')
+            sorted_labels = labels[order]
+            starts = np.flatnonzero(np.r_[True, sorted_labels[1:] != sorted_labels[:-1]])
+            sums = np.zeros_like(centroids)
+            sums[sorted_labels[starts]] = np.add.reduceat(sample[order], starts, axis=0)
+            empty = np.bincount(labels, minlength=nlist) == 0
+            if empty.any():
+                # Re-seed empty clusters from random sample points
+                sums[empty] = sample[rng.choice(sample_size, size=int(empty.sum()), replace=False)]
+            centroids = sums / (np.linalg.norm(sums, axis=1, keepdims=True) + 1e-8)
+
+        assign = np.zeros(self._matrix.shape[0], dtype=np.int32)
+        for start in range(0, n, 65536):
+            block = data[start:start + 65536]
+            assign[start:start + block.shape[0]] = np.argmax(block @ centroids.T, axis=1)
+
+        lists: List[Set[int]] = [set() for _ in range(nlist)]
+        for row, list_no in enumerate(assign[:n].tolist()):
+            lists[list_no].add(row)
+
+        self._centroids = centroids.astype(np.float32)
+        self._assign = assign
+        self._lists = lists
+        self._trained_size = n
+        logger.info(f"Trained IVF face index: {n} vectors in {nlist} lists")
+
+    def _drop_ivf(self) -> None:
+        """Fall back to exact search"""
+        self._centroids = None
+        self._assign = np.zeros(0, dtype=np.int32)
+        self._lists = []
+        self._trained_size = 0
+
+
+def normalize_rows(embeddings: Any) -> np.ndarray:
+    """Convert to a 2-D array of unit-norm float32 rows"""
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors.reshape(1, -1)
+    if vectors.ndim != 2 or vectors.shape[1] == 0:
+        raise ValueError("Embeddings must be non-empty vectors")
+    return vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-8)
@@ -0,0 +1,422 @@
+"""
+Background job queue for long-running batch work, shared by the AI services
+Jobs run on a local thread pool; status, progress, cancellation requests and
+results are kept in SQLite, which several worker processes may share
+"""
+
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATES = (COMPLETED, FAILED, CANCELLED)
+
+# How often a running job looks for a cancellation requested through another worker
+CANCEL_POLL_SECONDS = 1.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress REAL NOT NULL DEFAULT 0,
+    params TEXT,
+    summary TEXT,
+    error TEXT,
+    result_count INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT,
+    created_ts REAL NOT NULL,
+    owner TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS job_results (
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (job_id, seq)
+);
+CREATE TABLE IF NOT EXISTS workers (
+    id TEXT PRIMARY KEY,
+    heartbeat_ts REAL NOT NULL
+);
+"""
+
+# Columns added to databases created before jobs had owners
+_ADDED_COLUMNS = {
+    "owner": "TEXT",
+    "cancel_requested": "INTEGER NOT NULL DEFAULT 0"
+}
+
+
+class JobCancelled(Exception):
+    """Raised inside a job handler once cancellation has been requested"""
+
+
+class JobContext:
+    """Handle passed to a running job for reporting progress and results"""
+
+    def __init__(self, queue: "JobQueue", job_id: str):
+        self.queue = queue
+        self.job_id = job_id
+        self._next_seq = 0
+        self._polled_at = time.monotonic()
+
+    @property
+    def cancelled(self) -> bool:
+        """
+        True once cancellation of this job has been requested
+
+        A request made through this worker is seen at once; one made through
+        another worker (or the job having been failed as orphaned) is picked
+        up from the database at most CANCEL_POLL_SECONDS later.
+        """
+        queue = self.queue
+        if self.job_id in queue._cancel_requested:
+            return True
+        now = time.monotonic()
+        if now - self._polled_at < CANCEL_POLL_SECONDS:
+            return False
+        self._polled_at = now
+        with queue._connect() as conn:
+            row = conn.execute(
+                "SELECT status, cancel_requested FROM jobs WHERE id = ?", (self.job_id,)
+            ).fetchone()
+        if row is not None and row["status"] == RUNNING and not row["cancel_requested"]:
+            return False
+        with queue._lock:
+            queue._cancel_requested.add(self.job_id)
+        return True
+
+    def check_cancelled(self) -> None:
+        """Raise JobCancelled if cancellation has been requested"""
+        if self.cancelled:
+            raise JobCancelled(self.job_id)
+
+    def set_progress(self, fraction: float) -> None:
+        """Record progress as a fraction between 0 and 1"""
+        with self.queue._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET progress = ? WHERE id = ?",
+                (min(1.0, max(0.0, fraction)), self.job_id)
+            )
+
+    def add_results(self, results: List[Any]) -> None:
+        """Append result rows; they are readable while the job is still running"""
+        if not results:
+            return
+        rows = [
+            (self.job_id, self._next_seq + k, json.dumps(result))
+            for k, result in enumerate(results)
+        ]
+        self._next_seq += len(rows)
+        with self.queue._connect() as conn:
+            conn.executemany("INSERT INTO job_results (job_id, seq, data) VALUES (?, ?, ?)", rows)
+            conn.execute(
+                "UPDATE jobs SET result_count = ? WHERE id = ?",
+                (self._next_seq, self.job_id)
+            )
+
+
+class JobQueue:
+    """
+    Runs submitted jobs on a thread pool and persists their state
+
+    A handler is called with a JobContext and returns an optional summary
+    dict. It reports progress and streams result rows through the context,
+    and should call check_cancelled() between units of work. Results are
+    written to SQLite as they are produced, so partial results can be paged
+    through while the job runs and after it is cancelled.
+
+    Every process serving the API (e.g. each uvicorn worker) may open a
+    JobQueue on the same database. Each registers as a worker and records a
+    heartbeat every heartbeat_seconds; a job is run by the worker that
+    accepted it and records it as its owner. Status, results and cancellation
+    go through the database, so any worker can answer for any job. Queued or
+    running jobs whose owner has not sent a heartbeat for
+    worker_timeout_seconds cannot resume and are marked failed.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        max_workers: int = 2,
+        retention_seconds: float = 7 * 24 * 3600,
+        heartbeat_seconds: float = 5.0,
+        worker_timeout_seconds: float = 60.0
+    ):
+        self.db_path = db_path
+        self.retention_seconds = retention_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.worker_timeout_seconds = max(worker_timeout_seconds, 2 * heartbeat_seconds)
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="job")
+        self._futures: Dict[str, Future] = {}
+        self._cancel_requested: set = set()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for name, definition in _ADDED_COLUMNS.items():
+                if name not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {definition}")
+            self._heartbeat(conn)
+            self._recover_orphans(conn)
+
+        self._heartbeat_thread = threading.Thread(
+            target=self._heartbeat_loop, name="job-heartbeat", daemon=True
+        )
+        self._heartbeat_thread.start()
+        logger.info(f"JobQueue initialized at {db_path} as worker {self.worker_id} with {max(1, max_workers)} threads")
+
+    def submit(
+        self,
+        kind: str,
+        handler: Callable[[JobContext], Optional[Dict[str, Any]]],
+        params: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Queue a job
+
+        Returns:
+            The new job's status dictionary
+        """
+        self._prune()
+        job_id = uuid.uuid4().hex
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, status, params, created_at, created_ts, owner) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job_id, kind, QUEUED, json.dumps(params or {}),
+                    datetime.utcnow().isoformat(), time.time(), self.worker_id
+                )
+            )
+        with self._lock:
+            self._futures[job_id] = self._executor.submit(self._run, job_id, handler)
+        logger.info(f"Queued {kind} job {job_id}")
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Dict[str, Any]:
+        """
+        Status of a job
+
+        Raises:
+            KeyError: if the job does not exist
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            raise KeyError(job_id)
+        return {
+            "job_id": row["id"],
+            "kind": row["kind"],
+            "status": row["status"],
+            "progress": round(row["progress"] * 100, 1),
+            "params": json.loads(row["params"] or "{}"),
+            "result_count": row["result_count"],
+            "summary": json.loads(row["summary"]) if row["summary"] else None,
+            "error": row["error"],
+            "created_at": row["created_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"]
+        }
+
+    def results(self, job_id: str, offset: int = 0, limit: int = 1000) -> List[Any]:
+        """
+        Page through a job's result rows in the order they were produced
+
+        Raises:
+            KeyError: if the job does not exist
+        """
+        self.get(job_id)
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT data FROM job_results WHERE job_id = ? AND seq >= ? ORDER BY seq LIMIT ?",
+                (job_id, max(0, offset), max(0, limit))
+            ).fetchall()
+        return [json.loads(row["data"]) for row in rows]
+
+    def cancel(self, job_id: str) -> Dict[str, Any]:
+        """
+        Cancel a queued or running job
+
+        A queued job is cancelled immediately, whichever worker owns it; a
+        running job stops at its next cancellation check and keeps the
+        results it already produced.
+
+        Raises:
+            KeyError: if the job does not exist
+            ValueError: if the job has already finished
+        """
+        job = self.get(job_id)
+        if job["status"] in FINISHED_STATES:
+            raise ValueError(f"Job {job_id} is already {job['status']}")
+
+        with self._connect() as conn:
+            # The owner only starts a job that is still queued, so this wins any race with it
+            updated = conn.execute(
+                "UPDATE jobs SET status = ?, cancel_requested = 1, finished_at = ? WHERE id = ? AND status = ?",
+                (CANCELLED, datetime.utcnow().isoformat(), job_id, QUEUED)
+            ).rowcount
+            if not updated:
+                updated = conn.execute(
+                    "UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = ?",
+                    (job_id, RUNNING)
+                ).rowcount
+        if not updated:
+            job = self.get(job_id)
+            raise ValueError(f"Job {job_id} is already {job['status']}")
+
+        with self._lock:
+            self._cancel_requested.add(job_id)
+            future = self._futures.get(job_id)
+        if future is not None and future.cancel():
+            # The job never started, so _run will not clean up after it
+            with self._lock:
+                self._futures.pop(job_id, None)
+                self._cancel_requested.discard(job_id)
+        logger.info(f"Cancellation requested for job {job_id}")
+        return self.get(job_id)
+
+    def shutdown(self) -> None:
+        """
+        Ask running jobs to stop and drop queued ones
+
+        The worker unregisters, so the jobs it owned are failed by the next
+        worker to start instead of after worker_timeout_seconds.
+        """
+        with self._lock:
+            self._cancel_requested.update(self._futures)
+        self._stopped.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._connect() as conn:
+            conn.execute("DELETE FROM workers WHERE id = ?", (self.worker_id,))
+
+    def _run(self, job_id: str, handler: Callable[[JobContext], Optional[Dict[str, Any]]]) -> None:
+        """Execute one job on a worker thread"""
+        context = JobContext(self, job_id)
+        try:
+            with self._connect() as conn:
+                started = conn.execute(
+                    "UPDATE jobs SET status = ?, started_at = ? WHERE id = ? AND status = ? AND cancel_requested = 0",
+                    (RUNNING, datetime.utcnow().isoformat(), job_id, QUEUED)
+                ).rowcount
+            if not started:
+                # Cancelled, or failed as orphaned, before it could start
+                return
+            summary = handler(context)
+            self._finish(job_id, COMPLETED, summary=summary, progress=1.0)
+            logger.info(f"Job {job_id} completed")
+        except JobCancelled:
+            self._finish(job_id, CANCELLED)
+            logger.info(f"Job {job_id} cancelled")
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {str(e)}")
+            self._finish(job_id, FAILED, error=str(e))
+        finally:
+            with self._lock:
+                self._futures.pop(job_id, None)
+                self._cancel_requested.discard(job_id)
+
+    def _finish(
+        self,
+        job_id: str,
+        status: str,
+        summary: Optional[Dict[str, Any]] = None,
+        error: Optional[str] = None,
+        progress: Optional[float] = None
+    ) -> None:
+        """Record a job's final state, unless another worker has already finished it"""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, summary = ?, error = ?, finished_at = ?, "
+                "progress = COALESCE(?, progress) WHERE id = ? AND status IN (?, ?)",
+                (
+                    status,
+                    json.dumps(summary) if summary is not None else None,
+                    error,
+                    datetime.utcnow().isoformat(),
+                    progress,
+                    job_id,
+                    QUEUED,
+                    RUNNING
+                )
+            )
+
+    def _heartbeat(self, conn: sqlite3.Connection) -> None:
+        """Record that this worker is alive"""
+        conn.execute(
+            "INSERT INTO workers (id, heartbeat_ts) VALUES (?, ?) "
+            "ON CONFLICT (id) DO UPDATE SET heartbeat_ts = excluded.heartbeat_ts",
+            (self.worker_id, time.time())
+        )
+
+    def _recover_orphans(self, conn: sqlite3.Connection) -> None:
+        """Fail the unfinished jobs of workers that stopped sending heartbeats"""
+        conn.execute(
+            "DELETE FROM workers WHERE heartbeat_ts < ?",
+            (time.time() - self.worker_timeout_seconds,)
+        )
+        orphaned = conn.execute(
+            "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE status IN (?, ?) "
+            "AND (owner IS NULL OR owner NOT IN (SELECT id FROM workers))",
+            (FAILED, "Interrupted: the worker running it stopped", datetime.utcnow().isoformat(), QUEUED, RUNNING)
+        ).rowcount
+        if orphaned:
+            logger.warning(f"Marked {orphaned} jobs of stopped workers as failed")
+
+    def _heartbeat_loop(self) -> None:
+        """Keep this worker registered and recover orphaned jobs until shutdown"""
+        while not self._stopped.wait(self.heartbeat_seconds):
+            try:
+                with self._connect() as conn:
+                    self._heartbeat(conn)
+                    self._recover_orphans(conn)
+            except sqlite3.Error as e:
+                logger.error(f"Job worker heartbeat failed: {str(e)}")
+
+    def _prune(self) -> None:
+        """Delete finished jobs older than the retention period"""
+        cutoff = time.time() - self.retention_seconds
+        with self._connect() as conn:
+            expired = [
+                row["id"] for row in conn.execute(
+                    "SELECT id FROM jobs WHERE created_ts < ? AND status IN (?, ?, ?)",
+                    (cutoff, *FINISHED_STATES)
+                )
+            ]
+            for job_id in expired:
+                conn.execute("DELETE FROM job_results WHERE job_id = ?", (job_id,))
+                conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Open a connection for one transaction; one per operation keeps worker threads independent"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
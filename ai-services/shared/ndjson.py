@@ -0,0 +1,58 @@
+"""
+NDJSON streaming helpers, shared by the AI services
+Splits an uploaded byte stream into JSON records and streams NDJSON
+responses while the upload is still being read
+"""
+
+import json
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+from fastapi.responses import StreamingResponse
+
+
+class NDJSONStreamingResponse(StreamingResponse):
+    """
+    Streaming NDJSON response that may be sent while the request body is still being read
+
+    StreamingResponse listens for client disconnects by consuming receive(),
+    which would swallow the request body chunks an upload-streaming endpoint
+    is reading; a disconnect still surfaces through request.stream().
+    """
+    media_type = "application/x-ndjson"
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+
+
+def _parse_record(line: bytes) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """(record, None) for a JSON object line, (None, error message) otherwise"""
+    try:
+        record = json.loads(line)
+    except ValueError as e:
+        return None, f"Invalid JSON: {str(e)}"
+    if not isinstance(record, dict):
+        return None, "Each line must be a JSON object"
+    return record, None
+
+
+async def iter_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Optional[Dict[str, Any]], Optional[str]]]:
+    """
+    Split a byte stream into NDJSON records
+
+    Yields (line number, record, None) for each JSON object and (line
+    number, None, error message) for lines that are not one. Blank lines
+    are ignored.
+    """
+    buffer = b''
+    line_no = 0
+
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b'\n')
+        for line in lines:
+            line_no += 1
+            if line.strip():
+                yield (line_no, *_parse_record(line))
+
+    if buffer.strip():
+        yield (line_no + 1, *_parse_record(buffer))
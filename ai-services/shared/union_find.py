@@ -0,0 +1,54 @@
+"""
+Disjoint-set forest, shared by the AI services
+Used to turn pairwise matches into connected components (clusters)
+"""
+
+from typing import Any, Dict, List
+
+
+class UnionFind:
+    """Disjoint-set forest over arbitrary hashable items (union by size, path halving)"""
+
+    def __init__(self):
+        self._index: Dict[Any, int] = {}
+        self._items: List[Any] = []
+        self._parent: List[int] = []
+        self._size: List[int] = []
+
+    def add(self, item: Any) -> int:
+        """Register an item (no-op if known) and return its slot"""
+        slot = self._index.get(item)
+        if slot is None:
+            slot = len(self._items)
+            self._index[item] = slot
+            self._items.append(item)
+            self._parent.append(slot)
+            self._size.append(1)
+        return slot
+
+    def find(self, slot: int) -> int:
+        """Root slot of the set containing slot"""
+        parent = self._parent
+        while parent[slot] != slot:
+            parent[slot] = parent[parent[slot]]
+            slot = parent[slot]
+        return slot
+
+    def union(self, a: Any, b: Any) -> int:
+        """Merge the sets containing items a and b and return the root slot"""
+        root_a = self.find(self.add(a))
+        root_b = self.find(self.add(b))
+        if root_a == root_b:
+            return root_a
+        if self._size[root_a] < self._size[root_b]:
+            root_a, root_b = root_b, root_a
+        self._parent[root_b] = root_a
+        self._size[root_a] += self._size[root_b]
+        return root_a
+
+    def groups(self) -> List[List[Any]]:
+        """Items grouped by set, each group in insertion order"""
+        members: Dict[int, List[Any]] = {}
+        for slot, item in enumerate(self._items):
+            members.setdefault(self.find(slot), []).append(item)
+        return list(members.values())
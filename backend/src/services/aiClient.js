@@ -113,6 +113,17 @@ const MOCK_RESPONSES = {
   }
 };
 
+/**
+ * Encode an embedding as base64 little-endian float32 bytes, the compact
+ * transport accepted by biometric-engine (*_b64 fields)
+ */
+function toFloat32Base64(embedding) {
+  const floats = Float32Array.from(embedding);
+  const buffer = Buffer.alloc(floats.length * 4);
+  floats.forEach((value, i) => buffer.writeFloatLE(value, i * 4));
+  return buffer.toString('base64');
+}
+
 function fallback(service, error) {
   console.warn(`[AI Mock] ${service} service unavailable, returning mock data. Reason: ${error.message}`);
   const mock = MOCK_RESPONSES[service];
@@ -122,6 +133,60 @@ function fallback(service, error) {
   return mock;
 }
 
+/**
+ * POST records as NDJSON and read the NDJSON response line by line
+ *
+ * Each response line is handed to handlers[line.type] as it arrives, error
+ * lines are logged, and the promise resolves with the final summary line.
+ * @returns {Promise<Object>} the final summary line
+ */
+async function streamNDJSON(url, records, params, handlers, name) {
+  const body = records.map((record) => JSON.stringify(record)).join('\n');
+  const response = await axios.post(url, body, {
+    params,
+    headers: { 'Content-Type': 'application/x-ndjson' },
+    responseType: 'stream',
+    timeout: 0 // progress lines keep the connection alive
+  });
+
+  return new Promise((resolve, reject) => {
+    let buffer = '';
+    let summary = null;
+    const handleLine = (line) => {
+      if (!line.trim()) return;
+      const message = JSON.parse(line);
+      if (message.type === 'summary') summary = message;
+      else if (message.type === 'error') console.warn(`[AI] ${name} stream error:`, message.detail);
+      else if (handlers[message.type]) handlers[message.type](message);
+    };
+
+    // Decode as a stream, so characters split across chunks stay whole
+    response.data.setEncoding('utf8');
+    response.data.on('data', (chunk) => {
+      buffer += chunk;
+      const lines = buffer.split('\n');
+      buffer = lines.pop();
+      try {
+        lines.forEach(handleLine);
+      } catch (error) {
+        response.data.destroy(error);
+      }
+    });
+    response.data.on('end', () => {
+      try {
+        handleLine(buffer);
+      } catch (error) {
+        return reject(error);
+      }
+      if (!summary) {
+        return reject(new Error(`${name} stream ended without a summary`));
+      }
+      resolve(summary);
+    });
+    response.data.on('error', reject);
+  });
+}
+
 class AIClient {
   /**
    * Predict if two records are duplicates
@@ -139,6 +204,27 @@ class AIClient {
     }
   }
 
+  /**
+   * Predict duplicates for many record pairs in one round-trip
+   * @param {Array<{record1: Object, record2: Object}>} pairs
+   */
+  async predictDuplicates(pairs) {
+    try {
+      const response = await axios.post(
+        `${AI_SERVICES.duplicate}/predict-duplicates`,
+        { pairs },
+        { timeout: 60000 }
+      );
+      return response.data;
+    } catch (error) {
+      console.warn(`[AI Mock] duplicate service unavailable, returning mock data. Reason: ${error.message}`);
+      return {
+        total_pairs: pairs.length,
+        results: pairs.map(() => MOCK_RESPONSES.duplicate)
+      };
+    }
+  }
+
   /**
    * Run batch duplicate detection
    */
@@ -155,6 +241,73 @@ class AIClient {
     }
   }
 
+  /**
+   * Run batch duplicate detection on a CSV/Parquet/Arrow roll file that the
+   * duplicate engine can read (path relative to its BATCH_INPUT_DIR)
+   */
+  async batchDetectDuplicatesFromFile(path, threshold = 0.7) {
+    const response = await axios.post(
+      `${AI_SERVICES.duplicate}/batch-run/file`,
+      null,
+      { params: { path, threshold }, timeout: 0 }
+    );
+    return response.data;
+  }
+
+  /**
+   * Check one new registration against the duplicate engine's resident voter index
+   */
+  async findDuplicates(record, threshold = 0.7, maxResults = 20) {
+    const response = await axios.post(
+      `${AI_SERVICES.duplicate}/find-duplicates`,
+      { record, threshold, max_results: maxResults },
+      { timeout: 5000 }
+    );
+    return response.data;
+  }
+
+  /**
+   * Insert or update voters in the resident voter index
+   */
+  async upsertVoterIndex(records) {
+    const response = await axios.post(
+      `${AI_SERVICES.duplicate}/voter-index/upsert`,
+      records,
+      { timeout: 30000 }
+    );
+    return response.data;
+  }
+
+  /**
+   * Remove voters from the resident voter index
+   */
+  async deleteFromVoterIndex(voterIds) {
+    const response = await axios.post(
+      `${AI_SERVICES.duplicate}/voter-index/delete`,
+      { voter_ids: voterIds },
+      { timeout: 10000 }
+    );
+    return response.data;
+  }
+
+  /**
+   * Run batch duplicate detection as a stream
+   *
+   * Records are uploaded as NDJSON and duplicates are handed to onDuplicate
+   * as soon as the engine finds them, so large runs neither time out nor
+   * have to be held in memory as one response.
+   * @returns {Promise<Object>} the final summary line
+   */
+  async streamBatchDetectDuplicates(records, { threshold = 0.7, blocking, onDuplicate, onProgress } = {}) {
+    return streamNDJSON(
+      `${AI_SERVICES.duplicate}/batch-run/stream`,
+      records,
+      { threshold, blocking },
+      { duplicate: onDuplicate, progress: onProgress },
+      'Batch'
+    );
+  }
+
   /**
    * Normalize address
    */
@@ -171,6 +324,18 @@ class AIClient {
     }
   }
 
+  /**
+   * Normalize many addresses in one request; results are in input order
+   */
+  async normalizeAddresses(addresses) {
+    const response = await axios.post(
+      `${AI_SERVICES.address}/normalize-batch`,
+      addresses,
+      { timeout: 120000 }
+    );
+    return response.data;
+  }
+
   /**
    * Detect fraudulent addresses
    */
@@ -192,6 +357,41 @@ class AIClient {
     }
   }
 
+  /**
+   * Districts and states the address engine's gazetteer lists for a PIN code
+   */
+  async lookupPinCode(pinCode) {
+    const response = await axios.get(
+      `${AI_SERVICES.address}/gazetteer/pincode/${encodeURIComponent(pinCode)}`,
+      { timeout: 5000 }
+    );
+    return response.data;
+  }
+
+  /**
+   * Insert voters into the address-occupancy index, or move them to a new address
+   */
+  async upsertAddressOccupancy(addresses) {
+    const response = await axios.post(
+      `${AI_SERVICES.address}/occupancy/upsert`,
+      addresses,
+      { timeout: 30000 }
+    );
+    return response.data;
+  }
+
+  /**
+   * Remove voters from the address-occupancy index
+   */
+  async deleteFromAddressOccupancy(voterIds) {
+    const response = await axios.post(
+      `${AI_SERVICES.address}/occupancy/delete`,
+      { voter_ids: voterIds },
+      { timeout: 10000 }
+    );
+    return response.data;
+  }
+
   /**
    * Analyze address clusters
    */
@@ -208,6 +408,46 @@ class AIClient {
     }
   }
 
+  /**
+   * Queue a long-running job: 'batch-run' on the duplicate engine or
+   * 'cluster-analysis' on the address engine. Resolves with the job status.
+   */
+  async submitJob(service, kind, payload, params = {}) {
+    const response = await axios.post(
+      `${AI_SERVICES[service]}/jobs/${kind}`,
+      payload,
+      { params, timeout: 60000 }
+    );
+    return response.data;
+  }
+
+  /**
+   * Status and progress percentage of a queued job
+   */
+  async getJob(service, jobId) {
+    const response = await axios.get(`${AI_SERVICES[service]}/jobs/${jobId}`, { timeout: 5000 });
+    return response.data;
+  }
+
+  /**
+   * Page through a job's results (available while it is still running)
+   */
+  async getJobResults(service, jobId, offset = 0, limit = 1000) {
+    const response = await axios.get(
+      `${AI_SERVICES[service]}/jobs/${jobId}/results`,
+      { params: { offset, limit }, timeout: 30000 }
+    );
+    return response.data;
+  }
+
+  /**
+   * Cancel a queued or running job
+   */
+  async cancelJob(service, jobId) {
+    const response = await axios.post(`${AI_SERVICES[service]}/jobs/${jobId}/cancel`, null, { timeout: 5000 });
+    return response.data;
+  }
+
   /**
    * Match deceased records
    */
@@ -224,6 +464,35 @@ class AIClient {
     }
   }
 
+  /**
+   * Bulk-load death records into the deceased engine's index
+   */
+  async loadDeathRecords(records, replace = true) {
+    const response = await axios.post(
+      `${AI_SERVICES.deceased}/death-records/load`,
+      records,
+      { params: { replace }, timeout: 0 }
+    );
+    return response.data;
+  }
+
+  /**
+   * Match voters against the loaded death records as a stream
+   *
+   * Voters with candidate death records are handed to onMatch as the engine
+   * finds them.
+   * @returns {Promise<Object>} the final summary line
+   */
+  async streamMatchDeceased(voterRecords, { threshold = 0.5, maxCandidates = 10, onMatch, onProgress } = {}) {
+    return streamNDJSON(
+      `${AI_SERVICES.deceased}/match-deceased-batch`,
+      voterRecords,
+      { threshold, max_candidates: maxCandidates },
+      { match: onMatch, progress: onProgress },
+      'Deceased match'
+    );
+  }
+
   /**
    * Verify document (OCR + fake detection)
    */
@@ -263,7 +532,7 @@ class AIClient {
     try {
       const response = await axios.post(
         `${AI_SERVICES.biometric}/match-face`,
-        { embedding1, embedding2 },
+        { embedding1_b64: toFloat32Base64(embedding1), embedding2_b64: toFloat32Base64(embedding2) },
         { timeout: 5000 }
       );
       return response.data;
@@ -279,7 +548,7 @@ class AIClient {
     try {
       const response = await axios.post(
         `${AI_SERVICES.biometric}/match-fingerprint`,
-        { template1, template2 },
+        { embedding1_b64: toFloat32Base64(template1), embedding2_b64: toFloat32Base64(template2) },
         { timeout: 5000 }
       );
       return response.data;